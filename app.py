@@ -5,20 +5,63 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
+import os
+
 from flask import Flask
+import instrumentation
+import database.database as db
 from database.database import init_database, add_sample_data
-from routes import register_blueprints
+from database import cache, connection, group_commit, prefix_index
+from routes import http_cache, register_blueprints
+from services import accrual_service
 
 
-def create_app():
+def create_app(config=None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        config: Optional settings applied on top of the defaults
+                (e.g. {'INSTRUMENTATION': True})
+    
+    Database settings (defaults come from the environment variables of the same name):
+        DATABASE: path of the primary read/write database
+        DATABASE_READONLY: path or sqlite URI of a read-only copy used for
+            catalog, search and report reads (unset: read from DATABASE)
+        DATABASE_READONLY_IMMUTABLE: open a read-only copy given as a path with immutable=1
+        DB_GROUP_COMMIT: commit concurrent borrows/returns together on one writer
+            thread, waiting up to DB_GROUP_COMMIT_DELAY seconds (default 0.002)
+            for at most DB_GROUP_COMMIT_MAX_BATCH operations (default 64)
+    
     Returns:
         Flask: Configured Flask application instance
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
+    app.config['INSTRUMENTATION'] = False
+    app.config['DATABASE'] = db.DATABASE
+    app.config['DATABASE_READONLY'] = os.environ.get('DATABASE_READONLY') or db.READONLY_DATABASE
+    app.config['DATABASE_READONLY_IMMUTABLE'] = os.environ.get('DATABASE_READONLY_IMMUTABLE', '') in ('1', 'true')
+    if config:
+        app.config.update(config)
+    
+    db.configure_database(app.config['DATABASE'], app.config['DATABASE_READONLY'],
+                          immutable=app.config['DATABASE_READONLY_IMMUTABLE'])
+    
+    # Opt-in per-request SQL/gateway profiling (Server-Timing header, /metrics)
+    instrumentation.init_app(app)
+    
+    # Reuse pooled connections per request instead of reconnecting per query
+    connection.init_app(app)
+    
+    # Serve repeated book lookups from memory
+    cache.init_app(app)
+    
+    # Versioned ETags and cached bodies for catalog and search pages
+    http_cache.init_app(app)
+    
+    # Optional group commit for bursts of circulation writes
+    group_commit.init_app(app)
     
     # Initialize the database
     init_database()
@@ -26,9 +69,16 @@ def create_app():
     # Add sample data for testing and demonstration
     add_sample_data()
     
+    # Build the in-memory typeahead index behind /api/suggest
+    prefix_index.init_app(app)
+    db.build_suggest_index()
+    
     # Register all route blueprints
     register_blueprints(app)
     
+    # Optional in-process overdue fee accrual (OVERDUE_ACCRUAL_INTERVAL seconds)
+    accrual_service.init_app(app)
+    
     return app
 
 
@@ -0,0 +1,4 @@
+"""
+Benchmarks Package - Latency and throughput measurements for the hot paths
+Run with: python -m benchmarks.run --help
+"""
@@ -0,0 +1,94 @@
+"""
+Synthetic data generator for benchmarks.
+Starts from the fixture data of setup_test_db.py and adds a configurable
+number of books, patrons and historical loans.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+import database.database as db
+from database.isbn import isbn_key
+from setup_test_db import setup_db
+
+WORDS = [
+    "shadow", "river", "garden", "winter", "silent", "empire", "journey", "secret", "ocean", "mountain",
+    "golden", "broken", "city", "night", "storm", "glass", "iron", "forest", "crown", "letter",
+    "midnight", "summer", "hidden", "last", "house", "north", "wild", "stone", "paper", "light",
+]
+FIRST_NAMES = ["Ada", "George", "Harper", "Jane", "Leo", "Mary", "Toni", "Virginia", "Ernest", "Chinua"]
+LAST_NAMES = ["Austin", "Orwell", "Lee", "Morrison", "Tolstoy", "Woolf", "Hemingway", "Achebe", "Shelley", "Eliot"]
+
+
+def patron_ids(count: int):
+    """Synthetic 6-digit patron IDs (the fixture patron 123456 is not among them)."""
+    return [f"{200000 + i:06d}" for i in range(count)]
+
+
+def generate_dataset(path: str, books: int = 10000, patrons: int = 1000, loans: int = 50000,
+                     active_ratio: float = 0.05, seed: int = 327) -> dict:
+    """
+    Create a benchmark database at path.
+
+    Args:
+        path: Database file to (re)create
+        books: Synthetic books to add
+        patrons: Number of distinct synthetic patrons
+        loans: Historical loans to add; active_ratio of them are still open
+        active_ratio: Fraction of loans without a return date
+        seed: Random seed, so runs are reproducible
+
+    Returns:
+        dict: the parameters used
+    """
+    rng = random.Random(seed)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    setup_db(path)
+    db.DATABASE = path
+    db.init_database()
+
+    rows = []
+    for i in range(books):
+        title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title()
+        author = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        copies = rng.randint(1, 5)
+        isbn = f"979{i:010d}"
+        rows.append((title, author, isbn, isbn_key(isbn), copies, copies))
+
+    ids = patron_ids(patrons)
+    now = datetime.now()
+    conn = db.get_db_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO books (title, author, isbn, isbn13, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        book_ids = [row[0] for row in conn.execute("SELECT id FROM books").fetchall()]
+
+        records = []
+        for _ in range(loans):
+            borrowed = now - timedelta(days=rng.randint(0, 720), minutes=rng.randint(0, 1440))
+            returned = None
+            if rng.random() >= active_ratio:
+                returned = (borrowed + timedelta(days=rng.randint(1, 30))).isoformat()
+            records.append((rng.choice(ids), rng.choice(book_ids), borrowed.isoformat(),
+                            (borrowed + timedelta(days=14)).isoformat(), returned))
+        conn.executemany('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+            VALUES (?, ?, ?, ?, ?)
+        ''', records)
+        # keep availability consistent with the open loans just created
+        conn.execute('''
+            UPDATE books SET available_copies = MAX(0, total_copies - (
+                SELECT COUNT(*) FROM borrow_records br
+                WHERE br.book_id = books.id AND br.return_date IS NULL
+            ))
+        ''')
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    return {"books": books, "patrons": patrons, "loans": loans, "active_ratio": active_ratio, "seed": seed}
@@ -0,0 +1,261 @@
+"""
+Benchmark Runner - Latency percentiles and throughput for the hot paths
+Usage:
+    python -m benchmarks.run --books 10000 --patrons 1000 --loans 50000
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import database.database as db
+from benchmarks.data import WORDS, generate_dataset, patron_ids
+from database.connection import close_all_pools
+from routes.http_cache import DEFAULT_RESPONSE_CACHE_TTL, response_cache
+
+# Latency statistics compared against a baseline
+COMPARED_METRICS = ('p50_ms', 'p95_ms')
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def measure(operation: Callable[[], object], iterations: int, warmup: int = 5) -> Dict:
+    """
+    Call operation repeatedly and summarize its latency.
+
+    Returns:
+        dict: iterations, mean/p50/p95/p99/max in milliseconds and ops_per_sec
+    """
+    for _ in range(warmup):
+        operation()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    elapsed = time.perf_counter() - started
+
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': round(sum(samples) / len(samples), 4),
+        'p50_ms': round(percentile(samples, 50), 4),
+        'p95_ms': round(percentile(samples, 95), 4),
+        'p99_ms': round(percentile(samples, 99), 4),
+        'max_ms': round(samples[-1], 4),
+        'ops_per_sec': round(iterations / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def _active_loans(limit: int) -> List[tuple]:
+    conn = db.get_db_connection()
+    try:
+        rows = conn.execute('''
+            SELECT patron_id, book_id FROM borrow_records
+            WHERE return_date IS NULL
+            GROUP BY patron_id, book_id
+            LIMIT ?
+        ''', (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [(row['patron_id'], row['book_id']) for row in rows]
+
+
+def _book_ids() -> List[int]:
+    conn = db.get_db_connection()
+    try:
+        return [row['id'] for row in conn.execute('SELECT id FROM books').fetchall()]
+    finally:
+        conn.close()
+
+
+def build_operations(dataset: Dict, seed: int) -> Dict[str, Callable[[], object]]:
+    """
+    Build the benchmarked operations against the current database.
+    Operations pick their arguments from a seeded generator so runs are comparable.
+
+    The route_* operations render every request with the response cache off;
+    their *_cached twins measure the same requests served from the cache.
+    """
+    # imported late so the service sees the benchmark database
+    from app import create_app
+    from services import library_service as service
+
+    rng = random.Random(seed)
+    patrons = patron_ids(dataset['patrons'])
+    books = _book_ids()
+    loans = _active_loans(100000)
+    rng.shuffle(loans)
+
+    client = create_app().test_client()
+
+    def borrow():
+        service.borrow_book_by_patron(rng.choice(patrons), rng.choice(books))
+
+    def return_book():
+        if loans:
+            patron_id, book_id = loans.pop()
+        else:
+            patron_id, book_id = rng.choice(patrons), rng.choice(books)
+        service.return_book_by_patron(patron_id, book_id)
+
+    def search(search_type):
+        return lambda: service.search_books_in_catalog(rng.choice(WORDS), search_type)
+
+    def route(path_for, cached=False):
+        ttl = DEFAULT_RESPONSE_CACHE_TTL if cached else 0
+        def get():
+            # the cache is shared by both variants; reconfiguring it also empties it
+            if response_cache.ttl != ttl:
+                response_cache.configure(ttl=ttl)
+            response = client.get(path_for())
+            if response.status_code >= 500:
+                raise RuntimeError(f'{path_for()} returned {response.status_code}')
+        return get
+
+    return {
+        'borrow_book_by_patron': borrow,
+        'return_book_by_patron': return_book,
+        'search_title': search('title'),
+        'search_author': lambda: service.search_books_in_catalog(rng.choice(['Orwell', 'Lee', 'Woolf']), 'author'),
+        'search_keyword': search('keyword'),
+        'suggest': lambda: service.suggest_books(rng.choice(WORDS)[:3]),
+        'get_all_books': db.get_all_books,
+        'get_catalog_page': service.get_catalog_page,
+        'route_catalog': route(lambda: '/catalog'),
+        'route_catalog_cached': route(lambda: '/catalog', cached=True),
+        'route_api_search': route(lambda: f'/api/search?q={rng.choice(WORDS)}&type=title'),
+        'route_api_search_cached': route(lambda: f'/api/search?q={rng.choice(WORDS)}&type=title', cached=True),
+    }
+
+
+def run_benchmarks(dataset: Dict, iterations: int, only: Optional[List[str]] = None,
+                   heavy_iterations: Optional[int] = None, seed: int = 327) -> Dict:
+    """
+    Run every benchmark (or the ones named in only) and collect the results.
+
+    get_all_books and /catalog scan the whole catalog, so they use
+    heavy_iterations (default: a tenth of iterations).
+    """
+    heavy = heavy_iterations or max(1, iterations // 10)
+    results = {}
+    for name, operation in build_operations(dataset, seed).items():
+        if only and name not in only:
+            continue
+        count = heavy if name in ('get_all_books', 'route_catalog') else iterations
+        results[name] = measure(operation, count)
+    return {
+        'dataset': dataset,
+        'python': sys.version.split()[0],
+        'results': results,
+    }
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    List the operations whose latency got worse than baseline * (1 + tolerance).
+    Operations missing from either side are ignored.
+    """
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for metric in COMPARED_METRICS:
+            limit = previous[metric] * (1 + tolerance)
+            if previous[metric] > 0 and current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {current[metric]:.3f}ms > {previous[metric]:.3f}ms '
+                    f'(+{(current[metric] / previous[metric] - 1) * 100:.0f}%)'
+                )
+    return regressions
+
+
+def format_report(report: Dict, baseline: Optional[Dict] = None) -> str:
+    lines = [f"{'operation':<24}{'iters':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>11}"
+             + (f"{'base p95':>10}" if baseline else '')]
+    for name, r in report['results'].items():
+        line = (f"{name:<24}{r['iterations']:>7}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}"
+                f"{r['p99_ms']:>10.3f}{r['ops_per_sec']:>11.1f}")
+        if baseline:
+            previous = baseline.get('results', {}).get(name)
+            line += f"{previous['p95_ms']:>10.3f}" if previous else f"{'-':>10}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the library service and routes.')
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--patrons', type=int, default=1000)
+    parser.add_argument('--loans', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--heavy-iterations', type=int, default=None,
+                        help='iterations for full-catalog operations (default: iterations / 10)')
+    parser.add_argument('--only', action='append', help='run only this operation (repeatable)')
+    parser.add_argument('--database', help='database file to generate (default: a temporary file)')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write the JSON report as the new baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown before an operation counts as a regression (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    workdir = None
+    path = args.database
+    if path is None:
+        workdir = tempfile.TemporaryDirectory()
+        path = os.path.join(workdir.name, 'benchmark.db')
+
+    try:
+        dataset = generate_dataset(path, books=args.books, patrons=args.patrons,
+                                   loans=args.loans, seed=args.seed)
+        report = run_benchmarks(dataset, args.iterations, only=args.only,
+                                heavy_iterations=args.heavy_iterations, seed=args.seed)
+    finally:
+        close_all_pools()
+        if workdir is not None:
+            workdir.cleanup()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print(format_report(report, baseline))
+
+    for target in filter(None, [args.output, args.save_baseline]):
+        with open(target, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Report written to {target}')
+
+    if baseline is not None:
+        if baseline.get('dataset') != report['dataset']:
+            print('Warning: baseline was recorded with a different dataset', file=sys.stderr)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print('Regressions:')
+            for line in regressions:
+                print(f'  {line}')
+            return 1
+        print('No regressions against baseline.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
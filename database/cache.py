@@ -0,0 +1,99 @@
+"""
+Cache Module - In-process LRU cache with expiry
+Used by the database helpers to serve repeated book lookups without SQLite
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL = 5.0
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache whose entries also expire after `ttl` seconds.
+
+    The expiry bounds how long another process's writes can go unnoticed;
+    writes made through this process invalidate entries immediately.
+    A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default=None):
+        """Get a cached value, counting the lookup as a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not _MISSING:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value):
+        """Store a value, evicting the least recently used entry when full."""
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def peek(self, key: Hashable, default=None):
+        """Get a value without touching recency, counters or expiry."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def configure(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """Change the size limit and/or expiry; drops all entries."""
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if ttl is not None:
+            self.ttl = ttl
+        self.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+            }
+
+
+# Book rows keyed by ('id', database, book_id) and ('isbn', database, isbn)
+book_cache = LRUCache()
+
+
+def init_app(app):
+    """Size the book cache from BOOK_CACHE_SIZE and BOOK_CACHE_TTL (seconds, 0 disables)."""
+    book_cache.configure(
+        max_entries=app.config.get('BOOK_CACHE_SIZE', DEFAULT_MAX_ENTRIES),
+        ttl=app.config.get('BOOK_CACHE_TTL', DEFAULT_TTL),
+    )
@@ -0,0 +1,403 @@
+"""
+Connection Module - Pooled SQLite connections
+Reuses connections per thread and per Flask request instead of opening a new
+sqlite3 connection for every database helper call
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.request import pathname2url
+
+from flask import current_app, g, has_app_context
+
+import instrumentation
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_PRAGMAS = {
+    'foreign_keys': 'ON',
+}
+
+# Storage profiles: journal_mode is a property of the database file and is set
+# by init_database(); the remaining PRAGMAs are applied to every new connection.
+STORAGE_PROFILES = {
+    # SQLite defaults: rollback journal, writers block readers, fsync per commit
+    'legacy': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+    },
+    # Readers and the writer run concurrently; commits only fsync at
+    # checkpoints, so a power loss (not a process crash) can drop the last
+    # few transactions
+    'wal': {
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,
+        'synchronous': 'NORMAL',
+        'cache_size': -8192,
+        'mmap_size': 134217728,
+        'temp_store': 'MEMORY',
+    },
+    # WAL concurrency with an fsync on every commit
+    'wal-durable': {
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,
+        'synchronous': 'FULL',
+        'cache_size': -8192,
+        'mmap_size': 134217728,
+        'temp_store': 'MEMORY',
+    },
+}
+DEFAULT_STORAGE_PROFILE = 'wal'
+
+_EXTENSION_KEY = 'sqlite_pool'
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+
+class PooledConnection:
+    """
+    Thin proxy around a sqlite3 connection checked out from a pool.
+
+    Everything except close() is forwarded to the real connection, so the
+    existing helpers can keep calling conn.execute(...) / conn.close().
+    close() hands the connection back instead of closing it; nested
+    get_db_connection() calls on the same thread share one connection.
+    After ConnectionPool.suspend() the proxy holds no connection and checks
+    a new one out on its next use.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', raw: sqlite3.Connection):
+        self._pool = pool
+        self._raw: Optional[sqlite3.Connection] = raw
+        self._depth = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._raw is None:
+            self._raw = self._pool._checkout()
+        return self._raw
+
+    def __getattr__(self, name):
+        return getattr(self._connection(), name)
+
+    def __enter__(self):
+        self._connection().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._connection().__exit__(exc_type, exc_value, traceback)
+
+    def execute(self, sql, parameters=()):
+        raw = self._connection()
+        if not instrumentation.is_enabled():
+            return raw.execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return raw.execute(sql, parameters)
+        finally:
+            instrumentation.record_sql(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        raw = self._connection()
+        if not instrumentation.is_enabled():
+            return raw.executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return raw.executemany(sql, seq_of_parameters)
+        finally:
+            instrumentation.record_sql(sql, time.perf_counter() - started)
+
+    def close(self):
+        self._pool.release(self)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections for one database file.
+
+    Args:
+        database: Path (or URI when uri=True) of the database
+        max_size: Maximum number of connections open at the same time
+        pragmas: PRAGMA name -> value applied once when a connection is opened
+        timeout: Seconds to wait for a free connection (also used as the
+                 sqlite busy timeout)
+        uri: Whether database is a sqlite URI
+    """
+
+    def __init__(self, database: str, max_size: int = DEFAULT_POOL_SIZE,
+                 pragmas: Optional[Dict[str, object]] = None,
+                 timeout: float = DEFAULT_TIMEOUT, uri: bool = False):
+        self.database = database
+        self.max_size = max_size
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.timeout = timeout
+        self.uri = uri
+        self._idle: List[sqlite3.Connection] = []
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread is off because a connection may serve different
+        # threads over its lifetime; the pool guarantees one user at a time
+        started = time.perf_counter()
+        conn = sqlite3.connect(self.database, timeout=self.timeout,
+                               check_same_thread=False, uri=self.uri)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        if instrumentation.is_enabled():
+            instrumentation.record_connection_open(time.perf_counter() - started)
+        return conn
+
+    def _checkout(self) -> sqlite3.Connection:
+        with self._cond:
+            while not self._idle and self._open >= self.max_size:
+                if not self._cond.wait(self.timeout):
+                    raise PoolTimeoutError(
+                        f'No database connection available after {self.timeout}s '
+                        f'(pool size {self.max_size}).'
+                    )
+            if self._idle:
+                return self._idle.pop()
+            self._open += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    def _checkin(self, raw: sqlite3.Connection):
+        try:
+            # never hand out a connection with a half-finished transaction
+            if raw.in_transaction:
+                raw.rollback()
+        except sqlite3.Error:
+            self._discard(raw)
+            return
+        with self._cond:
+            # a closed pool is usually forgotten already; nothing would reuse it
+            if not self._closed:
+                self._idle.append(raw)
+                self._cond.notify()
+                return
+        self._discard(raw)
+
+    def _discard(self, raw: sqlite3.Connection):
+        try:
+            raw.close()
+        finally:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+
+    def acquire(self) -> PooledConnection:
+        """Get the connection bound to this thread, checking one out if needed."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = PooledConnection(self, self._checkout())
+            self._local.conn = conn
+            if _pin_to_request(self):
+                # held until the Flask app context is torn down
+                conn._depth += 1
+        conn._depth += 1
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Drop one reference to conn; the last one returns it to the pool."""
+        conn._depth -= 1
+        if conn._depth > 0:
+            return
+        self._local.conn = None
+        if conn._raw is not None:
+            self._checkin(conn._raw)
+
+    def suspend(self):
+        """
+        Hand this thread's connection back to the pool while its proxy stays
+        bound to the thread (and the Flask request), for a thread about to
+        block on another one that needs a connection, such as the group-commit
+        writer. The proxy checks a connection out again when next used.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and conn._raw is not None:
+            raw, conn._raw = conn._raw, None
+            self._checkin(raw)
+
+    def release_thread(self):
+        """Return this thread's connection regardless of outstanding references."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn._depth = 1
+            self.release(conn)
+
+    def close(self):
+        """Close every idle connection; connections still checked out are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for raw in idle:
+            self._discard(raw)
+
+
+def profile_pragmas(profile: str, overrides: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+    """
+    Get the per-connection PRAGMAs of a storage profile (journal_mode excluded),
+    on top of DEFAULT_PRAGMAS and followed by any overrides.
+
+    Raises:
+        ValueError: if the profile is unknown
+    """
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f'Unknown storage profile {profile!r}; '
+                         f'choose one of {", ".join(sorted(STORAGE_PROFILES))}.')
+    pragmas = dict(DEFAULT_PRAGMAS)
+    pragmas.update((name, value) for name, value in STORAGE_PROFILES[profile].items()
+                   if name != 'journal_mode')
+    pragmas.update(overrides or {})
+    return pragmas
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_pool_settings = {
+    'max_size': DEFAULT_POOL_SIZE,
+    'pragmas': profile_pragmas(DEFAULT_STORAGE_PROFILE),
+    'timeout': DEFAULT_TIMEOUT,
+}
+_journal_mode = {'mode': STORAGE_PROFILES[DEFAULT_STORAGE_PROFILE]['journal_mode']}
+
+
+def get_pool(database: str, readonly: bool = False) -> ConnectionPool:
+    """
+    Get (or lazily create) the pool for a database path.
+
+    With readonly=True, database must be a sqlite URI (see readonly_uri) and
+    the connections are additionally put in query_only mode.
+    """
+    pool = _pools.get(database)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(database)
+            if pool is None:
+                settings = dict(_pool_settings)
+                if readonly:
+                    settings['pragmas'] = {**settings['pragmas'], 'query_only': 'ON'}
+                pool = ConnectionPool(database, uri=readonly, **settings)
+                _pools[database] = pool
+    return pool
+
+
+def open_readonly_connection(database: str) -> sqlite3.Connection:
+    """
+    Open an unpooled read-only connection (mode=ro, query_only) with the pool
+    settings, for long-lived readers such as streaming exports that would
+    otherwise hold a pool slot for as long as the client takes to read.
+    The caller must close it.
+    """
+    conn = sqlite3.connect(readonly_uri(database), timeout=_pool_settings['timeout'],
+                           check_same_thread=False, uri=True)
+    conn.row_factory = sqlite3.Row
+    for name, value in {**_pool_settings['pragmas'], 'query_only': 'ON'}.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+def readonly_uri(database: str, immutable: bool = False) -> str:
+    """
+    Build a read-only sqlite URI for a database path (URIs are returned as given).
+
+    immutable=1 also skips all locking and change detection; only use it for
+    a snapshot file that is replaced, never modified, while the app runs.
+    """
+    if database.startswith('file:'):
+        return database
+    uri = f'file:{pathname2url(os.path.abspath(database))}?mode=ro'
+    return uri + '&immutable=1' if immutable else uri
+
+
+def configure_pools(max_size: Optional[int] = None, pragmas: Optional[Dict[str, object]] = None,
+                    timeout: Optional[float] = None, storage_profile: Optional[str] = None):
+    """
+    Change the settings used for new pools and drop the existing ones,
+    so that the next connection is opened with the new settings.
+
+    pragmas are applied on top of the storage profile's PRAGMAs.
+    """
+    if max_size is not None:
+        _pool_settings['max_size'] = max_size
+    if storage_profile is not None:
+        _pool_settings['pragmas'] = profile_pragmas(storage_profile, pragmas)
+        _journal_mode['mode'] = STORAGE_PROFILES[storage_profile]['journal_mode']
+    elif pragmas is not None:
+        _pool_settings['pragmas'] = {**_pool_settings['pragmas'], **pragmas}
+    if timeout is not None:
+        _pool_settings['timeout'] = timeout
+    close_all_pools()
+
+
+def apply_journal_mode(conn) -> str:
+    """
+    Switch the database file to the configured profile's journal mode.
+
+    The mode is stored in the file, so this only needs to happen once per
+    database (init_database does it at start-up). If another process holds a
+    lock the switch is skipped and retried on the next start.
+
+    Returns:
+        str: the journal mode now in effect
+    """
+    try:
+        return conn.execute(f"PRAGMA journal_mode = {_journal_mode['mode']}").fetchone()[0]
+    except sqlite3.OperationalError:
+        return conn.execute('PRAGMA journal_mode').fetchone()[0]
+
+
+def close_all_pools():
+    """Close idle connections of every pool and forget the pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _pin_to_request(pool: ConnectionPool) -> bool:
+    if not has_app_context() or _EXTENSION_KEY not in current_app.extensions:
+        return False
+    g.setdefault('_pinned_pools', []).append(pool)
+    return True
+
+
+def release_request_connections(exception=None):
+    """Flask teardown handler: return connections pinned by this app context."""
+    for pool in g.pop('_pinned_pools', []):
+        conn = getattr(pool._local, 'conn', None)
+        if conn is not None:
+            pool.release(conn)
+
+
+def init_app(app):
+    """
+    Hook the pool into a Flask app so that a request reuses a single
+    connection for all of its queries and returns it on teardown.
+
+    Reads DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_STORAGE_PROFILE (one of
+    STORAGE_PROFILES, default 'wal') and DB_PRAGMAS (extra PRAGMAs on top of
+    the profile) from app.config.
+    """
+    configure_pools(
+        max_size=app.config.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE),
+        pragmas=app.config.get('DB_PRAGMAS', {}),
+        timeout=app.config.get('DB_POOL_TIMEOUT', DEFAULT_TIMEOUT),
+        storage_profile=app.config.get('DB_STORAGE_PROFILE', DEFAULT_STORAGE_PROFILE),
+    )
+    app.extensions[_EXTENSION_KEY] = True
+    app.teardown_appcontext(release_request_connections)
@@ -2,19 +2,88 @@
 Database module for Library Management System
 Handles all database operations and connections
 """
+import re
 import sqlite3
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 # database config
 import os
 
-DATABASE = os.environ.get("", "library.db")
+from database import group_commit
+from database.cache import book_cache
+from database.connection import apply_journal_mode, get_pool, open_readonly_connection, readonly_uri
+from database.isbn import isbn_key, isbn_prefix_range
+from database.migrations import PATRON_TOTALS_SQL, apply_migrations
+from database.prefix_index import suggest_index
+
+DATABASE = os.environ.get("DATABASE", "library.db")
+
+# Optional read-only copy (path or sqlite URI) for catalog, search and report
+# reads; None sends those reads to DATABASE as well
+READONLY_DATABASE = readonly_uri(os.environ["DATABASE_READONLY"]) if os.environ.get("DATABASE_READONLY") else None
+
+# Late fees already paid for the borrow record aliased as br
+AMOUNT_PAID_SQL = '''COALESCE((SELECT SUM(p.amount) FROM late_fee_payments p
+                           WHERE p.borrow_record_id = br.id AND p.status = 'paid'), 0)'''
+
+# Loan dates are mirrored as whole days since this date (borrow_day, due_day, return_day)
+EPOCH_DATE = date(1970, 1, 1)
+
+def to_day_number(value: date) -> int:
+    """Day number (days since 1970-01-01) of a date or datetime."""
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH_DATE).days
+
+def from_day_number(day: int) -> date:
+    """Date for a day number."""
+    return EPOCH_DATE + timedelta(days=day)
+
+# Per-thread bookkeeping for the transaction() currently open, if any
+_transaction_state = threading.local()
 
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """
+    Get a pooled database connection.
+    Calling close() on it returns it to the pool; calls made on the same
+    thread (or within the same Flask request) share one connection.
+    """
+    return get_pool(DATABASE).acquire()
+
+def get_read_connection():
+    """
+    Get a pooled connection for read-only queries.
+    Uses the READONLY_DATABASE copy when one is configured (opened with
+    mode=ro and query_only), so results may lag behind the primary; use
+    get_db_connection() when a read must see this process's own writes.
+    """
+    if READONLY_DATABASE is None:
+        return get_db_connection()
+    return get_pool(READONLY_DATABASE, readonly=True).acquire()
+
+def get_export_connection() -> sqlite3.Connection:
+    """
+    Open a dedicated, unpooled read-only connection to READONLY_DATABASE (or
+    DATABASE). For streaming exports, which keep their connection until the
+    client has read everything; the caller must close it.
+    """
+    return open_readonly_connection(READONLY_DATABASE or DATABASE)
+
+def configure_database(database: str, readonly: Optional[str] = None, immutable: bool = False):
+    """
+    Set the primary database path and the optional read-only copy.
+
+    Args:
+        database: Path of the primary (read/write) database
+        readonly: Path or sqlite URI of a read-only copy, or None
+        immutable: Open the read-only copy with immutable=1 (no locking)
+    """
+    global DATABASE, READONLY_DATABASE
+    DATABASE = database
+    READONLY_DATABASE = readonly_uri(readonly, immutable) if readonly else None
 
 """def get_db_connection():
     #Get a database connection.
@@ -25,6 +94,9 @@ def get_db_connection():
 def init_database():
     """Initialize the database with required tables."""
     conn = get_db_connection()
+
+    # WAL (or whichever journal the storage profile asks for) is stored in the file
+    apply_journal_mode(conn)
     
     # Create books table
     conn.execute('''
@@ -52,6 +124,9 @@ def init_database():
     ''')
     
     conn.commit()
+
+    # Bring indexes and later schema changes up to date
+    apply_migrations(conn)
     conn.close()
 
 def add_sample_data():
@@ -69,9 +144,9 @@ def add_sample_data():
         
         for title, author, isbn, copies in sample_books:
             conn.execute('''
-                INSERT INTO books (title, author, isbn, total_copies, available_copies)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (title, author, isbn, copies, copies))
+                INSERT INTO books (title, author, isbn, isbn13, total_copies, available_copies)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (title, author, isbn, isbn_key(isbn), copies, copies))
         
         # Make 1984 unavailable by adding a borrow record
         conn.execute('''
@@ -92,35 +167,315 @@ def add_sample_data():
 
 def get_all_books() -> List[Dict]:
     """Get all books from the database."""
-    conn = get_db_connection()
+    conn = get_read_connection()
     books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
     conn.close()
     return [dict(book) for book in books]
 
+def _iter_query(query: str, params: tuple = (), batch_size: int = 1000) -> Iterator[List[sqlite3.Row]]:
+    """
+    Yield the rows of a read-only query in batches of batch_size.
+    Runs on its own unpooled connection (get_export_connection), held until
+    the generator is exhausted or closed, so slow consumers do not starve the pool.
+    """
+    conn = get_export_connection()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def iter_books(batch_size: int = 1000) -> Iterator[List[sqlite3.Row]]:
+    """Stream the whole catalog in id order, batch_size rows at a time."""
+    return _iter_query('''
+        SELECT id, title, author, isbn, total_copies, available_copies FROM books ORDER BY id
+    ''', batch_size=batch_size)
+
+def iter_loans(batch_size: int = 1000, patron_id: Optional[str] = None,
+               active_only: bool = False) -> Iterator[List[sqlite3.Row]]:
+    """Stream borrow records in id order, optionally for one patron or only open loans."""
+    query = '''
+        SELECT id, patron_id, book_id, borrow_date, due_date, return_date, late_fee
+        FROM borrow_records br WHERE 1 = 1
+    '''
+    params: list = []
+    if patron_id is not None:
+        query += " AND br.patron_id = ?"
+        params.append(patron_id)
+    if active_only:
+        query += " AND br.return_date IS NULL"
+    query += " ORDER BY br.id"
+    return _iter_query(query, tuple(params), batch_size)
+
+def get_books_page(limit: int, after: Optional[Tuple[str, int]] = None) -> List[Dict]:
+    """
+    Get up to `limit` books in (title, id) order, starting after the
+    (title, id) key of the last book of the previous page.
+    Each page is an index range scan, so its cost does not grow with the catalog.
+    """
+    conn = get_read_connection()
+    if after is None:
+        books = conn.execute('''
+            SELECT * FROM books ORDER BY title, id LIMIT ?
+        ''', (limit,)).fetchall()
+    else:
+        books = conn.execute('''
+            SELECT * FROM books
+            WHERE (title, id) > (?, ?)
+            ORDER BY title, id LIMIT ?
+        ''', (after[0], after[1], limit)).fetchall()
+    conn.close()
+    return [dict(book) for book in books]
+
+def _cache_book(book: Dict):
+    book_cache.set(('id', DATABASE, book['id']), book)
+    book_cache.set(('isbn', DATABASE, isbn_key(book['isbn'])), book)
+
+def invalidate_book(book_id: Optional[int] = None, isbn: Optional[str] = None):
+    """
+    Drop a book from the lookup cache by ID and/or ISBN (in any format).
+    Inside transaction() the book is dropped again after commit, so a reader
+    cannot re-cache the old row while the write is still uncommitted.
+    """
+    for kind, key in (('id', book_id), ('isbn', isbn_key(isbn) if isbn is not None else None)):
+        if key is None:
+            continue
+        cached = book_cache.peek((kind, DATABASE, key))
+        book_cache.delete((kind, DATABASE, key))
+        if cached:
+            book_cache.delete(('id', DATABASE, cached['id']))
+            book_cache.delete(('isbn', DATABASE, isbn_key(cached['isbn'])))
+
+    pending = getattr(_transaction_state, 'invalidations', None)
+    if pending is not None:
+        pending.append((book_id, isbn))
+
+def get_catalog_version() -> int:
+    """
+    Get the catalog version, which changes whenever any book row changes.
+    Read from the same database as the catalog and search queries.
+    """
+    conn = get_read_connection()
+    row = conn.execute('SELECT version FROM catalog_version WHERE id = 1').fetchone()
+    conn.close()
+    return row['version'] if row else 0
+
+def _get_text_version(conn) -> int:
+    """Get the counter bumped by every title/author change (see migration 12)."""
+    row = conn.execute('SELECT text_version FROM catalog_version WHERE id = 1').fetchone()
+    return row['text_version'] if row else 0
+
+def build_suggest_index():
+    """
+    (Re)build the typeahead index from every title and author in the catalog.
+    Reads the primary database, which insert_book keeps the index in step with.
+    """
+    conn = get_db_connection()
+    try:
+        # read before the rows: a change landing in between leaves the index
+        # marked older than its contents, so it is rebuilt again rather than missed
+        version = _get_text_version(conn)
+        suggest_index.rebuild(((row['title'], row['author']) for row in conn.execute(
+            'SELECT title, author FROM books')), source=DATABASE, version=version)
+    finally:
+        conn.close()
+
+def get_suggestions(prefix: str, limit: int = 10, kind: Optional[str] = None) -> List[Dict]:
+    """
+    Get title/author completions for a word prefix from the in-memory index.
+    The index is rebuilt when it was built for another DATABASE or an older
+    catalog text version, so titles and authors changed by other processes or
+    a bulk import show up; insert_book updates it in place.
+    """
+    conn = get_db_connection()
+    version = _get_text_version(conn)
+    conn.close()
+    if suggest_index.source != DATABASE or suggest_index.version != version:
+        build_suggest_index()
+    return suggest_index.suggest(prefix, limit, kind)
+
+def get_book_cache_stats() -> Dict[str, int]:
+    """Get hit/miss/eviction counters and size of the book lookup cache."""
+    return book_cache.stats()
+
 def get_book_by_id(book_id: int) -> Optional[Dict]:
-    """Get a specific book by ID."""
+    """Get a specific book by ID (read through the book cache)."""
+    cached = book_cache.get(('id', DATABASE, book_id))
+    if cached is not None:
+        return dict(cached)
+
     conn = get_db_connection()
     book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    if not book:
+        return None
+    book = dict(book)
+    _cache_book(book)
+    return dict(book)
 
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
-    """Get a specific book by ISBN."""
+    """
+    Get a specific book by ISBN (read through the book cache).
+    ISBN-10, ISBN-13, hyphenated and spaced forms all find the same book.
+    """
+    key = isbn_key(isbn)
+    cached = book_cache.get(('isbn', DATABASE, key))
+    if cached is not None:
+        return dict(cached)
+
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    book = conn.execute('SELECT * FROM books WHERE isbn13 = ?', (key,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    if not book:
+        return None
+    book = dict(book)
+    _cache_book(book)
+    return dict(book)
+
+def get_books_by_isbn_prefix(prefix: str, limit: int = 100) -> List[Dict]:
+    """
+    Get books whose ISBN-13 starts with prefix (e.g. a publisher's range),
+    as one range scan of the isbn13 index, in ISBN order.
+    """
+    key_range = isbn_prefix_range(prefix)
+    if key_range is None:
+        return []
+    conn = get_read_connection()
+    books = conn.execute('''
+        SELECT * FROM books WHERE isbn13 >= ? AND isbn13 < ? ORDER BY isbn13 LIMIT ?
+    ''', (*key_range, limit)).fetchall()
+    conn.close()
+    return [dict(book) for book in books]
+
+def _missing_search_index(error: sqlite3.OperationalError) -> bool:
+    """True when a search index table or its FTS5 module is absent (not for locks or bad queries)."""
+    message = str(error)
+    return message.startswith('no such table') or message.startswith('no such module')
+
+def search_books_fulltext(search_term: str, limit: int = 100) -> List[Dict]:
+    """
+    Search titles and authors through the FTS5 index.
+    Every word of search_term must match the start of a word in the title or
+    author; results are ranked by BM25 with title matches weighted higher.
+    Falls back to a LIKE scan when the database has no FTS5 index.
+    """
+    words = re.findall(r'\w+', search_term)
+    if not words:
+        return []
+    match = ' '.join('"' + word + '"*' for word in words)
+
+    conn = get_read_connection()
+    try:
+        books = conn.execute('''
+            SELECT b.* FROM books_fts
+            JOIN books b ON b.id = books_fts.rowid
+            WHERE books_fts MATCH ?
+            ORDER BY bm25(books_fts, 2.0, 1.0), b.title
+            LIMIT ?
+        ''', (match, limit)).fetchall()
+    except sqlite3.OperationalError as e:
+        if not _missing_search_index(e):
+            raise
+        pattern = f"%{search_term.strip()}%"
+        books = conn.execute('''
+            SELECT * FROM books
+            WHERE LOWER(title) LIKE LOWER(?) OR LOWER(author) LIKE LOWER(?)
+            ORDER BY title
+            LIMIT ?
+        ''', (pattern, pattern, limit)).fetchall()
+    finally:
+        conn.close()
+    return [dict(book) for book in books]
+
+# Minimum trigram similarity (0-1) for a fuzzy search match
+FUZZY_THRESHOLD = 0.3
+
+def trigrams(text: str) -> set:
+    """
+    Trigrams of each word of text, lowercased and padded with two leading
+    and one trailing space (as in PostgreSQL's pg_trgm), so word starts weigh more.
+    """
+    grams = set()
+    for word in re.findall(r'\w+', text.lower()):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def trigram_similarity(term: str, text: str) -> float:
+    """
+    Similarity of term to the best-matching run of words in text: shared
+    trigrams over all trigrams (Jaccard), 1.0 for an exact word match.
+    """
+    term_grams = trigrams(term)
+    if not term_grams:
+        return 0.0
+    words = re.findall(r'\w+', text)
+    span = max(1, len(re.findall(r'\w+', term)))
+    best = 0.0
+    for start in range(max(1, len(words) - span + 1)):
+        grams = trigrams(' '.join(words[start:start + span]))
+        if grams:
+            best = max(best, len(term_grams & grams) / len(term_grams | grams))
+    return best
+
+def search_books_fuzzy(search_term: str, limit: int = 100, threshold: float = FUZZY_THRESHOLD,
+                       candidates: int = 200) -> List[Dict]:
+    """
+    Typo-tolerant search over titles and authors.
+
+    The trigram index supplies the `candidates` books matching any trigram of
+    search_term with the best bm25 rank (rarer shared trigrams weigh more than
+    common ones); each is scored with trigram_similarity against its title and
+    author, and those scoring at least threshold are returned best first with
+    a 'similarity' key. Falls back to scoring every book when the database has
+    no trigram index.
+    """
+    words = re.findall(r'\w+', search_term.lower())
+    grams = {word[i:i + 3] for word in words for i in range(len(word) - 2)}
+    if not grams:
+        return []
+    match = ' OR '.join('"' + gram.replace('"', '""') + '"' for gram in sorted(grams))
+
+    conn = get_read_connection()
+    try:
+        rows = conn.execute('''
+            SELECT b.* FROM books_trigram
+            JOIN books b ON b.id = books_trigram.rowid
+            WHERE books_trigram MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        ''', (match, candidates)).fetchall()
+    except sqlite3.OperationalError as e:
+        if not _missing_search_index(e):
+            raise
+        rows = conn.execute('SELECT * FROM books').fetchall()
+    finally:
+        conn.close()
+
+    term = ' '.join(words)
+    scored = []
+    for row in rows:
+        similarity = max(trigram_similarity(term, row['title']), trigram_similarity(term, row['author']))
+        if similarity >= threshold:
+            scored.append(dict(row, similarity=round(similarity, 3)))
+    scored.sort(key=lambda book: (-book['similarity'], book['title']))
+    return scored[:limit]
 
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
     conn = get_db_connection()
+    # ISO timestamps compare correctly as strings, so SQLite flags overdue rows
     records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+        SELECT br.*, b.title, b.author, br.due_date < ? AS is_overdue
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
         ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
+    ''', (datetime.now().isoformat(), patron_id)).fetchall()
     conn.close()
     
     borrowed_books = []
@@ -131,80 +486,507 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
             'author': record['author'],
             'borrow_date': datetime.fromisoformat(record['borrow_date']),
             'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+            'is_overdue': bool(record['is_overdue'])
         })
     
     return borrowed_books
 
-def get_patron_borrow_count(patron_id: str) -> int:
-    """Get the number of books currently borrowed by a patron."""
+def get_active_loans(as_of: date, patron_ids: Optional[List[str]] = None, overdue_only: bool = False,
+                     loan_days: int = 14, use_primary: bool = False) -> List[Dict]:
+    """
+    Get open loans (optionally for some patrons) with days overdue computed in SQL.
+    days_overdue counts whole days past borrow date + loan_days as of the given date,
+    so a whole library's loans are costed in one query; overdue_only filters on
+    the indexed borrow_day.
+
+    Reads the read-only copy unless use_primary is set, which charging and
+    accrual must do: a lagging copy would miss payments made moments ago.
+    """
+    query = '''
+        SELECT br.id AS borrow_record_id, br.patron_id, br.book_id, b.title,
+               br.borrow_date, br.due_date,
+               MAX(0, ? - br.borrow_day - ?) AS days_overdue,
+               ''' + AMOUNT_PAID_SQL + ''' AS amount_paid
+        FROM borrow_records br
+        JOIN books b ON b.id = br.book_id
+        WHERE br.return_date IS NULL
+    '''
+    as_of_day = to_day_number(as_of)
+    params: list = [as_of_day, loan_days]
+    if patron_ids is not None:
+        query += f" AND br.patron_id IN ({', '.join('?' for _ in patron_ids)})"
+        params.extend(patron_ids)
+    if overdue_only:
+        query += " AND br.borrow_day < ?"
+        params.append(as_of_day - loan_days)
+    query += " ORDER BY br.patron_id, br.borrow_date"
+
+    conn = get_db_connection() if use_primary else get_read_connection()
+    loans = conn.execute(query, params).fetchall()
+    conn.close()
+    return [dict(loan) for loan in loans]
+
+def replace_overdue_loans(loans: List[Dict], accrued_on: date) -> int:
+    """
+    Replace the materialised overdue loans with a fresh accrual in one transaction.
+
+    Args:
+        loans: Dicts with borrow_record_id, patron_id, book_id, due_date,
+               days_overdue, fee_amount and amount_due
+        accrued_on: Date the fees were calculated for
+
+    Returns:
+        int: number of rows stored
+    """
+    with transaction() as conn:
+        conn.execute('DELETE FROM overdue_loans')
+        conn.executemany('''
+            INSERT INTO overdue_loans (borrow_record_id, patron_id, book_id, due_date,
+                                       days_overdue, fee_amount, amount_due, accrued_on)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(loan['borrow_record_id'], loan['patron_id'], loan['book_id'], loan['due_date'],
+               loan['days_overdue'], loan['fee_amount'], loan['amount_due'], accrued_on.isoformat())
+              for loan in loans])
+    return len(loans)
+
+def get_overdue_loans(patron_ids: Optional[List[str]] = None) -> List[Dict]:
+    """Get materialised overdue loans (with book titles), optionally for some patrons."""
+    query = '''
+        SELECT o.*, b.title FROM overdue_loans o
+        JOIN books b ON b.id = o.book_id
+    '''
+    params: list = []
+    if patron_ids is not None:
+        query += f" WHERE o.patron_id IN ({', '.join('?' for _ in patron_ids)})"
+        params.extend(patron_ids)
+    query += " ORDER BY o.patron_id, o.due_date"
+
+    conn = get_read_connection()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_overdue_totals(limit: int = 100, patron_ids: Optional[List[str]] = None) -> List[Dict]:
+    """Get per-patron overdue loan counts and totals, patrons owing the most first."""
+    query = '''
+        SELECT patron_id, COUNT(*) AS overdue_loans,
+               ROUND(SUM(fee_amount), 2) AS total_fees, ROUND(SUM(amount_due), 2) AS total_due,
+               MAX(accrued_on) AS accrued_on
+        FROM overdue_loans
+    '''
+    params: list = []
+    if patron_ids is not None:
+        query += f" WHERE patron_id IN ({', '.join('?' for _ in patron_ids)})"
+        params.extend(patron_ids)
+    query += " GROUP BY patron_id ORDER BY total_due DESC, patron_id LIMIT ?"
+    params.append(limit)
+
+    conn = get_read_connection()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def get_patron_loans(patron_id: str, as_of: date, history_limit: int, history_offset: int = 0,
+                     loan_days: int = 14) -> List[Dict]:
+    """
+    Get a patron's open loans plus one page of returned loans in a single query.
+    Open loans carry days_overdue as of the given date and the late fees already paid.
+    """
+    conn = get_read_connection()
+    records = conn.execute('''
+        SELECT br.id AS borrow_record_id, br.book_id, b.title, b.author,
+               br.borrow_date, br.due_date, br.return_date,
+               MAX(0, ? - br.borrow_day - ?) AS days_overdue,
+               ''' + AMOUNT_PAID_SQL + ''' AS amount_paid
+        FROM borrow_records br
+        JOIN books b ON b.id = br.book_id
+        WHERE br.patron_id = ?
+          AND (br.return_date IS NULL OR br.id IN (
+                SELECT h.id FROM borrow_records h
+                WHERE h.patron_id = ? AND h.return_date IS NOT NULL
+                ORDER BY h.return_date DESC, h.id DESC
+                LIMIT ? OFFSET ?))
+    ''', (to_day_number(as_of), loan_days, patron_id, patron_id, history_limit, history_offset)).fetchall()
+    conn.close()
+    return [dict(record) for record in records]
+
+def get_patron_history_count(patron_id: str) -> int:
+    """Get the number of loans a patron has returned (the size of their borrowing history)."""
+    conn = get_read_connection()
+    row = conn.execute('''
+        SELECT COUNT(*) AS total FROM borrow_records WHERE patron_id = ? AND return_date IS NOT NULL
+    ''', (patron_id,)).fetchone()
+    conn.close()
+    return row['total']
+
+def get_patron_borrow_count(patron_id: str, conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Get the number of books currently borrowed by a patron (maintained counter).
+    When conn is given the count is read inside that open transaction.
+    """
+    return get_patron_summary(patron_id, conn)['active_loans']
+
+def get_patron_summary(patron_id: str, conn: Optional[sqlite3.Connection] = None) -> Dict:
+    """
+    Get a patron's maintained counters: active_loans and outstanding_fees
+    (late fees assessed on returned loans and not yet paid).
+    Patrons without any loans get zeros.
+    When conn is given the counters are read inside that open transaction.
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection()
+    row = conn.execute('''
+        SELECT active_loans, outstanding_fees FROM patrons WHERE patron_id = ?
+    ''', (patron_id,)).fetchone()
+    if owns_conn:
+        conn.close()
+    if row is None:
+        return {'patron_id': patron_id, 'active_loans': 0, 'outstanding_fees': 0.0}
+    return {'patron_id': patron_id, 'active_loans': row['active_loans'],
+            'outstanding_fees': row['outstanding_fees']}
+
+def verify_patron_summaries() -> List[Dict]:
+    """
+    Compare the patrons counters with totals recomputed from borrow_records.
+
+    Returns:
+        list: one dict per patron whose counters differ (patron_id, stored_*
+              and expected_* values); empty when everything matches
+    """
     conn = get_db_connection()
-    count = conn.execute('''
-        SELECT COUNT(*) as count FROM borrow_records 
-        WHERE patron_id = ? AND return_date IS NULL
-    ''', (patron_id,)).fetchone()['count']
+    rows = conn.execute('''
+        WITH expected AS (''' + PATRON_TOTALS_SQL + ''')
+        SELECT * FROM (
+            SELECT e.patron_id,
+                   p.active_loans AS stored_active_loans, e.active_loans AS expected_active_loans,
+                   p.outstanding_fees AS stored_outstanding_fees, e.outstanding_fees AS expected_outstanding_fees
+            FROM expected e LEFT JOIN patrons p ON p.patron_id = e.patron_id
+            UNION ALL
+            SELECT p.patron_id, p.active_loans, NULL, p.outstanding_fees, NULL
+            FROM patrons p WHERE p.patron_id NOT IN (SELECT patron_id FROM expected)
+        )
+        WHERE COALESCE(stored_active_loans, 0) != COALESCE(expected_active_loans, 0)
+           OR ABS(COALESCE(stored_outstanding_fees, 0) - COALESCE(expected_outstanding_fees, 0)) >= 0.005
+        ORDER BY patron_id
+    ''').fetchall()
     conn.close()
-    return count
+    return [dict(row) for row in rows]
+
+def rebuild_patron_summaries() -> int:
+    """Recompute every patrons row from borrow_records. Returns the number of patrons."""
+    with transaction() as conn:
+        conn.execute('DELETE FROM patrons')
+        return conn.execute(
+            'INSERT INTO patrons (patron_id, active_loans, outstanding_fees) ' + PATRON_TOTALS_SQL
+        ).rowcount
 
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
-    """Insert a new book into the database."""
+    """
+    Insert a new book into the database.
+    Fails if a book with the same isbn_key() exists, so an ISBN-10 and its
+    ISBN-13 twin cannot both be catalogued.
+    """
     conn = get_db_connection()
     try:
         conn.execute('''
-            INSERT INTO books (title, author, isbn, total_copies, available_copies)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, author, isbn, total_copies, available_copies))
+            INSERT INTO books (title, author, isbn, isbn13, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (title, author, isbn, isbn_key(isbn), total_copies, available_copies))
+        version = _get_text_version(conn)
         conn.commit()
         conn.close()
+        invalidate_book(isbn=isbn)
+        if suggest_index.source == DATABASE:
+            suggest_index.add_book(title, author, version)
         return True
     except Exception as e:
         conn.close()
         return False
 
-def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
-    """Insert a new borrow record into the database."""
+def get_existing_isbns(isbns: List[str]) -> set:
+    """
+    Get which of the given ISBNs are already in the catalog, in batched lookups.
+    Matches on the normalised key, so an ISBN-10 finds its ISBN-13 twin.
+    """
+    keys = {}
+    for isbn in isbns:
+        keys.setdefault(isbn_key(isbn), []).append(isbn)
+    existing = set()
     conn = get_db_connection()
+    batches = list(keys)
+    for start in range(0, len(batches), 500):
+        batch = batches[start:start + 500]
+        rows = conn.execute(
+            f"SELECT isbn13 FROM books WHERE isbn13 IN ({', '.join('?' for _ in batch)})", batch).fetchall()
+        for row in rows:
+            existing.update(keys[row['isbn13']])
+    conn.close()
+    return existing
+
+def insert_books_bulk(books: List[Tuple[str, str, str, int, int]]) -> int:
+    """
+    Insert many (title, author, isbn, total_copies, available_copies) rows with
+    executemany in one transaction. Rows whose ISBN (by isbn_key) already
+    exists are skipped.
+
+    Returns:
+        int: number of books inserted
+    """
+    with transaction() as conn:
+        inserted = conn.executemany('''
+            INSERT OR IGNORE INTO books (title, author, isbn, total_copies, available_copies, isbn13)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ((*book, isbn_key(book[2])) for book in books)).rowcount
+    if inserted:
+        # rebuilt on the next suggestion lookup; cleared only after the commit,
+        # so that rebuild cannot read the catalog from before the import
+        suggest_index.clear()
+    return inserted
+
+def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                         conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Insert a new borrow record into the database.
+    When conn is given the insert joins that open transaction and is not committed here.
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection()
     try:
         conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
-        conn.commit()
-        conn.close()
+        if owns_conn:
+            conn.commit()
         return True
     except Exception as e:
-        conn.close()
         return False
+    finally:
+        if owns_conn:
+            conn.close()
 
-def update_book_availability(book_id: int, change: int) -> bool:
-    """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
-    conn = get_db_connection()
+def update_book_availability(book_id: int, change: int, conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Update the available copies of a book by a given amount (+1 for return, -1 for borrow).
+    The update is conditional, so available copies never drop below 0 or rise above
+    total copies; returns False when no row was changed.
+    When conn is given the update joins that open transaction and is not committed here.
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection()
     try:
-        conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
-        conn.commit()
-        conn.close()
-        return True
+        if change < 0:
+            cursor = conn.execute('''
+                UPDATE books SET available_copies = available_copies + ?
+                WHERE id = ? AND available_copies >= ?
+            ''', (change, book_id, -change))
+        else:
+            cursor = conn.execute('''
+                UPDATE books SET available_copies = MIN(total_copies, available_copies + ?)
+                WHERE id = ?
+            ''', (change, book_id))
+        if owns_conn:
+            conn.commit()
+        invalidate_book(book_id)
+        return cursor.rowcount == 1
     except Exception as e:
-        conn.close()
         return False
+    finally:
+        if owns_conn:
+            conn.close()
 
-def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
-    """Update the return date for a borrow record."""
-    conn = get_db_connection()
+def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime,
+                                     conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Update the return date for a borrow record. Returns False when there was no open record.
+    When conn is given the update joins that open transaction and is not committed here.
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection()
     try:
-        conn.execute('''
+        cursor = conn.execute('''
             UPDATE borrow_records 
             SET return_date = ? 
             WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
         ''', (return_date.isoformat(), patron_id, book_id))
+        if owns_conn:
+            conn.commit()
+        return cursor.rowcount > 0
+    except Exception as e:
+        return False
+    finally:
+        if owns_conn:
+            conn.close()
+
+def set_borrow_record_late_fee(record_id: int, late_fee: float,
+                               conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Store the late fee assessed when a loan was returned.
+    When conn is given the update joins that open transaction and is not committed here.
+    """
+    owns_conn = conn is None
+    if owns_conn:
+        conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE borrow_records SET late_fee = ? WHERE id = ?
+        ''', (round(late_fee, 2), record_id))
+        if owns_conn:
+            conn.commit()
+        return cursor.rowcount == 1
+    except Exception as e:
+        return False
+    finally:
+        if owns_conn:
+            conn.close()
+
+def get_books_for_checkout(patron_id: str, book_ids: List[int], conn: sqlite3.Connection) -> Tuple[int, Dict[int, Dict]]:
+    """
+    Get a patron's active loan count and the requested books in one query.
+    Meant to run inside transaction() so the answer holds until commit.
+
+    Returns:
+        tuple: (active loans, {book_id: book dict} for the ids that exist)
+    """
+    placeholders = ', '.join('?' for _ in book_ids)
+    rows = conn.execute(f'''
+        SELECT (SELECT active_loans FROM patrons WHERE patron_id = ?) AS patron_active_loans, b.*
+        FROM (SELECT 1) LEFT JOIN books b ON b.id IN ({placeholders})
+    ''', (patron_id, *book_ids)).fetchall()
+    active_loans = rows[0]['patron_active_loans'] or 0
+    books = {row['id']: {key: row[key] for key in row.keys() if key != 'patron_active_loans'}
+             for row in rows if row['id'] is not None}
+    return active_loans, books
+
+def get_open_loans_for_books(patron_id: str, book_ids: List[int], as_of: date, loan_days: int,
+                             conn: sqlite3.Connection) -> List[Dict]:
+    """Get a patron's open loans of the given books, oldest first, with days_overdue and amount_paid."""
+    placeholders = ', '.join('?' for _ in book_ids)
+    rows = conn.execute(f'''
+        SELECT br.id AS borrow_record_id, br.book_id, br.borrow_date, br.due_date,
+               MAX(0, ? - br.borrow_day - ?) AS days_overdue,
+               ''' + AMOUNT_PAID_SQL + f''' AS amount_paid
+        FROM borrow_records br
+        WHERE br.patron_id = ? AND br.return_date IS NULL AND br.book_id IN ({placeholders})
+        ORDER BY br.borrow_date, br.id
+    ''', (to_day_number(as_of), loan_days, patron_id, *book_ids)).fetchall()
+    return [dict(row) for row in rows]
+
+def close_borrow_record(record_id: int, return_date: datetime, late_fee: float,
+                        conn: sqlite3.Connection) -> bool:
+    """Close one open borrow record with its return date and assessed late fee."""
+    cursor = conn.execute('''
+        UPDATE borrow_records SET return_date = ?, late_fee = ?
+        WHERE id = ? AND return_date IS NULL
+    ''', (return_date.isoformat(), round(late_fee, 2), record_id))
+    return cursor.rowcount == 1
+
+def get_returned_loans_owing(patron_ids: List[str], book_id: Optional[int] = None) -> List[Dict]:
+    """
+    Get returned loans whose assessed late fee is not fully paid, oldest return first,
+    optionally for one book. Each carries fee_amount (the assessed fee), amount_paid
+    and amount_due. Reads the primary, since it decides what a patron is charged.
+    """
+    query = f'''
+        SELECT * FROM (
+            SELECT br.id AS borrow_record_id, br.patron_id, br.book_id, b.title,
+                   br.borrow_date, br.due_date, br.return_date, br.late_fee AS fee_amount,
+                   ''' + AMOUNT_PAID_SQL + f''' AS amount_paid
+            FROM borrow_records br
+            JOIN books b ON b.id = br.book_id
+            WHERE br.return_date IS NOT NULL AND br.late_fee > 0
+              AND br.patron_id IN ({', '.join('?' for _ in patron_ids)})
+    '''
+    params: list = list(patron_ids)
+    if book_id is not None:
+        query += " AND br.book_id = ?"
+        params.append(book_id)
+    query += ") WHERE ROUND(fee_amount - amount_paid, 2) > 0 ORDER BY patron_id, return_date, borrow_record_id"
+
+    conn = get_db_connection()
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    loans = [dict(row) for row in rows]
+    for loan in loans:
+        loan['amount_due'] = round(loan['fee_amount'] - loan['amount_paid'], 2)
+    return loans
+
+def record_late_fee_payments(payments: List[Tuple[int, str, float, Optional[str], str, str]]) -> bool:
+    """
+    Record payment outcomes, one row per loan, in a single transaction.
+    Each payment is (borrow_record_id, patron_id, amount, transaction_id, status, message)
+    where status is 'paid' or 'failed'.
+    """
+    created_at = datetime.now().isoformat()
+    conn = get_db_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO late_fee_payments
+                (borrow_record_id, patron_id, amount, transaction_id, status, message, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [payment + (created_at,) for payment in payments])
         conn.commit()
-        conn.close()
         return True
     except Exception as e:
-        conn.close()
         return False
+    finally:
+        conn.close()
+
+@contextmanager
+def transaction():
+    """
+    Open a write transaction with BEGIN IMMEDIATE and commit it once on success.
+
+    The write lock is taken up front, so concurrent writers (threads or worker
+    processes) queue on the busy timeout instead of failing halfway through.
+    Any exception rolls the whole transaction back. Helpers that take a conn
+    argument must be given the yielded connection to join the transaction.
+    """
+    conn = get_db_connection()
+    _transaction_state.invalidations = []
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        invalidations, _transaction_state.invalidations = _transaction_state.invalidations, None
+        for book_id, isbn in invalidations:
+            invalidate_book(book_id, isbn)
+        conn.close()
+
+def run_in_transaction(operation: Callable[[sqlite3.Connection], Tuple]) -> Tuple:
+    """
+    Run operation(conn) as one unit of work.
+    The operation returns a tuple whose first item is a success flag; when it is
+    False everything the operation wrote is rolled back.
+
+    With group commit enabled the operation is handed to the writer thread and
+    committed together with other callers' operations; it still returns only
+    once its writes are committed. A thread that already holds transaction()
+    never queues, since the writer would wait on that thread's write lock.
+    The caller's pooled connection (pinned for the rest of a Flask request) is
+    handed back while it waits, or a pool full of waiting callers would leave
+    the writer without one.
+    """
+    writer = group_commit.active_writer()
+    if writer is not None and getattr(_transaction_state, 'invalidations', None) is None:
+        get_pool(DATABASE).suspend()
+        return writer.submit(operation)
+
+    with transaction() as conn:
+        result = operation(conn)
+        if not result[0]:
+            conn.rollback()
+    return result
 # my experimental functions
 # kindly ignore
 def check_borrow_limit(patron_id: str, max_books_allowed: int = 5) -> bool:
@@ -214,9 +996,10 @@ def check_borrow_limit(patron_id: str, max_books_allowed: int = 5) -> bool:
 def get_patron_borrow_record(patron_id: str, book_id: int):
     conn = get_db_connection()
     record = conn.execute('''
-        SELECT * FROM borrow_records
-        WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ORDER BY borrow_date ASC
+        SELECT br.*, ''' + AMOUNT_PAID_SQL + ''' AS amount_paid
+        FROM borrow_records br
+        WHERE br.patron_id = ? AND br.book_id = ? AND br.return_date IS NULL
+        ORDER BY br.borrow_date ASC, br.id ASC
         LIMIT 1
     ''', (patron_id, book_id)).fetchone()
     conn.close()
@@ -0,0 +1,155 @@
+"""
+Group Commit Module - Coalesces concurrent write transactions
+A single writer thread collects the units of work submitted within a few
+milliseconds of each other and runs them in one SQLite transaction, so a
+burst of borrows/returns pays for one lock acquisition and one commit
+instead of one each.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, ContextManager, Optional, Tuple
+
+DEFAULT_MAX_DELAY = 0.002
+DEFAULT_MAX_BATCH = 64
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Writer thread running submitted operations in shared transactions.
+
+    Operations follow the run_in_transaction protocol: operation(conn)
+    returns a tuple whose first item is a success flag. Each one runs under
+    its own SAVEPOINT, so an operation that fails (or raises) is rolled back
+    on its own while the rest of the batch commits. submit() returns only
+    after the batch has committed, so callers keep their durability and
+    per-call results.
+
+    Args:
+        transaction: Context manager factory yielding a connection inside
+                     an open write transaction (database.transaction)
+        max_delay: Seconds to wait for more operations after the first one
+        max_batch: Maximum operations per transaction
+    """
+
+    def __init__(self, transaction: Callable[[], ContextManager], max_delay: float = DEFAULT_MAX_DELAY,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        self._transaction = transaction
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.batches = 0
+        self.operations = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, operation: Callable) -> Tuple:
+        """Run operation(conn) in the next group transaction and return its result."""
+        future: Future = Future()
+        self._queue.put((operation, future))
+        return future.result()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Finish the queued operations and stop the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _collect(self, first) -> Tuple[list, bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch, stopping = self._collect(first)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            with self._transaction() as conn:
+                for operation, future in batch:
+                    conn.execute('SAVEPOINT group_item')
+                    try:
+                        result = operation(conn)
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO group_item')
+                        outcomes.append((future, None, e))
+                    else:
+                        if not result[0]:
+                            conn.execute('ROLLBACK TO group_item')
+                        outcomes.append((future, result, None))
+                    conn.execute('RELEASE group_item')
+        except Exception as e:
+            # BEGIN or COMMIT failed: nothing in the batch was written
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.operations += len(batch)
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_writer: Optional[GroupCommitWriter] = None
+_writer_lock = threading.Lock()
+
+
+def active_writer() -> Optional[GroupCommitWriter]:
+    """The running group-commit writer, or None when writes commit individually."""
+    return _writer
+
+
+def enable(max_delay: float = DEFAULT_MAX_DELAY, max_batch: int = DEFAULT_MAX_BATCH) -> GroupCommitWriter:
+    """Start (or restart with new settings) the group-commit writer."""
+    global _writer
+    from database.database import transaction
+
+    with _writer_lock:
+        previous, _writer = _writer, GroupCommitWriter(transaction, max_delay, max_batch)
+    if previous is not None:
+        previous.stop()
+    return _writer
+
+
+def disable():
+    """Stop the writer after draining its queue; writes commit individually again."""
+    global _writer
+    with _writer_lock:
+        previous, _writer = _writer, None
+    if previous is not None:
+        previous.stop()
+
+
+def init_app(app):
+    """
+    Enable group commit when DB_GROUP_COMMIT is true, using
+    DB_GROUP_COMMIT_DELAY (seconds) and DB_GROUP_COMMIT_MAX_BATCH.
+    """
+    if not app.config.get('DB_GROUP_COMMIT', False):
+        return None
+    return enable(app.config.get('DB_GROUP_COMMIT_DELAY', DEFAULT_MAX_DELAY),
+                  app.config.get('DB_GROUP_COMMIT_MAX_BATCH', DEFAULT_MAX_BATCH))
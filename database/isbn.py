@@ -0,0 +1,87 @@
+"""
+ISBN Module - Normalisation, checksums and lookup keys for ISBNs
+Books are indexed by a 13-digit key (books.isbn13), so hyphenated, spaced
+and ISBN-10 input all resolve to the same index entry.
+"""
+import re
+from typing import Optional, Tuple
+
+_SEPARATORS = re.compile(r'[ -]')
+
+def _strip(value: str) -> str:
+    return _SEPARATORS.sub('', value or '').upper()
+
+
+def isbn13_check_digit(first12: str) -> str:
+    """Check digit for the first 12 digits of an ISBN-13."""
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def is_isbn10_shaped(isbn: str) -> bool:
+    """True for 9 digits followed by a digit or X, whatever the check digit."""
+    return bool(re.fullmatch(r'\d{9}[\dX]', isbn))
+
+
+def isbn10_is_valid(isbn: str) -> bool:
+    """True for 9 digits followed by a digit or X whose weighted sum is divisible by 11."""
+    if not is_isbn10_shaped(isbn):
+        return False
+    digits = [10 if c == 'X' else int(c) for c in isbn]
+    return sum((10 - i) * d for i, d in enumerate(digits)) % 11 == 0
+
+
+def isbn13_is_valid(isbn: str) -> bool:
+    """True for 13 digits starting 978 or 979 with a correct check digit."""
+    return bool(re.fullmatch(r'97[89]\d{10}', isbn)) and isbn13_check_digit(isbn[:12]) == isbn[12]
+
+
+def isbn10_to_isbn13(isbn10: str) -> str:
+    """The 978-prefixed ISBN-13 for an ISBN-10 (its own check digit is dropped)."""
+    first12 = '978' + isbn10[:9]
+    return first12 + isbn13_check_digit(first12)
+
+
+def normalize_isbn(value: str) -> Optional[str]:
+    """
+    Canonical ISBN-13 for an ISBN-10 or ISBN-13, with or without hyphens and
+    spaces, or None if it is not a valid ISBN.
+    """
+    isbn = _strip(value)
+    if isbn10_is_valid(isbn):
+        return isbn10_to_isbn13(isbn)
+    if isbn13_is_valid(isbn):
+        return isbn
+    return None
+
+
+def isbn_key(value: str) -> str:
+    """
+    Lookup key stored in books.isbn13: separators removed and valid ISBN-10s
+    converted to ISBN-13. Anything else (including ISBN-13s, which are not
+    checked) is kept as it is, so catalogue entries with non-standard codes
+    are still found by their code and a mistyped ISBN-10 does not map onto
+    another book's ISBN-13.
+    """
+    isbn = _strip(value)
+    if isbn10_is_valid(isbn):
+        return isbn10_to_isbn13(isbn)
+    return isbn
+
+
+def isbn_prefix_range(prefix: str) -> Optional[Tuple[str, str]]:
+    """
+    Key range [low, high) holding every ISBN-13 that starts with prefix.
+
+    A prefix that cannot begin with 978/979 is taken as the start of an
+    ISBN-10 (e.g. the '0-306' publisher range) and given the 978 prefix.
+    Returns None when the prefix has no digits or more than 13.
+    """
+    digits = _strip(prefix)
+    if not digits.isdigit() or len(digits) > 13:
+        return None
+    if not ('978'.startswith(digits[:3]) or '979'.startswith(digits[:3])):
+        digits = '978' + digits
+        if len(digits) > 13:
+            return None
+    return digits, digits[:-1] + chr(ord(digits[-1]) + 1)
@@ -0,0 +1,416 @@
+"""
+Migrations Module - Versioned schema changes
+Each migration runs once, in version order, inside its own write transaction.
+The schema version of a database file is kept in PRAGMA user_version.
+"""
+import sqlite3
+from collections import namedtuple
+from typing import Callable, List
+
+from database.isbn import isbn_key
+
+Migration = namedtuple('Migration', ['version', 'description', 'apply'])
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str) -> Callable:
+    """Register func(conn) as the migration that brings the schema to `version`."""
+    def register(func):
+        MIGRATIONS.append(Migration(version, description, func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return register
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the schema version recorded in the database file."""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def latest_version() -> int:
+    """Get the version the newest registered migration brings the schema to."""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Bring the database up to the latest schema version.
+
+    Safe to call on every start-up and from several worker processes at once:
+    the version is re-checked after the write lock is taken, so each migration
+    is applied exactly once. A failing migration is rolled back completely and
+    the error is raised.
+
+    Returns:
+        int: the schema version after migrating
+    """
+    if conn.in_transaction:
+        conn.commit()
+
+    for step in MIGRATIONS:
+        if get_schema_version(conn) >= step.version:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_schema_version(conn) >= step.version:
+                conn.rollback()
+                continue
+            step.apply(conn)
+            conn.execute(f'PRAGMA user_version = {int(step.version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return get_schema_version(conn)
+
+
+@migration(1, 'Partial indexes on active loans')
+def _index_active_loans(conn):
+    # Active-loan lookups filter on return_date IS NULL; partial indexes keep
+    # them proportional to the number of open loans, not the whole history.
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_patron_active
+        ON borrow_records (patron_id, book_id, borrow_date)
+        WHERE return_date IS NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_book_active
+        ON borrow_records (book_id, patron_id)
+        WHERE return_date IS NULL
+    ''')
+
+
+@migration(2, 'Full-text index over book titles and authors')
+def _create_books_fts(conn):
+    # External-content FTS5 table: the text lives in books, the index is kept
+    # in sync by triggers so every writer (including raw SQL) updates it.
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+                title, author,
+                content='books', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e):
+            raise
+        # SQLite built without FTS5: keyword search falls back to LIKE
+        return
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+
+
+@migration(3, 'Index for keyset pagination of the catalog')
+def _index_books_title(conn):
+    # Index entries are (title, rowid), which is exactly the (title, id)
+    # order the catalog pages through.
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_title ON books (title)')
+
+
+@migration(4, 'Index for patron borrowing history')
+def _index_patron_history(conn):
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_patron_history
+        ON borrow_records (patron_id, return_date)
+        WHERE return_date IS NOT NULL
+    ''')
+
+
+@migration(5, 'Late fee payment ledger')
+def _create_late_fee_payments(conn):
+    # One row per loan per payment attempt, so partial and failed
+    # settlements can be traced back to individual loans.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS late_fee_payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            borrow_record_id INTEGER NOT NULL,
+            patron_id TEXT NOT NULL,
+            amount REAL NOT NULL,
+            transaction_id TEXT,
+            status TEXT NOT NULL,
+            message TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (borrow_record_id) REFERENCES borrow_records (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_late_fee_payments_paid
+        ON late_fee_payments (borrow_record_id, amount)
+        WHERE status = 'paid'
+    ''')
+
+
+# Still owed on a returned loan: the fee assessed at return less everything paid for it
+_LOAN_FEE_OWED_SQL = '''MAX(0, {fee} - COALESCE((SELECT SUM(p.amount) FROM late_fee_payments p
+                    WHERE p.borrow_record_id = {record_id} AND p.status = 'paid'), 0))'''
+
+# Totals per patron recomputed from borrow_records; used for the backfill and
+# by the rebuild/verify command
+PATRON_TOTALS_SQL = '''
+    SELECT br.patron_id,
+           SUM(br.return_date IS NULL) AS active_loans,
+           ROUND(SUM(CASE WHEN br.return_date IS NOT NULL
+                          THEN ''' + _LOAN_FEE_OWED_SQL.format(fee='br.late_fee', record_id='br.id') + '''
+                          ELSE 0 END), 2) AS outstanding_fees
+    FROM borrow_records br
+    GROUP BY br.patron_id
+'''
+
+_ADD_TO_PATRON_SQL = '''
+    INSERT INTO patrons (patron_id, active_loans, outstanding_fees) VALUES ({patron_id}, {loans}, {fees})
+    ON CONFLICT (patron_id) DO UPDATE SET
+        active_loans = active_loans + excluded.active_loans,
+        outstanding_fees = ROUND(outstanding_fees + excluded.outstanding_fees, 2);
+'''
+
+
+@migration(6, 'Per-patron active loan and outstanding fee counters')
+def _create_patrons(conn):
+    # borrow_records.late_fee is the fee assessed when the loan was returned.
+    # The patrons row is kept in step by triggers inside the same transaction
+    # as the borrow/return/payment, so every writer keeps it consistent.
+    conn.execute('ALTER TABLE borrow_records ADD COLUMN late_fee REAL NOT NULL DEFAULT 0')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patrons (
+            patron_id TEXT PRIMARY KEY,
+            active_loans INTEGER NOT NULL DEFAULT 0,
+            outstanding_fees REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS patrons_loan_ai AFTER INSERT ON borrow_records BEGIN
+    ''' + _ADD_TO_PATRON_SQL.format(
+        patron_id='new.patron_id',
+        loans='new.return_date IS NULL',
+        fees='(new.return_date IS NOT NULL) * '
+             + _LOAN_FEE_OWED_SQL.format(fee='new.late_fee', record_id='new.id'),
+    ) + '''
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS patrons_loan_au AFTER UPDATE OF return_date, late_fee ON borrow_records BEGIN
+    ''' + _ADD_TO_PATRON_SQL.format(
+        patron_id='new.patron_id',
+        loans='(new.return_date IS NULL) - (old.return_date IS NULL)',
+        fees='(new.return_date IS NOT NULL) * '
+             + _LOAN_FEE_OWED_SQL.format(fee='new.late_fee', record_id='new.id')
+             + ' - (old.return_date IS NOT NULL) * '
+             + _LOAN_FEE_OWED_SQL.format(fee='old.late_fee', record_id='old.id'),
+    ) + '''
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS patrons_loan_ad AFTER DELETE ON borrow_records BEGIN
+    ''' + _ADD_TO_PATRON_SQL.format(
+        patron_id='old.patron_id',
+        loans='-(old.return_date IS NULL)',
+        fees='-(old.return_date IS NOT NULL) * '
+             + _LOAN_FEE_OWED_SQL.format(fee='old.late_fee', record_id='old.id'),
+    ) + '''
+        END
+    ''')
+    # a payment on a returned loan reduces what is owed (payments on open
+    # loans are netted off when the fee is assessed at return)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS patrons_payment_ai AFTER INSERT ON late_fee_payments
+        WHEN new.status = 'paid' AND EXISTS (
+            SELECT 1 FROM borrow_records WHERE id = new.borrow_record_id AND return_date IS NOT NULL
+        ) BEGIN
+    ''' + _ADD_TO_PATRON_SQL.format(
+        patron_id='new.patron_id',
+        loans='0',
+        fees='(SELECT ' + _LOAN_FEE_OWED_SQL.format(fee='br.late_fee', record_id='br.id')
+             + ' - MAX(0, br.late_fee - COALESCE((SELECT SUM(p.amount) FROM late_fee_payments p'
+             + " WHERE p.borrow_record_id = br.id AND p.status = 'paid' AND p.id != new.id), 0))"
+             + ' FROM borrow_records br WHERE br.id = new.borrow_record_id)',
+    ) + '''
+        END
+    ''')
+
+    conn.execute('DELETE FROM patrons')
+    conn.execute('INSERT INTO patrons (patron_id, active_loans, outstanding_fees) ' + PATRON_TOTALS_SQL)
+
+
+@migration(7, 'Materialised overdue loans')
+def _create_overdue_loans(conn):
+    # Filled by the fee accrual job (services/accrual_service.py). Returns and
+    # payments update it straight away so it never shows settled fees.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS overdue_loans (
+            borrow_record_id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            due_date TEXT NOT NULL,
+            days_overdue INTEGER NOT NULL,
+            fee_amount REAL NOT NULL,
+            amount_due REAL NOT NULL,
+            accrued_on TEXT NOT NULL,
+            FOREIGN KEY (borrow_record_id) REFERENCES borrow_records (id) ON DELETE CASCADE
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_overdue_loans_patron ON overdue_loans (patron_id)')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS overdue_loans_returned AFTER UPDATE OF return_date ON borrow_records
+        WHEN new.return_date IS NOT NULL BEGIN
+            DELETE FROM overdue_loans WHERE borrow_record_id = new.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS overdue_loans_paid AFTER INSERT ON late_fee_payments
+        WHEN new.status = 'paid' BEGIN
+            UPDATE overdue_loans SET amount_due = ROUND(MAX(0, amount_due - new.amount), 2)
+            WHERE borrow_record_id = new.borrow_record_id;
+        END
+    ''')
+
+
+# Days since 1970-01-01 for an ISO date/timestamp column (NULL stays NULL)
+DAY_NUMBER_SQL = 'CAST(julianday(date({column})) - 2440587.5 AS INTEGER)'
+
+_SET_DAY_NUMBERS_SQL = (
+    'borrow_day = ' + DAY_NUMBER_SQL.format(column='borrow_date') + ', '
+    'due_day = ' + DAY_NUMBER_SQL.format(column='due_date') + ', '
+    'return_day = ' + DAY_NUMBER_SQL.format(column='return_date')
+)
+
+
+@migration(8, 'Integer day numbers for loan dates')
+def _add_loan_day_numbers(conn):
+    # The ISO text columns stay the source of truth (and what callers get
+    # back); the *_day integers mirror them so date arithmetic and range
+    # filters run in SQL on indexable integers. Triggers keep them in step
+    # for every writer.
+    for column in ('borrow_day', 'due_day', 'return_day'):
+        conn.execute(f'ALTER TABLE borrow_records ADD COLUMN {column} INTEGER')
+    conn.execute('UPDATE borrow_records SET ' + _SET_DAY_NUMBERS_SQL)
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS borrow_records_days_ai AFTER INSERT ON borrow_records BEGIN
+            UPDATE borrow_records SET ''' + _SET_DAY_NUMBERS_SQL + ''' WHERE id = new.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS borrow_records_days_au
+        AFTER UPDATE OF borrow_date, due_date, return_date ON borrow_records BEGIN
+            UPDATE borrow_records SET ''' + _SET_DAY_NUMBERS_SQL + ''' WHERE id = new.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_active_borrow_day
+        ON borrow_records (borrow_day)
+        WHERE return_date IS NULL
+    ''')
+
+
+@migration(9, 'Catalog version counter')
+def _create_catalog_version(conn):
+    # Bumped by every change to books (including availability), so HTTP
+    # responses derived from the catalog can be validated and cached by version.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS catalog_version_{event.lower()} AFTER {event} ON books BEGIN
+                UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+
+@migration(10, 'Trigram index over book titles and authors')
+def _create_books_trigram(conn):
+    # Every three-character sequence of title and author, so fuzzy search can
+    # fetch candidates sharing trigrams with a misspelt term from the index
+    # and only re-rank those. Kept in sync by triggers like books_fts.
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS books_trigram USING fts5(
+                title, author,
+                content='books', content_rowid='id',
+                tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        if 'fts5' not in str(e) and 'tokenizer' not in str(e):
+            raise
+        # SQLite without FTS5 or the trigram tokenizer (< 3.34): fuzzy search scans books
+        return
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_trigram_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_trigram (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_trigram_ad AFTER DELETE ON books BEGIN
+            INSERT INTO books_trigram (books_trigram, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_trigram_au AFTER UPDATE OF title, author ON books BEGIN
+            INSERT INTO books_trigram (books_trigram, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+            INSERT INTO books_trigram (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute("INSERT INTO books_trigram (books_trigram) VALUES ('rebuild')")
+
+
+@migration(11, 'Normalised ISBN-13 lookup key')
+def _add_books_isbn13(conn):
+    # isbn keeps the form the book was catalogued with; isbn13 holds the key
+    # every input format is normalised to (see database/isbn.py), so lookups
+    # and publisher-prefix ranges are probes on one index. Writers set it with
+    # isbn_key() when inserting; the unique index stops an ISBN-10 and its
+    # ISBN-13 twin from being catalogued twice. Rows that already collide keep
+    # the key on the oldest copy only; the others are left NULL.
+    conn.execute('ALTER TABLE books ADD COLUMN isbn13 TEXT')
+    keys = {}
+    for book_id, isbn in conn.execute('SELECT id, isbn FROM books ORDER BY id').fetchall():
+        keys.setdefault(isbn_key(isbn), book_id)
+    conn.executemany('UPDATE books SET isbn13 = ? WHERE id = ?', keys.items())
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_books_isbn13 ON books (isbn13)')
+
+
+@migration(12, 'Title and author version counter')
+def _add_catalog_text_version(conn):
+    # Bumped only when a title or author is added, changed or removed, so the
+    # in-memory typeahead index can tell it is stale without being rebuilt
+    # after every availability change (which bumps catalog_version.version).
+    conn.execute('ALTER TABLE catalog_version ADD COLUMN text_version INTEGER NOT NULL DEFAULT 1')
+    for name, event in (('insert', 'INSERT'), ('delete', 'DELETE'), ('update', 'UPDATE OF title, author')):
+        when = ' WHEN old.title IS NOT new.title OR old.author IS NOT new.author' if name == 'update' else ''
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS catalog_text_version_{name} AFTER {event} ON books{when} BEGIN
+                UPDATE catalog_version SET text_version = text_version + 1 WHERE id = 1;
+            END
+        ''')
@@ -0,0 +1,160 @@
+"""
+Prefix Index Module - In-memory typeahead index over titles and authors
+Completions are kept in a sorted list keyed by every word start, so a prefix
+lookup is a binary search followed by a scan of the matching keys instead of
+a table scan, and the ranking of each prefix is cached until the next change.
+"""
+import bisect
+import heapq
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_MAX_COMPLETIONS = 50000
+MAX_WORDS_PER_COMPLETION = 8
+MAX_KEY_LENGTH = 64
+# Completions kept per cached prefix ranking, and how many rankings are cached
+RANKED_PER_PREFIX = 100
+MAX_CACHED_PREFIXES = 4096
+
+KINDS = ('title', 'author')
+
+_WORD_START = re.compile(r'\w+')
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace, so 'The  Hobbit' and 'the hobbit' share keys."""
+    return ' '.join(text.lower().split())
+
+
+class PrefixIndex:
+    """
+    Thread-safe sorted index of title and author completions.
+
+    Each distinct (kind, text) completion gets one key per word start (up to
+    MAX_WORDS_PER_COMPLETION, truncated to MAX_KEY_LENGTH characters), so
+    'gats' finds 'The Great Gatsby'. At most max_completions distinct
+    completions are held; further ones are counted in `dropped` and skipped.
+
+    `source` and `version` record the database and catalog text version the
+    contents match, so callers can tell when the index is stale.
+    """
+
+    def __init__(self, max_completions: int = DEFAULT_MAX_COMPLETIONS):
+        self.max_completions = max_completions
+        self.source: Optional[str] = None
+        self.version: Optional[int] = None
+        self.dropped = 0
+        self._keys: List[Tuple[str, str, str]] = []
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._ranked: Dict[Tuple[str, Optional[str]], List[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _entries(self, kind: str, text: str) -> List[Tuple[str, str, str]]:
+        key = normalize(text)
+        starts = [m.start() for m in _WORD_START.finditer(key)][:MAX_WORDS_PER_COMPLETION]
+        return [(key[start:start + MAX_KEY_LENGTH], kind, text) for start in starts]
+
+    def _add(self, kind: str, text: str):
+        completion = (kind, text)
+        self._ranked.clear()
+        if completion in self._counts:
+            self._counts[completion] += 1
+        elif len(self._counts) >= self.max_completions:
+            self.dropped += 1
+        else:
+            self._counts[completion] = 1
+            for entry in self._entries(kind, text):
+                bisect.insort(self._keys, entry)
+
+    def add_book(self, title: str, author: str, version: Optional[int] = None) -> bool:
+        """
+        Count one more book with this title and author.
+
+        With the catalog text version written by the insert, the book is only
+        added when the index is exactly one change behind; otherwise another
+        writer got in between, so the index is left stale for a rebuild.
+        """
+        with self._lock:
+            if version is not None:
+                if self.version is None or version != self.version + 1:
+                    return False
+                self.version = version
+            self._add('title', title)
+            self._add('author', author)
+            return True
+
+    def rebuild(self, books: Iterable[Tuple[str, str]], source: Optional[str] = None,
+                version: Optional[int] = None):
+        """Replace the contents with (title, author) pairs, sorting once at the end."""
+        counts: Dict[Tuple[str, str], int] = {}
+        dropped = 0
+        for title, author in books:
+            for completion in (('title', title), ('author', author)):
+                if completion in counts:
+                    counts[completion] += 1
+                elif len(counts) >= self.max_completions:
+                    dropped += 1
+                else:
+                    counts[completion] = 1
+        keys = sorted(entry for kind, text in counts for entry in self._entries(kind, text))
+        with self._lock:
+            self._keys, self._counts, self.dropped = keys, counts, dropped
+            self.source, self.version, self._ranked = source, version, {}
+
+    def clear(self):
+        with self._lock:
+            self._keys, self._counts, self.dropped = [], {}, 0
+            self.source, self.version, self._ranked = None, None, {}
+
+    def _rank(self, prefix: str, kind: Optional[str], limit: int) -> List[Tuple[str, str]]:
+        best: Dict[Tuple[str, str], bool] = {}
+        i = bisect.bisect_left(self._keys, (prefix,))
+        while i < len(self._keys) and self._keys[i][0].startswith(prefix):
+            key, entry_kind, text = self._keys[i]
+            i += 1
+            if kind is not None and entry_kind != kind:
+                continue
+            leading = normalize(text).startswith(prefix)
+            best[(entry_kind, text)] = best.get((entry_kind, text), False) or leading
+        return heapq.nsmallest(limit, best, key=lambda c: (not best[c], -self._counts[c], c[1].lower(), c[0]))
+
+    def suggest(self, prefix: str, limit: int = 10, kind: Optional[str] = None) -> List[Dict]:
+        """
+        Get up to `limit` completions for a prefix of any word.
+
+        Completions whose text starts with the prefix rank first, then the ones
+        shared by more books, then alphabetically, over every matching key.
+        The top RANKED_PER_PREFIX of each prefix are cached until the index
+        changes, so a short prefix matching much of the catalog is only
+        scanned once.
+        """
+        prefix = normalize(prefix)[:MAX_KEY_LENGTH]
+        if not prefix or limit <= 0:
+            return []
+
+        with self._lock:
+            if limit > RANKED_PER_PREFIX:
+                ranked = self._rank(prefix, kind, limit)
+            else:
+                ranked = self._ranked.get((prefix, kind))
+                if ranked is None:
+                    ranked = self._rank(prefix, kind, RANKED_PER_PREFIX)
+                    if len(self._ranked) >= MAX_CACHED_PREFIXES:
+                        self._ranked.clear()
+                    self._ranked[(prefix, kind)] = ranked
+            return [{'text': text, 'kind': entry_kind, 'books': self._counts[(entry_kind, text)]}
+                    for entry_kind, text in ranked[:limit]]
+
+
+# Completions for the current DATABASE (source and version record what it was built from)
+suggest_index = PrefixIndex()
+
+
+def init_app(app):
+    """Size the index from SUGGEST_MAX_COMPLETIONS; it is (re)built on first use."""
+    suggest_index.max_completions = app.config.get('SUGGEST_MAX_COMPLETIONS', DEFAULT_MAX_COMPLETIONS)
+    suggest_index.clear()
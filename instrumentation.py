@@ -0,0 +1,290 @@
+"""
+Instrumentation Module - Opt-in request profiling and metrics
+Records SQL statements, connection opens and payment-gateway calls per request,
+reports them in a Server-Timing response header and aggregates them for the
+Prometheus /metrics endpoint.
+
+Enable with app.config['INSTRUMENTATION'] = True (off by default). While
+disabled the hooks in database/connection.py and services/payment_service.py
+cost a single flag check.
+"""
+import functools
+import heapq
+import inspect
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import current_app, g, request
+
+SLOWEST_PER_REQUEST = 5
+MAX_TRACKED_STATEMENTS = 500
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_INFO = {
+    'library_http_requests_total': ('counter', 'HTTP requests by endpoint, method and status.'),
+    'library_http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint.'),
+    'library_sql_statements_total': ('counter', 'SQL statements executed.'),
+    'library_sql_duration_seconds_total': ('counter', 'Time spent executing SQL statements.'),
+    'library_db_connections_opened_total': ('counter', 'New SQLite connections opened by the pool.'),
+    'library_payment_gateway_calls_total': ('counter', 'Payment gateway calls by operation.'),
+    'library_payment_gateway_duration_seconds_total': ('counter', 'Time spent in payment gateway calls.'),
+    'library_book_cache_hits_total': ('counter', 'Book cache hits.'),
+    'library_book_cache_misses_total': ('counter', 'Book cache misses.'),
+    'library_book_cache_entries': ('gauge', 'Entries currently in the book cache.'),
+}
+
+_enabled = False
+_current_profile: ContextVar[Optional['RequestProfile']] = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """Counters for one request; SQL time covers execute() calls, not row fetching."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.connection_opens = 0
+        self.connection_time = 0.0
+        self.gateway_calls = 0
+        self.gateway_time = 0.0
+        self._slowest: List[Tuple[float, int, str]] = []
+
+    def record_sql(self, sql: str, seconds: float):
+        self.sql_count += 1
+        self.sql_time += seconds
+        entry = (seconds, self.sql_count, sql)
+        if len(self._slowest) < SLOWEST_PER_REQUEST:
+            heapq.heappush(self._slowest, entry)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest_statements(self) -> List[Dict]:
+        """The slowest statements of this request, slowest first."""
+        return [{'sql': sql, 'ms': round(seconds * 1000, 3)}
+                for seconds, _, sql in sorted(self._slowest, reverse=True)]
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing header (durations in milliseconds)."""
+        total = time.perf_counter() - self.started
+        parts = [
+            f'sql;dur={self.sql_time * 1000:.2f};desc="{self.sql_count} statements"',
+            f'db-connect;dur={self.connection_time * 1000:.2f};desc="{self.connection_opens} opened"',
+        ]
+        if self.gateway_calls:
+            # concurrent calls overlap, so this can exceed the request time
+            parts.append(f'gateway;dur={self.gateway_time * 1000:.2f};desc="{self.gateway_calls} calls"')
+        parts.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(parts)
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, Tuple], float] = defaultdict(float)
+        self._histograms: Dict[Tuple[str, Tuple], List[float]] = {}
+        self._statements: Dict[str, List[float]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        with self._lock:
+            self._values[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Add one observation to a histogram (bucket counts, then sum and count)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            counts = self._histograms.setdefault(key, [0.0] * (len(DURATION_BUCKETS) + 2))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    counts[i] += 1
+            counts[-2] += seconds
+            counts[-1] += 1
+
+    def record_statement(self, sql: str, seconds: float):
+        """Aggregate count/total/max per SQL text (parameters are not part of the text)."""
+        with self._lock:
+            stats = self._statements.get(sql)
+            if stats is None:
+                if len(self._statements) >= MAX_TRACKED_STATEMENTS:
+                    return
+                stats = self._statements[sql] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def top_statements(self, limit: int = 20) -> List[Dict]:
+        """Statements ordered by total time spent in them."""
+        with self._lock:
+            items = sorted(self._statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {'sql': sql, 'count': count, 'total_ms': round(total * 1000, 3), 'max_ms': round(worst * 1000, 3)}
+            for sql, (count, total, worst) in items
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+            self._histograms.clear()
+            self._statements.clear()
+
+    def render(self, extra: Optional[Dict[str, float]] = None) -> str:
+        """Prometheus text exposition format; extra holds unlabeled values sampled at scrape time."""
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: list(counts) for key, counts in self._histograms.items()}
+        for name, value in (extra or {}).items():
+            values[(name, ())] = value
+
+        by_name = defaultdict(list)
+        for (name, labels), value in values.items():
+            by_name[name].append((labels, value))
+        for (name, labels), counts in histograms.items():
+            by_name[name].append((labels, counts))
+
+        lines = []
+        for name in sorted(by_name):
+            kind, help_text = METRIC_INFO.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+                if kind == 'histogram':
+                    for bound, count in zip(DURATION_BUCKETS, value):
+                        lines.append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {count:g}')
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {value[-1]:g}')
+                    lines.append(f'{name}_sum{_labels(labels)} {value[-2]:.6f}')
+                    lines.append(f'{name}_count{_labels(labels)} {value[-1]:g}')
+                else:
+                    lines.append(f'{name}{_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels: Tuple) -> str:
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+metrics = MetricsRegistry()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+def record_sql(sql: str, seconds: float):
+    metrics.inc('library_sql_statements_total')
+    metrics.inc('library_sql_duration_seconds_total', seconds)
+    metrics.record_statement(' '.join(sql.split()), seconds)
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record_sql(sql, seconds)
+
+
+def record_connection_open(seconds: float):
+    metrics.inc('library_db_connections_opened_total')
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.connection_opens += 1
+        profile.connection_time += seconds
+
+
+def record_gateway_call(operation: str, seconds: float):
+    metrics.inc('library_payment_gateway_calls_total', operation=operation)
+    metrics.inc('library_payment_gateway_duration_seconds_total', seconds, operation=operation)
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.gateway_calls += 1
+        profile.gateway_time += seconds
+
+
+def timed_gateway_call(func: Callable) -> Callable:
+    """Decorator recording the duration of a (sync or async) payment gateway method."""
+    operation = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not _enabled:
+                return await func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                record_gateway_call(operation, time.perf_counter() - started)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record_gateway_call(operation, time.perf_counter() - started)
+    return wrapper
+
+
+def _start_request():
+    g._profile_token = _current_profile.set(RequestProfile())
+
+
+def _finish_request(response):
+    profile = _current_profile.get()
+    if profile is None:
+        return response
+
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    duration = time.perf_counter() - profile.started
+    metrics.inc('library_http_requests_total', endpoint=endpoint, method=request.method,
+                status=str(response.status_code))
+    metrics.observe('library_http_request_duration_seconds', duration, endpoint=endpoint)
+    response.headers['Server-Timing'] = profile.server_timing()
+
+    slow_ms = current_app.config.get('INSTRUMENTATION_SLOW_REQUEST_MS')
+    if slow_ms is not None and duration * 1000 >= slow_ms:
+        current_app.logger.warning(
+            'Slow request %s %s: %.1fms, %d SQL statements (%.1fms); slowest: %s',
+            request.method, request.path, duration * 1000, profile.sql_count,
+            profile.sql_time * 1000, profile.slowest_statements(),
+        )
+    return response
+
+
+def _end_request(exception=None):
+    token = g.pop('_profile_token', None)
+    if token is not None:
+        _current_profile.reset(token)
+
+
+def init_app(app):
+    """
+    Install the per-request hooks when app.config['INSTRUMENTATION'] is true.
+    Requests slower than INSTRUMENTATION_SLOW_REQUEST_MS (if set) are logged
+    together with their slowest statements.
+
+    Returns:
+        bool: whether instrumentation was enabled
+    """
+    if not app.config.get('INSTRUMENTATION', False):
+        return False
+    enable()
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
+    return True
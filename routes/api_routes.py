@@ -2,8 +2,15 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from flask import Blueprint, Response, current_app, jsonify, request
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog, get_catalog_page, CATALOG_PAGE_SIZE,
+    calculate_outstanding_late_fees, get_patron_status_report, HISTORY_PAGE_SIZE, settle_late_fees,
+    borrow_books_by_patron, return_books_by_patron, suggest_books
+)
+from services.accrual_service import get_overdue_report
+from services.export_service import EXPORT_FORMATS, MIMETYPES, export_books, export_loans
+from .http_cache import catalog_cached
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -16,7 +23,101 @@ def get_late_fee(patron_id, book_id):
     result = calculate_late_fee_for_book(patron_id, book_id)
     return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
 
+@api_bp.route('/late_fees')
+def get_late_fees_bulk():
+    """
+    Calculate late fees for all open loans in one call.
+    Filter with ?patron_id= (repeatable) and ?overdue_only=1.
+    """
+    patron_ids = request.args.getlist('patron_id') or None
+    overdue_only = request.args.get('overdue_only', '') in ('1', 'true', 'yes')
+
+    result = calculate_outstanding_late_fees(patron_ids, overdue_only)
+    return jsonify(result), 400 if result['status'] != 'Success' else 200
+
+@api_bp.route('/late_fees/pay', methods=['POST'])
+def pay_late_fees_bulk():
+    """
+    Pay all outstanding late fees of the patrons in the JSON body
+    ({"patron_ids": [...]}) with one charge per patron.
+    """
+    data = request.get_json(silent=True) or {}
+    patron_ids = data.get('patron_ids')
+    if not isinstance(patron_ids, list) or not patron_ids:
+        return jsonify({'error': 'patron_ids must be a non-empty list'}), 400
+
+    result = settle_late_fees([str(patron_id) for patron_id in patron_ids])
+    return jsonify(result), 400 if result['status'] != 'Success' else 200
+
+@api_bp.route('/borrow', methods=['POST'])
+def borrow_books_bulk():
+    """
+    Borrow several books at once ({"patron_id": "123456", "book_ids": [...]}).
+    Per-item outcomes are in "results"; the request fails only if it is invalid.
+    """
+    data = request.get_json(silent=True) or {}
+    result = borrow_books_by_patron(str(data.get('patron_id', '')), data.get('book_ids'))
+    return jsonify(result), 400 if result['status'] != 'Success' else 200
+
+@api_bp.route('/return', methods=['POST'])
+def return_books_bulk():
+    """Return several books at once ({"patron_id": "123456", "book_ids": [...]})."""
+    data = request.get_json(silent=True) or {}
+    result = return_books_by_patron(str(data.get('patron_id', '')), data.get('book_ids'))
+    return jsonify(result), 400 if result['status'] != 'Success' else 200
+
+@api_bp.route('/overdue')
+def get_overdue():
+    """
+    Overdue loans and what each patron owes, as of the last fee accrual.
+    Filter with ?patron_id= (repeatable); otherwise the ?limit= (default 100)
+    patrons owing the most are returned.
+    """
+    patron_ids = request.args.getlist('patron_id') or None
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+
+    result = get_overdue_report(patron_ids, limit)
+    return jsonify(result), 400 if result['status'] != 'Success' else 200
+
+def _export_response(chunks, name, file_format):
+    # the generator runs after the view returns, on its own unpooled read-only connection
+    response = Response(chunks, mimetype=MIMETYPES[file_format])
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{file_format}'
+    return response
+
+@api_bp.route('/export/books')
+def export_books_api():
+    """Stream the whole catalog (?format=ndjson|csv)."""
+    file_format = request.args.get('format', 'ndjson')
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}), 400
+    return _export_response(export_books(file_format), 'books', file_format)
+
+@api_bp.route('/export/loans')
+def export_loans_api():
+    """Stream borrow records (?format=ndjson|csv, ?patron_id=, ?active_only=1)."""
+    file_format = request.args.get('format', 'ndjson')
+    if file_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}), 400
+    patron_id = request.args.get('patron_id') or None
+    active_only = request.args.get('active_only', '') in ('1', 'true', 'yes')
+    return _export_response(export_loans(file_format, patron_id=patron_id, active_only=active_only),
+                            'loans', file_format)
+
+@api_bp.route('/patron/<patron_id>/status')
+def get_patron_status(patron_id):
+    """
+    Get a patron's status report.
+    API endpoint for R7: Patron Status Report (?page= and ?per_page= page the history)
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', HISTORY_PAGE_SIZE, type=int)
+
+    report = get_patron_status_report(patron_id, page, per_page)
+    return jsonify(report), 400 if report['status'] != 'Success' else 200
+
 @api_bp.route('/search')
+@catalog_cached
 def search_books_api():
     """
     Search for books via API endpoint.
@@ -37,3 +138,33 @@ def search_books_api():
         'results': books,
         'count': len(books)
     })
+
+@api_bp.route('/suggest')
+def suggest_api():
+    """
+    Title and author completions for a prefix (?q=), for search-box typeahead.
+    Optional ?limit= and ?kind=title|author.
+    """
+    result = suggest_books(request.args.get('q', ''), request.args.get('limit', 10, type=int),
+                           request.args.get('kind') or None)
+    return jsonify(result), 400 if result['status'] != 'Success' else 200
+
+@api_bp.route('/books')
+def list_books_api():
+    """
+    List the catalog one page at a time via API endpoint.
+    Pass the returned next_cursor as ?cursor= to fetch the following page.
+    """
+    cursor = request.args.get('cursor', '').strip() or None
+    page_size = request.args.get('per_page', type=int) or current_app.config.get('CATALOG_PAGE_SIZE', CATALOG_PAGE_SIZE)
+
+    page = get_catalog_page(cursor, page_size)
+    if page['status'] != 'Success':
+        return jsonify({'error': page['message']}), 400
+
+    return jsonify({
+        'books': page['books'],
+        'count': len(page['books']),
+        'page_size': page['page_size'],
+        'next_cursor': page['next_cursor']
+    })
@@ -2,9 +2,9 @@
 Catalog Routes - Book catalog related endpoints
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database.database import get_all_books
-from services.library_service import add_book_to_catalog
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
+from services.library_service import add_book_to_catalog, get_catalog_page, CATALOG_PAGE_SIZE
+from .http_cache import catalog_cached
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -14,13 +14,22 @@ def index():
     return redirect(url_for('catalog.catalog'))
 
 @catalog_bp.route('/catalog')
+@catalog_cached
 def catalog():
     """
-    Display all books in the catalog.
+    Display the catalog one page at a time.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    cursor = request.args.get('cursor', '').strip() or None
+    page_size = request.args.get('per_page', type=int) or current_app.config.get('CATALOG_PAGE_SIZE', CATALOG_PAGE_SIZE)
+
+    page = get_catalog_page(cursor, page_size)
+    if page['status'] != 'Success':
+        flash(page['message'], 'error')
+        page = get_catalog_page(None, page_size)
+
+    return render_template('catalog.html', books=page['books'], next_cursor=page['next_cursor'],
+                           page_size=page['page_size'], is_first_page=cursor is None)
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
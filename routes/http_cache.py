@@ -0,0 +1,65 @@
+"""
+HTTP Cache - Conditional GETs and a response cache for catalog-derived pages
+Responses are versioned by the catalog version counter, which changes on
+every write to books, so cached bodies and ETags never outlive the data.
+"""
+
+import functools
+import hashlib
+
+from flask import Response, make_response, request, session
+
+import database.database as db
+from database.cache import LRUCache
+
+DEFAULT_RESPONSE_CACHE_SIZE = 256
+DEFAULT_RESPONSE_CACHE_TTL = 300.0
+
+# (database, endpoint, query args, catalog version) -> (body, status, mimetype)
+response_cache = LRUCache(max_entries=DEFAULT_RESPONSE_CACHE_SIZE, ttl=DEFAULT_RESPONSE_CACHE_TTL)
+
+
+def catalog_cached(view):
+    """
+    Serve a GET view with a strong ETag derived from the catalog version,
+    answer a matching If-None-Match with 304 and reuse the rendered body
+    while the catalog is unchanged.
+
+    Requests with flash messages waiting in the session bypass both, since
+    the page has to render (and consume) them.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        key = (db.READONLY_DATABASE or db.DATABASE, request.endpoint,
+               tuple(sorted(request.args.items(multi=True))), db.get_catalog_version())
+        etag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:32]
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            cached = response_cache.get(key)
+            if cached is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                # only the body is cached; headers such as Set-Cookie belong to this request
+                response_cache.set(key, (response.get_data(), response.status_code, response.mimetype))
+            else:
+                body, status, mimetype = cached
+                response = Response(body, status=status, mimetype=mimetype)
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+
+def init_app(app):
+    """Size the response cache from RESPONSE_CACHE_SIZE and RESPONSE_CACHE_TTL (seconds, 0 disables)."""
+    response_cache.configure(
+        max_entries=app.config.get('RESPONSE_CACHE_SIZE', DEFAULT_RESPONSE_CACHE_SIZE),
+        ttl=app.config.get('RESPONSE_CACHE_TTL', DEFAULT_RESPONSE_CACHE_TTL),
+    )
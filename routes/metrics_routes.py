@@ -0,0 +1,27 @@
+"""
+Metrics Routes - Prometheus metrics and SQL statement statistics
+Only registered when instrumentation is enabled
+"""
+
+from flask import Blueprint, Response, jsonify, request
+import instrumentation
+from database.database import get_book_cache_stats
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    """Process-wide request, SQL, connection, gateway and cache metrics in Prometheus text format."""
+    cache_stats = get_book_cache_stats()
+    body = instrumentation.metrics.render({
+        'library_book_cache_hits_total': cache_stats['hits'],
+        'library_book_cache_misses_total': cache_stats['misses'],
+        'library_book_cache_entries': cache_stats['size'],
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@metrics_bp.route('/metrics/statements')
+def statement_metrics():
+    """The SQL statements that took the most total time (?limit=, default 20)."""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'statements': instrumentation.metrics.top_statements(max(1, min(limit, 500)))})
@@ -0,0 +1,194 @@
+"""
+Accrual Service Module - Overdue loan and late fee accrual
+Materialises every overdue loan with its current fee into the overdue_loans
+table, so "who owes what" is answered from an indexed table instead of
+re-costing the whole loan history on every request.
+
+Run it once a day (or more often) as a CLI, or in-process by setting
+OVERDUE_ACCRUAL_INTERVAL (seconds) in the Flask config. Every app process
+then runs a scheduler, but only the one holding the lock file next to the
+database (OVERDUE_ACCRUAL_LOCK to override) accrues; the others take over
+if that process exits.
+
+Usage:
+    python -m services.accrual_service [--as-of 2025-01-31] [--every 86400]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows: every process accrues
+    fcntl = None
+
+import database.database as db
+from database.database import (
+    get_active_loans, get_overdue_loans, get_overdue_totals, init_database, replace_overdue_loans
+)
+from services.library_service import LOAN_PERIOD_DAYS, calculate_late_fees_for_loans
+
+logger = logging.getLogger(__name__)
+
+
+def accrue_overdue_fees(as_of: Optional[date] = None) -> Dict:
+    """
+    Recalculate all overdue loans and their fees as of a date.
+
+    Args:
+        as_of: Date to accrue fees for (defaults to today)
+
+    Returns:
+        dict: status, accrued_on, count, total_fees and total_due
+    """
+    as_of = as_of or datetime.now().date()
+    loans = calculate_late_fees_for_loans(
+        get_active_loans(as_of, overdue_only=True, loan_days=LOAN_PERIOD_DAYS, use_primary=True), as_of)
+    count = replace_overdue_loans(loans, as_of)
+    return {
+        "status": "Success",
+        "accrued_on": as_of.isoformat(),
+        "count": count,
+        "total_fees": round(sum(loan['fee_amount'] for loan in loans), 2),
+        "total_due": round(sum(loan['amount_due'] for loan in loans), 2),
+    }
+
+
+def get_overdue_report(patron_ids: Optional[List[str]] = None, limit: int = 100) -> Dict:
+    """
+    Get overdue loans and per-patron totals from the last accrual.
+
+    Args:
+        patron_ids: 6-digit patron IDs to include (None for the patrons owing the most)
+        limit: Maximum number of patrons when patron_ids is None
+
+    Returns:
+        dict: status, patrons (totals per patron), loans and count
+    """
+    if patron_ids is not None:
+        for patron_id in patron_ids:
+            if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+                return {"status": "Error", "message": "Invalid patron ID. Must be exactly 6 digits."}
+
+    patrons = get_overdue_totals(limit, patron_ids)
+    if patron_ids is None:
+        patron_ids = [patron['patron_id'] for patron in patrons]
+
+    loans = get_overdue_loans(patron_ids) if patron_ids else []
+    return {
+        "status": "Success",
+        "patrons": patrons,
+        "loans": loans,
+        "count": len(loans),
+    }
+
+
+class AccrualScheduler:
+    """
+    Runs accrue_overdue_fees every `interval` seconds, starting immediately,
+    on a daemon thread (start) or the calling thread (run). Failures are
+    logged and retried on the next run.
+
+    With a lock_path, a run only accrues while this scheduler holds an
+    exclusive flock on that file, so schedulers in several worker processes
+    sharing one database do not all accrue; the others retry the lock on
+    every run.
+    """
+
+    def __init__(self, interval: float, lock_path: Optional[str] = None):
+        self.interval = interval
+        self.lock_path = lock_path
+        self._lock_fd: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='overdue-accrual', daemon=True)
+
+    def start(self) -> 'AccrualScheduler':
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        self.release_lock()
+
+    def acquire_lock(self) -> bool:
+        """True if this scheduler holds (or has just taken) the accrual lock."""
+        if self.lock_path is None or fcntl is None or self._lock_fd is not None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def release_lock(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # closing the descriptor drops the flock
+            self._lock_fd = None
+
+    def run_once(self) -> Optional[Dict]:
+        """Accrue once if this scheduler holds the lock; None when another process does."""
+        if not self.acquire_lock():
+            return None
+        result = accrue_overdue_fees()
+        logger.info("Accrued %d overdue loans (%.2f due)", result['count'], result['total_due'])
+        return result
+
+    def run(self):
+        """Accrue in a loop on the calling thread until stop() is called."""
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Overdue fee accrual failed")
+            self._stop.wait(self.interval)
+
+
+def init_app(app) -> Optional[AccrualScheduler]:
+    """
+    Start the in-process scheduler when OVERDUE_ACCRUAL_INTERVAL (seconds) is
+    set. Only the worker holding OVERDUE_ACCRUAL_LOCK (default: the database
+    path plus '.accrual.lock') accrues.
+    """
+    interval = app.config.get('OVERDUE_ACCRUAL_INTERVAL')
+    if not interval:
+        return None
+    lock_path = app.config.get('OVERDUE_ACCRUAL_LOCK') or db.DATABASE + '.accrual.lock'
+    scheduler = AccrualScheduler(interval, lock_path).start()
+    app.extensions['overdue_accrual'] = scheduler
+    return scheduler
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Accrue late fees on overdue loans.")
+    parser.add_argument('--as-of', type=date.fromisoformat, help="date to accrue for (default: today)")
+    parser.add_argument('--every', type=float, help="keep running, accruing every N seconds")
+    args = parser.parse_args(argv)
+
+    init_database()
+
+    if args.every:
+        logging.basicConfig(level=logging.INFO)
+        try:
+            AccrualScheduler(args.every).run()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    result = accrue_overdue_fees(args.as_of)
+    print(f"Accrued {result['count']} overdue loans as of {result['accrued_on']}: "
+          f"${result['total_fees']:.2f} in fees, ${result['total_due']:.2f} still due.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
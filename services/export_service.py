@@ -0,0 +1,100 @@
+"""
+Export Service Module - Streaming catalog and circulation exports
+Rows are read with fetchmany and written out one batch at a time, so an
+export of any size runs in constant memory.
+
+Usage:
+    python -m services.export_service books [--format csv] [--output books.csv]
+    python -m services.export_service loans [--format ndjson] [--patron-id 123456] [--active-only]
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from typing import Iterator, List, Optional
+
+from database.database import init_database, iter_books, iter_loans
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_BATCH_SIZE = 1000
+
+BOOK_FIELDS = ['id', 'title', 'author', 'isbn', 'total_copies', 'available_copies']
+LOAN_FIELDS = ['id', 'patron_id', 'book_id', 'borrow_date', 'due_date', 'return_date', 'late_fee']
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _encode(batches: Iterator[List], fields: List[str], file_format: str) -> Iterator[str]:
+    if file_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(fields)
+        yield buffer.getvalue()
+        for rows in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([row[field] for field in fields] for row in rows)
+            yield buffer.getvalue()
+    else:
+        for rows in batches:
+            yield ''.join(json.dumps({field: row[field] for field in fields}) + '\n' for row in rows)
+
+
+def export_books(file_format: str = 'ndjson', batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """
+    Stream the catalog as NDJSON or CSV text chunks (one chunk per batch).
+
+    Raises:
+        ValueError: if file_format is not supported
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    return _encode(iter_books(batch_size), BOOK_FIELDS, file_format)
+
+
+def export_loans(file_format: str = 'ndjson', batch_size: int = EXPORT_BATCH_SIZE,
+                 patron_id: Optional[str] = None, active_only: bool = False) -> Iterator[str]:
+    """
+    Stream borrow records as NDJSON or CSV text chunks (one chunk per batch).
+
+    Raises:
+        ValueError: if file_format is not supported
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    return _encode(iter_loans(batch_size, patron_id, active_only), LOAN_FIELDS, file_format)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the catalog or borrow records.")
+    parser.add_argument('dataset', choices=['books', 'loans'])
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+    parser.add_argument('--output', help="file to write (default: stdout)")
+    parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE, help="rows fetched per batch")
+    parser.add_argument('--patron-id', help="loans: only this patron")
+    parser.add_argument('--active-only', action='store_true', help="loans: only open loans")
+    args = parser.parse_args(argv)
+
+    init_database()
+    if args.dataset == 'books':
+        chunks = export_books(args.format, args.batch_size)
+    else:
+        chunks = export_loans(args.format, args.batch_size, args.patron_id, args.active_only)
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
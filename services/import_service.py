@@ -0,0 +1,171 @@
+"""
+Import Service Module - Bulk catalog import
+Streams books from CSV or JSON Lines files into the catalog in large batches.
+
+Usage:
+    python -m services.import_service books.csv [--chunk-size 5000] [--rejects rejects.jsonl]
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database.database import get_existing_isbns, init_database, insert_books_bulk
+from database.isbn import is_isbn10_shaped, isbn_key
+from services.library_service import validate_book_fields
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def read_book_rows(path: str, file_format: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+    """
+    Stream (line number, row) pairs from a CSV file (with a header row of
+    title,author,isbn,total_copies) or a JSON Lines file (one object per line).
+
+    Args:
+        path: File to read
+        file_format: 'csv' or 'jsonl' (guessed from the extension when omitted)
+    """
+    file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if file_format == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_number, row if isinstance(row, dict) else {'_error': 'Malformed JSON line.'}
+
+
+def _parse_copies(value) -> Optional[int]:
+    """A copy count from CSV text or JSON; None unless it is a whole number (no 2.7, no true)."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and re.fullmatch(r'\s*[+-]?\d+\s*', value):
+        return int(value)
+    return None
+
+
+def _clean_row(row: Dict) -> Tuple[Optional[str], Optional[Tuple[str, str, str, int, int]]]:
+    """
+    Validate one input row with the R1 rules and turn it into an insert tuple,
+    with the ISBN in its isbn_key() form (no separators, ISBN-10 as ISBN-13).
+    An ISBN-10 with a wrong check digit is rejected rather than kept as typed.
+    """
+    if '_error' in row:
+        return row['_error'], None
+
+    title = str(row.get('title') or '')
+    author = str(row.get('author') or '')
+    isbn = isbn_key(str(row.get('isbn') or '').strip())
+    total_copies = _parse_copies(row.get('total_copies'))
+    if total_copies is None:
+        return "Total copies must be a positive integer.", None
+
+    # isbn_key() only converts ISBN-10s whose check digit is right
+    if is_isbn10_shaped(isbn):
+        return "Invalid ISBN: check digit does not match.", None
+
+    error = validate_book_fields(title, author, isbn, total_copies)
+    if error:
+        return error, None
+    return None, (title.strip(), author.strip(), isbn, total_copies, total_copies)
+
+
+def import_books(rows: Iterable[Tuple[int, Dict]], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """
+    Import books in chunks.
+
+    Each chunk is validated, de-duplicated by isbn_key() against ISBNs seen
+    earlier in the input and against the catalog (one batched lookup per
+    chunk), then written with a single executemany in one transaction.
+
+    Args:
+        rows: (line number, row dict) pairs, e.g. from read_book_rows
+        chunk_size: Rows per database transaction
+
+    Returns:
+        dict: status, read, inserted and rejected (line, isbn, reason) rows
+    """
+    seen_isbns = set()
+    rejected: List[Dict] = []
+    read = 0
+    inserted = 0
+    chunk: List[Tuple[int, Tuple[str, str, str, int, int]]] = []
+
+    def flush():
+        nonlocal inserted
+        existing = get_existing_isbns([book[2] for _, book in chunk])
+        new_books = []
+        for line, book in chunk:
+            if book[2] in existing:
+                rejected.append({'line': line, 'isbn': book[2], 'reason': "A book with this ISBN already exists."})
+            else:
+                new_books.append(book)
+        if new_books:
+            inserted += insert_books_bulk(new_books)
+        chunk.clear()
+
+    for line, row in rows:
+        read += 1
+        error, book = _clean_row(row)
+        if error is None and book[2] in seen_isbns:
+            error = "Duplicate ISBN in import file."
+        if error:
+            rejected.append({'line': line, 'isbn': str(row.get('isbn', '')), 'reason': error})
+            continue
+
+        seen_isbns.add(book[2])
+        chunk.append((line, book))
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    return {
+        "status": "Success",
+        "read": read,
+        "inserted": inserted,
+        "rejected": rejected
+    }
+
+
+def import_books_from_file(path: str, file_format: Optional[str] = None,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """Import a CSV or JSON Lines file; see import_books for the report format."""
+    return import_books(read_book_rows(path, file_format), chunk_size)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import books into the catalog.")
+    parser.add_argument('path', help="CSV or JSON Lines file")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="input format (default: from extension)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="rows per transaction")
+    parser.add_argument('--rejects', help="write rejected rows to this JSON Lines file")
+    args = parser.parse_args(argv)
+
+    init_database()
+    report = import_books_from_file(args.path, args.format, args.chunk_size)
+
+    if args.rejects:
+        with open(args.rejects, 'w', encoding='utf-8') as f:
+            for reject in report['rejected']:
+                f.write(json.dumps(reject) + '\n')
+
+    print(f"Read {report['read']} rows, inserted {report['inserted']}, rejected {len(report['rejected'])}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
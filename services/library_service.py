@@ -3,49 +3,83 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import asyncio
+import base64
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from database.database import (
     get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
     insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_db_connection, get_patron_borrowed_books,
-    get_patron_borrow_record
+    update_borrow_record_return_date, get_read_connection, get_patron_borrowed_books,
+    get_patron_borrow_record, run_in_transaction, search_books_fulltext, get_books_page,
+    get_active_loans, get_patron_loans, get_patron_history_count, record_late_fee_payments,
+    get_patron_summary, to_day_number, from_day_number, transaction, get_books_for_checkout,
+    get_open_loans_for_books, close_borrow_record, get_suggestions, search_books_fuzzy,
+    get_books_by_isbn_prefix, get_returned_loans_owing
 )
-from services.payment_service import PaymentGateway
+from database.isbn import is_isbn10_shaped, isbn_key, normalize_isbn
+from database.prefix_index import KINDS as SUGGEST_KINDS
+from services.payment_service import AsyncPaymentGateway, PaymentGateway
 
 
-def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
+def validate_book_fields(title: str, author: str, isbn: str, total_copies: int) -> Optional[str]:
     """
-    Add a new book to the catalog.
-    Implements R1: Book Catalog Management
-    
-    Args:
-        title: Book title (max 200 chars)
-        author: Book author (max 100 chars)
-        isbn: 13-digit ISBN
-        total_copies: Number of copies (positive integer)
-        
+    Check a book's fields against the R1 rules.
+
     Returns:
-        tuple: (success: bool, message: str)
+        str: the first validation error, or None if the fields are valid
     """
-    # Input validation
     if not title or not title.strip():
-        return False, "Title is required."
+        return "Title is required."
 
     if len(title.strip()) > 200:
-        return False, "Title must be less than 200 characters."
+        return "Title must be less than 200 characters."
 
     if not author or not author.strip():
-        return False, "Author is required."
+        return "Author is required."
 
     if len(author.strip()) > 100:
-        return False, "Author must be less than 100 characters."
+        return "Author must be less than 100 characters."
 
     if len(isbn) != 13:
-        return False, "ISBN must be exactly 13 digits."
+        return "ISBN must be exactly 13 digits."
 
     if not isinstance(total_copies, int) or total_copies <= 0:
-        return False, "Total copies must be a positive integer."
+        return "Total copies must be a positive integer."
+
+    return None
+
+
+def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
+    """
+    Add a new book to the catalog.
+    Implements R1: Book Catalog Management
+    
+    Args:
+        title: Book title (max 200 chars)
+        author: Book author (max 100 chars)
+        isbn: ISBN-13 or ISBN-10, optionally hyphenated (stored as ISBN-13)
+        total_copies: Number of copies (positive integer)
+        
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    # Input validation
+    canonical = normalize_isbn(isbn or '')
+    key = isbn_key(isbn or '')
+    # isbn_key() leaves an ISBN-10 with a wrong check digit unconverted
+    if canonical is None and is_isbn10_shaped(key):
+        return False, "Invalid ISBN: check digit does not match."
+    error = validate_book_fields(title, author, canonical or key, total_copies)
+    if error:
+        return False, error
+
+    if canonical is None:
+        return False, "Invalid ISBN: check digit does not match."
+    isbn = canonical
 
     # Check for duplicate ISBN
     existing = get_book_by_isbn(isbn)
@@ -60,6 +94,9 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
         return False, "Database error occurred while adding the book."
 
 
+MAX_BORROW_LIMIT = 5
+
+
 def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Allow a patron to borrow a book.
@@ -87,26 +124,51 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     # Check patron's current borrowed books count
     current_borrowed = get_patron_borrow_count(patron_id)
 
-    if current_borrowed > 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
+    if current_borrowed >= MAX_BORROW_LIMIT:
+        return False, f"You have reached the maximum borrowing limit of {MAX_BORROW_LIMIT} books."
 
     # Create borrow record
     borrow_date = datetime.now()
     due_date = borrow_date + timedelta(days=14)
 
-    # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
-        return False, "Database error occurred while creating borrow record."
+    def checkout(conn):
+        # Re-check the limit under the write lock: concurrent borrows by the
+        # same patron (or earlier ones in the same group commit) count too
+        if get_patron_borrow_count(patron_id, conn=conn) >= MAX_BORROW_LIMIT:
+            return False, f"You have reached the maximum borrowing limit of {MAX_BORROW_LIMIT} books."
+
+        # Claim the copy first: the conditional update fails if a concurrent
+        # borrower took the last copy after the availability check above
+        if not update_book_availability(book_id, -1, conn=conn):
+            return False, "This book is currently not available."
 
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
+        if not insert_borrow_record(patron_id, book_id, borrow_date, due_date, conn=conn):
+            return False, "Database error occurred while creating borrow record."
 
-    return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
+        return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
+    # Insert borrow record and update availability in a single transaction
+    return run_in_transaction(checkout)
 
+
+LOAN_PERIOD_DAYS = 14
 LATE_FEE_RATE = 0.50
+LATE_FEE_RATE_AFTER_FIRST_WEEK = 1.00
+MAX_LATE_FEE = 15.00
+
+
+def compute_late_fee(days_overdue: int) -> float:
+    """
+    Late fee for a number of days overdue (R5 tiers):
+    $0.50/day for the first 7 days, $1.00/day after that, capped at $15.00.
+    """
+    if days_overdue <= 0:
+        return 0.0
+    if days_overdue <= 7:
+        fee_amount = LATE_FEE_RATE * days_overdue
+    else:
+        fee_amount = LATE_FEE_RATE * 7 + LATE_FEE_RATE_AFTER_FIRST_WEEK * (days_overdue - 7)
+    return round(min(fee_amount, MAX_LATE_FEE), 2)
 
 
 def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
@@ -122,34 +184,185 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not book:
         return False, "Error: Book not found."
 
-    conn = get_db_connection()
-    record = conn.execute('''
-        SELECT * FROM borrow_records
-        WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ORDER BY borrow_date ASC
-        LIMIT 1
-    ''', (patron_id, book_id)).fetchone()
-    conn.close()
-
-    if not record:
-        return False, "Error: Book not borrowed by this patron."
-
-    # Calculate late fee before returning the book
-    late_fee_info = calculate_late_fee_for_book(patron_id, book_id)
-    fee_amount = late_fee_info.get('fee_amount', 0.0)
-
     # Process return
     return_date = datetime.now()
-    success_record = update_borrow_record_return_date(patron_id, book_id, return_date)
-    success_book = update_book_availability(book_id, 1)
 
-    if success_record and success_book:
-        if fee_amount > 0:
-            return True, f"Book returned successfully. Late fee owed: ${fee_amount:.2f}"
+    def check_in(conn):
+        # The loan and its fee are read under the write lock, so a concurrent
+        # return or payment cannot change them before the record is closed
+        loans = get_open_loans_for_books(patron_id, [book_id], return_date.date(), LOAN_PERIOD_DAYS, conn)
+        if not loans:
+            return False, "Error: Book not borrowed by this patron."
+
+        # one copy comes back, so exactly one loan is closed: the oldest.
+        # The assessed fee is stored; what was already paid on the loan is
+        # netted out of the patron's outstanding total and of the message
+        loan = calculate_late_fees_for_loans(loans[:1], return_date.date())[0]
+        if not close_borrow_record(loan['borrow_record_id'], return_date, loan['fee_amount'], conn):
+            return False, "Error: Could not process return."
+
+        if not update_book_availability(book_id, 1, conn=conn):
+            return False, "Error: Could not process return."
+
+        if loan['amount_due'] > 0:
+            return True, f"Book returned successfully. Late fee owed: ${loan['amount_due']:.2f}"
         else:
             return True, "Book returned successfully. No late fee owed."
-    else:
-        return False, "Error: Could not process return."
+
+    # Close the record and release the copy in a single transaction
+    return run_in_transaction(check_in)
+
+
+MAX_BATCH_ITEMS = 50
+
+
+def _validate_batch(patron_id: str, book_ids: List) -> Optional[str]:
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return "Invalid patron ID. Must be exactly 6 digits."
+    if not isinstance(book_ids, list) or not book_ids:
+        return "book_ids must be a non-empty list."
+    if len(book_ids) > MAX_BATCH_ITEMS:
+        return f"At most {MAX_BATCH_ITEMS} items per request."
+    if not all(isinstance(book_id, int) and not isinstance(book_id, bool) for book_id in book_ids):
+        return "book_ids must be integers."
+    return None
+
+
+def _apply_items(conn, items: List[Tuple[Dict, Callable[[], Optional[str]]]]):
+    # each item is written under its own savepoint, so a failing item
+    # leaves no partial changes while the others still commit together
+    for result, apply in items:
+        conn.execute('SAVEPOINT batch_item')
+        try:
+            error = apply()
+        except sqlite3.Error as e:
+            error = f"Database error: {e}"
+        if error:
+            conn.execute('ROLLBACK TO batch_item')
+            result.update(success=False, message=error)
+        conn.execute('RELEASE batch_item')
+
+
+def _batch_report(patron_id: str, results: List[Dict]) -> Dict:
+    succeeded = sum(1 for result in results if result['success'])
+    return {
+        "status": "Success",
+        "patron_id": patron_id,
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded
+    }
+
+
+def borrow_books_by_patron(patron_id: str, book_ids: List[int]) -> Dict:
+    """
+    Borrow several books for one patron in a single transaction (self-checkout).
+
+    The patron is validated once; the borrowing limit and every book's
+    availability come from one query taken under the write lock. Items are
+    handled in order, so once the limit of MAX_BORROW_LIMIT open loans is
+    reached the remaining items fail.
+
+    Returns:
+        dict: status, patron_id, results (book_id, success, message per item,
+              in request order), succeeded and failed; or status "Error"
+              with a message when the request itself is invalid
+    """
+    error = _validate_batch(patron_id, book_ids)
+    if error:
+        return {"status": "Error", "message": error}
+
+    borrow_date = datetime.now()
+    due_date = borrow_date + timedelta(days=LOAN_PERIOD_DAYS)
+
+    with transaction() as conn:
+        active_loans, books = get_books_for_checkout(patron_id, sorted(set(book_ids)), conn)
+        remaining = {book_id: book['available_copies'] for book_id, book in books.items()}
+        results, items = [], []
+
+        for book_id in book_ids:
+            result = {"book_id": book_id, "success": True}
+            results.append(result)
+            book = books.get(book_id)
+            if book is None:
+                result.update(success=False, message="Book not found.")
+            elif remaining[book_id] <= 0:
+                result.update(success=False, message="This book is currently not available.")
+            elif active_loans >= MAX_BORROW_LIMIT:
+                result.update(success=False,
+                              message=f"You have reached the maximum borrowing limit of {MAX_BORROW_LIMIT} books.")
+            else:
+                remaining[book_id] -= 1
+                active_loans += 1
+                result["message"] = (f'Successfully borrowed "{book["title"]}". '
+                                     f'Due date: {due_date.strftime("%Y-%m-%d")}.')
+
+                def checkout(book_id=book_id):
+                    if not update_book_availability(book_id, -1, conn=conn):
+                        return "This book is currently not available."
+                    if not insert_borrow_record(patron_id, book_id, borrow_date, due_date, conn=conn):
+                        return "Database error occurred while creating borrow record."
+                    return None
+                items.append((result, checkout))
+
+        _apply_items(conn, items)
+
+    return _batch_report(patron_id, results)
+
+
+def return_books_by_patron(patron_id: str, book_ids: List[int]) -> Dict:
+    """
+    Return several books for one patron in a single transaction (book drop).
+
+    The patron's open loans of all the books are read in one query; each item
+    closes the patron's oldest open loan of that book and assesses its late fee.
+
+    Returns:
+        dict: status, patron_id, results (book_id, success, message and
+              late_fee per item, in request order), succeeded and failed; or
+              status "Error" with a message when the request itself is invalid
+    """
+    error = _validate_batch(patron_id, book_ids)
+    if error:
+        return {"status": "Error", "message": error}
+
+    return_date = datetime.now()
+
+    with transaction() as conn:
+        open_loans: Dict[int, List[Dict]] = {}
+        loans = get_open_loans_for_books(patron_id, sorted(set(book_ids)), return_date.date(),
+                                         LOAN_PERIOD_DAYS, conn)
+        for loan in calculate_late_fees_for_loans(loans, return_date.date()):
+            open_loans.setdefault(loan['book_id'], []).append(loan)
+        results, items = [], []
+
+        for book_id in book_ids:
+            result = {"book_id": book_id, "success": True, "late_fee": 0.0}
+            results.append(result)
+            if not open_loans.get(book_id):
+                result.update(success=False, message="Book not borrowed by this patron.")
+                continue
+
+            loan = open_loans[book_id].pop(0)
+            amount_due = loan['amount_due']
+            result["late_fee"] = amount_due
+            result["message"] = (f"Book returned successfully. Late fee owed: ${amount_due:.2f}" if amount_due > 0
+                                 else "Book returned successfully. No late fee owed.")
+
+            def check_in(book_id=book_id, loan=loan):
+                if not close_borrow_record(loan['borrow_record_id'], return_date, loan['fee_amount'], conn):
+                    return "Could not process return."
+                if not update_book_availability(book_id, 1, conn=conn):
+                    return "Could not process return."
+                return None
+            items.append((result, check_in))
+
+        _apply_items(conn, items)
+
+    for result in results:
+        if not result['success']:
+            result['late_fee'] = 0.0
+    return _batch_report(patron_id, results)
 
 
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
@@ -180,16 +393,16 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     if not record:
         return {"fee_amount": 0.0, "days_overdue": 0, "copies_overdue": [], "status": "No active borrow record"}
 
-    borrow_date = datetime.fromisoformat(record["borrow_date"]).date()
     today = datetime.now().date()
-    days_borrowed = (today - borrow_date).days
-    overdue_days = max(0, days_borrowed - 14)
-
-    if overdue_days <= 7:
-        fee_amount = 0.5 * overdue_days
+    if record.get("borrow_day") is not None:
+        # integer day number maintained by the database, no string parsing
+        days_borrowed = to_day_number(today) - record["borrow_day"]
+        borrow_date = from_day_number(record["borrow_day"])
     else:
-        fee_amount = 0.5 * 7 + 1.0 * (overdue_days - 7)
-    fee_amount = min(fee_amount, 15.0)
+        borrow_date = datetime.fromisoformat(record["borrow_date"]).date()
+        days_borrowed = (today - borrow_date).days
+    overdue_days = max(0, days_borrowed - LOAN_PERIOD_DAYS)
+    fee_amount = compute_late_fee(overdue_days)
 
     copies_overdue = [{
         "borrow_date": borrow_date.isoformat(),
@@ -201,10 +414,75 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
         "fee_amount": round(fee_amount, 2),
         "days_overdue": overdue_days,
         "copies_overdue": copies_overdue,
+        "borrow_record_id": record["id"],
+        "amount_paid": record.get("amount_paid", 0.0),
         "status": "Success"
     }
 
 
+def calculate_late_fees_for_loans(loans: List[Dict], as_of: Optional[date] = None) -> List[Dict]:
+    """
+    Calculate late fees for many loans in one pass.
+
+    Args:
+        loans: Loan dicts; each needs either days_overdue or borrow_date
+               (ISO string or datetime)
+        as_of: Date to calculate fees for (defaults to today)
+
+    Returns:
+        list: The loans with days_overdue, fee_amount and amount_due (fee_amount
+              less any amount_paid on the loan) filled in
+    """
+    as_of = as_of or datetime.now().date()
+    results = []
+    for loan in loans:
+        days_overdue = loan.get('days_overdue')
+        if days_overdue is None:
+            borrow_date = loan['borrow_date']
+            if isinstance(borrow_date, str):
+                borrow_date = datetime.fromisoformat(borrow_date)
+            days_overdue = max(0, (as_of - borrow_date.date()).days - LOAN_PERIOD_DAYS)
+        fee_amount = compute_late_fee(days_overdue)
+        amount_due = round(max(0.0, fee_amount - loan.get('amount_paid', 0.0)), 2)
+        results.append({**loan, 'days_overdue': days_overdue, 'fee_amount': fee_amount, 'amount_due': amount_due})
+    return results
+
+
+def calculate_outstanding_late_fees(patron_ids: Optional[List[str]] = None, overdue_only: bool = False,
+                                    as_of: Optional[date] = None, use_primary: bool = False) -> Dict:
+    """
+    Calculate late fees for every open loan of the given patrons (or the whole library).
+    Uses a single query over borrow_records instead of one fee lookup per loan.
+
+    Args:
+        patron_ids: 6-digit patron IDs to include (None for all patrons)
+        overdue_only: Only return loans that are past due
+        as_of: Date to calculate fees for (defaults to today)
+        use_primary: Read the primary database rather than the read-only copy
+                     (for charging, so that recent payments are seen)
+
+    Returns:
+        dict: status, loans (with days_overdue, fee_amount and amount_due),
+              total_fees, total_due and count
+    """
+    if patron_ids is not None:
+        for patron_id in patron_ids:
+            if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+                return {"status": "Error", "message": "Invalid patron ID. Must be exactly 6 digits."}
+
+    as_of = as_of or datetime.now().date()
+    loans = calculate_late_fees_for_loans(
+        get_active_loans(as_of, patron_ids, overdue_only, LOAN_PERIOD_DAYS, use_primary), as_of)
+
+    return {
+        "status": "Success",
+        "loans": loans,
+        "total_fees": round(sum(loan['fee_amount'] for loan in loans), 2),
+        "total_due": round(sum(loan['amount_due'] for loan in loans), 2),
+        "count": len(loans)
+    }
+
+
 def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     """
     Search for books in the catalog.
@@ -215,13 +493,26 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     if not search_term:
         return []
 
-    conn = get_db_connection()
+    if search_type == 'keyword':
+        # title or author, word-prefix match ranked by relevance (FTS5 index)
+        return search_books_fulltext(search_term)
+
+    if search_type == 'fuzzy':
+        # title or author, tolerant of typos, ranked by trigram similarity
+        return search_books_fuzzy(search_term)
+
+    conn = get_read_connection()
     books: List[Dict] = []
 
     if search_type == 'isbn':
-        # exact match
-        query = "SELECT * FROM books WHERE isbn = ? ORDER BY title"
-        params = (search_term,)
+        # exact match on the normalised key (ISBN-10 and hyphenated input too)
+        query = "SELECT * FROM books WHERE isbn13 = ? ORDER BY title"
+        params = (isbn_key(search_term),)
+
+    elif search_type == 'isbn_prefix':
+        # publisher/group range, e.g. 978-0-306
+        conn.close()
+        return get_books_by_isbn_prefix(search_term)
 
     elif search_type == 'title':
         # case-insensitive partial match for the title
@@ -247,15 +538,116 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
 
         print(f"Database error during search: {e}")
 
+    finally:
+        conn.close()
+
     # list of books returned
     return books
 
 
-def get_patron_status_report(patron_id: str) -> Dict:
+MAX_SUGGESTIONS = 25
+
+
+def suggest_books(prefix: str, limit: int = 10, kind: Optional[str] = None) -> Dict:
+    """
+    Typeahead completions for the search box.
+
+    Args:
+        prefix: Start of any word in a title or author name
+        limit: Maximum number of completions (1 to MAX_SUGGESTIONS)
+        kind: 'title' or 'author' to complete only one of them (None for both)
+
+    Returns:
+        dict: status, prefix, suggestions (text, kind, books) and count
+    """
+    prefix = (prefix or '').strip()
+    if not prefix:
+        return {"status": "Error", "message": "Prefix is required."}
+    if kind is not None and kind not in SUGGEST_KINDS:
+        return {"status": "Error", "message": f"Kind must be one of: {', '.join(SUGGEST_KINDS)}."}
+
+    suggestions = get_suggestions(prefix, max(1, min(limit, MAX_SUGGESTIONS)), kind)
+    return {
+        "status": "Success",
+        "prefix": prefix,
+        "suggestions": suggestions,
+        "count": len(suggestions),
+    }
+
+
+CATALOG_PAGE_SIZE = 50
+MAX_CATALOG_PAGE_SIZE = 200
+
+
+def encode_catalog_cursor(book: Dict) -> str:
+    """Encode the (title, id) key of a book as an opaque, URL-safe page cursor."""
+    key = json.dumps([book['title'], book['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(key).decode('ascii')
+
+
+def decode_catalog_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """Decode a page cursor back into a (title, id) key; None if it is malformed."""
+    try:
+        title, book_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        return None
+    if not isinstance(title, str) or not isinstance(book_id, int):
+        return None
+    return title, book_id
+
+
+def get_catalog_page(cursor: Optional[str] = None, page_size: int = CATALOG_PAGE_SIZE) -> Dict:
+    """
+    Get one page of the catalog ordered by title.
+    Implements R2 for large catalogs: keyset pagination on (title, id)
+
+    Args:
+        cursor: next_cursor from the previous page (None for the first page)
+        page_size: Books per page (clamped to 1..MAX_CATALOG_PAGE_SIZE)
+
+    Returns:
+        dict: status, books, page_size and next_cursor (None on the last page)
+    """
+    page_size = max(1, min(page_size, MAX_CATALOG_PAGE_SIZE))
+
+    after = None
+    if cursor:
+        after = decode_catalog_cursor(cursor)
+        if after is None:
+            return {"status": "Error", "message": "Invalid page cursor."}
+
+    # one extra row tells us whether another page follows
+    books = get_books_page(page_size + 1, after)
+    next_cursor = None
+    if len(books) > page_size:
+        books = books[:page_size]
+        next_cursor = encode_catalog_cursor(books[-1])
+
+    return {
+        "status": "Success",
+        "books": books,
+        "page_size": page_size,
+        "next_cursor": next_cursor
+    }
+
+
+HISTORY_PAGE_SIZE = 20
+
+
+def get_patron_status_report(patron_id: str, history_page: int = 1,
+                             history_per_page: int = HISTORY_PAGE_SIZE) -> Dict:
     """
     Get status report for a patron.
-    
-    TODO: Implement R7 as per requirements
+    Implements R7: current loans with due dates and late fees, total fees owed,
+    number of books borrowed and a page of the borrowing history.
+
+    Args:
+        patron_id: 6-digit library card ID
+        history_page: 1-based page of the borrowing history (most recent first)
+        history_per_page: Returned loans per history page
+
+    Returns:
+        dict: the report, or status "Error" with a message
     """
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return {
@@ -263,74 +655,124 @@ def get_patron_status_report(patron_id: str) -> Dict:
             "message": "Invalid patron ID. Must be exactly 6 digits."
         }
 
-    # get  patron borrowing data
+    history_page = max(1, history_page)
+    history_per_page = max(1, min(history_per_page, 100))
+
+    # current loans and the history page come back from one query
     try:
-        borrowed_books_list = get_patron_borrowed_books(patron_id)
-        borrow_count = get_patron_borrow_count(patron_id)
+        records = get_patron_loans(patron_id, datetime.now().date(), history_per_page,
+                                   (history_page - 1) * history_per_page, LOAN_PERIOD_DAYS)
+        # counted separately: a page past the end has no rows to carry it
+        history_total = get_patron_history_count(patron_id)
     except Exception as e:
         return {
             "status": "Error",
             "message": f"Database error while fetching patron records: {e}"
         }
 
-    # calculate total late fees
-    total_late_fees = 0.00
-    current_loans_report = []
-
-    for book in borrowed_books_list:
-        late_fee, overdue_days = (0.00, 0)
-
-        if book.get("is_overdue"):
-            late_fee, overdue_days = calculate_late_fee_for_book(book["due_date"])
-            total_late_fees += late_fee
-
-        current_loans_report.append({
-            "book_id": book["book_id"],
-            "title": book["title"],
-            "author": book["author"],
-            "due_date": book["due_date"].strftime("%Y-%m-%d"),
-            "is_overdue": book["is_overdue"],
-            "days_overdue": overdue_days,
-            "late_fee_current": late_fee
-        })
-
-    # borrowing history handling
-    try:
-        borrowing_history = []
-        history_status = (
-            "Borrowing history not implemented yet."
-            if not borrowing_history else
-            "History retrieved successfully."
-        )
-    except Exception:
-        borrowing_history = []
-        history_status = "Error retrieving full borrowing history."
+    active = calculate_late_fees_for_loans([r for r in records if r["return_date"] is None])
+    active.sort(key=lambda loan: loan["borrow_date"])
+    returned = sorted((r for r in records if r["return_date"] is not None),
+                      key=lambda loan: (loan["return_date"], loan["borrow_record_id"]), reverse=True)
+
+    current_loans_report = [{
+        "book_id": loan["book_id"],
+        "title": loan["title"],
+        "author": loan["author"],
+        "borrow_date": loan["borrow_date"][:10],
+        "due_date": loan["due_date"][:10],
+        "is_overdue": loan["days_overdue"] > 0,
+        "days_overdue": loan["days_overdue"],
+        # net of payments, so the total agrees with calculate_outstanding_late_fees
+        "late_fee_current": loan["amount_due"]
+    } for loan in active]
+
+    borrowing_history = [{
+        "book_id": loan["book_id"],
+        "title": loan["title"],
+        "author": loan["author"],
+        "borrow_date": loan["borrow_date"][:10],
+        "due_date": loan["due_date"][:10],
+        "return_date": loan["return_date"][:10]
+    } for loan in returned]
 
     return {
         "status": "Success",
         "patron_id": patron_id,
-        "number_of_books_borrowed": borrow_count,
+        "number_of_books_borrowed": len(current_loans_report),
         "books_currently_borrowed": current_loans_report,
-        "total_late_fees_owed": round(total_late_fees, 2),
+        "total_late_fees": round(sum(loan["late_fee_current"] for loan in current_loans_report), 2),
+        "outstanding_fees_on_returned_books": get_patron_summary(patron_id)["outstanding_fees"],
         "borrowing_history_summary": borrowing_history,
-        "_history_note": history_status
+        "history_page": history_page,
+        "history_per_page": history_per_page,
+        "history_total": history_total
     }
 
 
-def get_patron_status_report(patron_id):
-    # mainly for testing purposes, ignore
+def _prepare_late_fee_payment(patron_id: str, book_id: int) -> Tuple[Optional[str], float, Optional[Dict],
+                                                                      List[Tuple[Optional[int], float]]]:
     """
-    Returns a summary of a patron's current borrowing status.
-    Uses placeholder vals
+    Validate a late fee payment and look up what to charge: the fee owed on the
+    open loan of the book, or else the unpaid fees assessed when it was returned.
+
+    Returns:
+        tuple: (error message or None, amount still owed, book, [(borrow record id, amount)])
     """
-    report = {
-        "_history_note": "Borrowing history not implemented yet.",
-        "books_currently_borrowed": [],
-        "borrowing_history_summary": [],
-        "number_of_books_borrowed": 0,
-        "total_late_fees": 0.0,  # i added this so tests pass
-    }
-    return report
+    # Validate patron ID
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return "Invalid patron ID. Must be exactly 6 digits.", 0.0, None, []
+
+    # Calculate late fee first
+    fee_info = calculate_late_fee_for_book(patron_id, book_id)
+
+    # Check if there's a fee to pay
+    if not fee_info or 'fee_amount' not in fee_info:
+        return "Unable to calculate late fees.", 0.0, None, []
+
+    # fees already settled for this loan are not charged again
+    fee_amount = round(fee_info.get('fee_amount', 0.0) - fee_info.get('amount_paid', 0.0), 2)
+    charges = [(fee_info.get('borrow_record_id'), fee_amount)] if fee_amount > 0 else []
+    if not charges:
+        # a fee assessed at return stays owed after the loan is closed
+        charges = [(loan['borrow_record_id'], loan['amount_due'])
+                   for loan in get_returned_loans_owing([patron_id], book_id)]
+
+    if not charges:
+        return "No late fees to pay for this book.", 0.0, None, []
+
+    # Get book details for payment description
+    book = get_book_by_id(book_id)
+    if not book:
+        return "Book not found.", 0.0, None, []
+
+    return None, round(sum(amount for _, amount in charges), 2), book, charges
+
+
+def _gateway_call(payment_gateway: Union[PaymentGateway, AsyncPaymentGateway], method: str,
+                  *args, **kwargs) -> Awaitable:
+    """Await a gateway method: directly on an AsyncPaymentGateway, on a worker thread for the sync client."""
+    if isinstance(payment_gateway, AsyncPaymentGateway):
+        return getattr(payment_gateway, method)(*args, **kwargs)
+    return asyncio.to_thread(getattr(payment_gateway, method), *args, **kwargs)
+
+
+def _run_sync(coroutine: Awaitable):
+    """Run a coroutine to completion from sync code, also when this thread already runs an event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def _unrecorded_charge_message(transaction_id: str, refunded: bool, refund_message: str) -> str:
+    """Message for a charge that succeeded but could not be written to the payment ledger."""
+    if refunded:
+        return "Payment could not be recorded, so the charge was refunded. Please try again."
+    return (f"Payment {transaction_id} was charged but could not be recorded, and the refund failed: "
+            f"{refund_message}. Please contact library staff.")
 
 
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[
@@ -355,49 +797,198 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         mock_gateway.process_payment.return_value = (True, "txn_123", "Success")
         success, msg, txn = pay_late_fees("123456", 1, mock_gateway)
     """
-    # Validate patron ID
-    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
-        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+    # Use provided gateway or create new one
+    if payment_gateway is None:
+        payment_gateway = PaymentGateway()
 
-    # Calculate late fee first
-    fee_info = calculate_late_fee_for_book(patron_id, book_id)
+    return _run_sync(pay_late_fees_async(patron_id, book_id, payment_gateway))
 
-    # Check if there's a fee to pay
-    if not fee_info or 'fee_amount' not in fee_info:
-        return False, "Unable to calculate late fees.", None
 
-    fee_amount = fee_info.get('fee_amount', 0.0)
+async def pay_late_fees_async(patron_id: str, book_id: int,
+                              payment_gateway: Union[PaymentGateway, AsyncPaymentGateway]) -> Tuple[
+    bool, str, Optional[str]]:
+    """
+    Process payment for late fees; pay_late_fees is the sync form of this.
+    With an AsyncPaymentGateway the gateway call is awaited, so many payments
+    can run concurrently (e.g. with asyncio.gather).
 
-    if fee_amount <= 0:
-        return False, "No late fees to pay for this book.", None
+    A charge whose ledger entry cannot be written is refunded, since an
+    unrecorded payment would leave the loan owing and be charged again.
 
-    # Get book details for payment description
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not found.", None
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book with late fees
+        payment_gateway: AsyncPaymentGateway or PaymentGateway instance
 
-    # Use provided gateway or create new one
-    if payment_gateway is None:
-        payment_gateway = PaymentGateway()
+    Returns:
+        tuple: (success: bool, message: str, transaction_id: Optional[str])
+    """
+    error, fee_amount, book, charges = _prepare_late_fee_payment(patron_id, book_id)
+    if error:
+        return False, error, None
 
     # Process payment through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
     try:
-        success, transaction_id, message = payment_gateway.process_payment(
+        success, transaction_id, message = await _gateway_call(
+            payment_gateway, 'process_payment',
             patron_id=patron_id,
             amount=fee_amount,
             description=f"Late fees for '{book['title']}'"
         )
-
-        if success:
-            return True, f"Payment successful! {message}", transaction_id
-        else:
-            return False, f"Payment failed: {message}", None
-
     except Exception as e:
         # Handle payment gateway errors
         return False, f"Payment processing error: {str(e)}", None
 
+    if not success:
+        return False, f"Payment failed: {message}", None
+
+    ledger = [(borrow_record_id, patron_id, amount, transaction_id, 'paid', message)
+              for borrow_record_id, amount in charges if borrow_record_id is not None]
+    if ledger and not record_late_fee_payments(ledger):
+        try:
+            refunded, refund_message = await _gateway_call(payment_gateway, 'refund_payment',
+                                                           transaction_id, fee_amount)
+        except Exception as e:
+            refunded, refund_message = False, str(e)
+        return (False, _unrecorded_charge_message(transaction_id, refunded, refund_message),
+                None if refunded else transaction_id)
+
+    return True, f"Payment successful! {message}", transaction_id
+
+
+async def _charge_patron_fees(patron_id: str, loans: List[Dict],
+                              payment_gateway: Union[PaymentGateway, AsyncPaymentGateway]) -> Tuple[bool, str, str]:
+    """Charge everything a patron owes as one gateway payment."""
+    titles = ', '.join(loan['title'] for loan in loans)
+    amount = round(sum(loan['amount_due'] for loan in loans), 2)
+    try:
+        return await _gateway_call(
+            payment_gateway, 'process_payment',
+            patron_id=patron_id,
+            amount=amount,
+            description=f"Late fees for {len(loans)} book(s): {titles}"[:200]
+        )
+    except Exception as e:
+        return False, "", f"Payment processing error: {str(e)}"
+
+
+async def _refund_patron_charge(result: Dict, payment_gateway: Union[PaymentGateway, AsyncPaymentGateway]):
+    """Refund a settled charge that could not be recorded and mark its result accordingly."""
+    try:
+        refunded, refund_message = await _gateway_call(payment_gateway, 'refund_payment',
+                                                       result['transaction_id'], result['amount'])
+    except Exception as e:
+        refunded, refund_message = False, str(e)
+    result['success'] = False
+    result['message'] = _unrecorded_charge_message(result['transaction_id'], refunded, refund_message)
+    for loan in result['loans']:
+        loan['status'] = 'refunded' if refunded else 'unrecorded'
+    return refunded
+
+
+def settle_late_fees(patron_ids: List[str],
+                     payment_gateway: Union[PaymentGateway, AsyncPaymentGateway] = None) -> Dict:
+    """
+    Pay every outstanding late fee of one or more patrons.
+    Sync form of settle_late_fees_async (usable from inside an event loop too).
+    """
+    return _run_sync(settle_late_fees_async(patron_ids, payment_gateway))
+
+
+async def settle_late_fees_async(patron_ids: List[str],
+                                 payment_gateway: Union[PaymentGateway, AsyncPaymentGateway] = None) -> Dict:
+    """
+    Pay every outstanding late fee of one or more patrons.
+
+    Each patron's overdue loans, and returned loans whose assessed fee is still
+    unpaid, are charged as a single gateway payment, and
+    different patrons are charged concurrently (awaited on an
+    AsyncPaymentGateway, on worker threads with the sync gateway). The outcome
+    is recorded per loan in late_fee_payments, so paid loans are not charged
+    again. If the ledger cannot be written the successful charges are
+    refunded and the status is "Error".
+
+    Args:
+        patron_ids: 6-digit library card IDs
+        payment_gateway: Payment gateway instance (injectable for testing)
+
+    Returns:
+        dict: status, per-patron results (with per-loan outcomes) and total_charged
+    """
+    fees = calculate_outstanding_late_fees(patron_ids, overdue_only=True, use_primary=True)
+    if fees['status'] != 'Success':
+        return fees
+
+    # fees assessed on returned loans are owed too until they are paid
+    owed: Dict[str, List[Dict]] = {}
+    for loan in fees['loans'] + get_returned_loans_owing(patron_ids):
+        if loan['amount_due'] > 0:
+            owed.setdefault(loan['patron_id'], []).append(loan)
+
+    if payment_gateway is None:
+        payment_gateway = PaymentGateway()
+
+    patrons = list(owed)
+    outcomes = await asyncio.gather(*(
+        _charge_patron_fees(patron_id, owed[patron_id], payment_gateway) for patron_id in patrons))
+
+    results = []
+    ledger = []
+    for patron_id, (success, transaction_id, message) in zip(patrons, outcomes):
+        status = 'paid' if success else 'failed'
+        loans = owed[patron_id]
+        amount = round(sum(loan['amount_due'] for loan in loans), 2)
+        for loan in loans:
+            ledger.append((loan['borrow_record_id'], patron_id, loan['amount_due'],
+                           transaction_id or None, status, message))
+        results.append({
+            "patron_id": patron_id,
+            "success": success,
+            "transaction_id": transaction_id or None,
+            "amount": amount,
+            "message": message,
+            "loans": [{
+                "borrow_record_id": loan['borrow_record_id'],
+                "book_id": loan['book_id'],
+                "title": loan['title'],
+                "amount": loan['amount_due'],
+                "status": status
+            } for loan in loans]
+        })
+
+    recorded = not ledger or record_late_fee_payments(ledger)
+    if not recorded:
+        charged = [result for result in results if result['success']]
+        refunds = await asyncio.gather(*(_refund_patron_charge(result, payment_gateway) for result in charged))
+        total_charged = sum(result['amount'] for result, refunded in zip(charged, refunds) if not refunded)
+        return {
+            "status": "Error",
+            "message": "Payments could not be recorded; successful charges were refunded where possible.",
+            "patrons": results,
+            "total_charged": round(total_charged, 2)
+        }
+
+    return {
+        "status": "Success",
+        "patrons": results,
+        "total_charged": round(sum(result['amount'] for result in results if result['success']), 2)
+    }
+
+
+def _validate_refund(transaction_id: str, amount: float) -> Optional[str]:
+    """Get the reason a refund request is invalid, or None if it is valid."""
+    if not transaction_id or not transaction_id.startswith("txn_"):
+        return "Invalid transaction ID."
+
+    if amount <= 0:
+        return "Refund amount must be greater than 0."
+
+    if amount > 15.00:  # Maximum late fee per book
+        return "Refund amount exceeds maximum late fee."
+
+    return None
+
 
 def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[
     bool, str]:
@@ -415,14 +1006,9 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
         tuple: (success: bool, message: str)
     """
     # Validate inputs
-    if not transaction_id or not transaction_id.startswith("txn_"):
-        return False, "Invalid transaction ID."
-
-    if amount <= 0:
-        return False, "Refund amount must be greater than 0."
-
-    if amount > 15.00:  # Maximum late fee per book
-        return False, "Refund amount exceeds maximum late fee."
+    error = _validate_refund(transaction_id, amount)
+    if error:
+        return False, error
 
     # Use provided gateway or create new one
     if payment_gateway is None:
@@ -440,3 +1026,33 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
 
     except Exception as e:
         return False, f"Refund processing error: {str(e)}"
+
+
+async def refund_late_fee_payment_async(transaction_id: str, amount: float,
+                                        payment_gateway: AsyncPaymentGateway) -> Tuple[bool, str]:
+    """
+    Refund a late fee payment through the asyncio gateway client.
+    Same checks and results as refund_late_fee_payment.
+
+    Args:
+        transaction_id: Original transaction ID to refund
+        amount: Amount to refund
+        payment_gateway: AsyncPaymentGateway instance
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    error = _validate_refund(transaction_id, amount)
+    if error:
+        return False, error
+
+    try:
+        success, message = await payment_gateway.refund_payment(transaction_id, amount)
+
+        if success:
+            return True, message
+        else:
+            return False, f"Refund failed: {message}"
+
+    except Exception as e:
+        return False, f"Refund processing error: {str(e)}"
@@ -0,0 +1,44 @@
+"""
+Patron Service Module - Maintenance of the per-patron counters
+The patrons table (active loans, outstanding fees) is kept up to date by
+database triggers; this command checks it against borrow_records and
+rebuilds it if it ever drifts.
+
+Usage:
+    python -m services.patron_service verify
+    python -m services.patron_service rebuild
+"""
+
+import argparse
+import sys
+from typing import List, Optional
+
+from database.database import init_database, rebuild_patron_summaries, verify_patron_summaries
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verify or rebuild the per-patron loan and fee counters.")
+    parser.add_argument('command', choices=['verify', 'rebuild'])
+    args = parser.parse_args(argv)
+
+    init_database()
+
+    if args.command == 'rebuild':
+        count = rebuild_patron_summaries()
+        print(f"Rebuilt counters for {count} patrons.")
+        return 0
+
+    mismatches = verify_patron_summaries()
+    for row in mismatches:
+        print(f"{row['patron_id']}: active_loans {row['stored_active_loans']} "
+              f"(expected {row['expected_active_loans']}), outstanding_fees {row['stored_outstanding_fees']} "
+              f"(expected {row['expected_outstanding_fees']})")
+    if mismatches:
+        print(f"{len(mismatches)} patrons out of sync; run 'rebuild' to fix.")
+        return 1
+    print("All patron counters match borrow_records.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
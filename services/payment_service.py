@@ -6,10 +6,18 @@ For Assignment 3: You will learn to mock this service in their tests
 since we cannot make actual payment API calls during testing.
 """
 
+import asyncio
+import functools
 import requests
-from typing import Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional, Tuple, Union
 import time
 
+from instrumentation import timed_gateway_call
+
+DEFAULT_GATEWAY_URL = "https://api.payment-gateway.example.com"
+
 
 class PaymentGateway:
     """
@@ -30,8 +38,9 @@ class PaymentGateway:
             api_key: API key for authentication (default is test key)
         """
         self.api_key = api_key
-        self.base_url = "https://api.payment-gateway.example.com"
+        self.base_url = DEFAULT_GATEWAY_URL
 
+    @timed_gateway_call
     def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
         """
         Process a payment through the external gateway.
@@ -82,6 +91,7 @@ class PaymentGateway:
         transaction_id = f"txn_{patron_id}_{int(time.time())}"
         return True, transaction_id, f"Payment of ${amount:.2f} processed successfully"
 
+    @timed_gateway_call
     def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
         """
         Refund a previous payment.
@@ -107,6 +117,7 @@ class PaymentGateway:
         refund_id = f"refund_{transaction_id}_{int(time.time())}"
         return True, f"Refund of ${amount:.2f} processed successfully. Refund ID: {refund_id}"
 
+    @timed_gateway_call
     def verify_payment_status(self, transaction_id: str) -> Dict:
         """
         Check the status of a payment transaction.
@@ -131,4 +142,154 @@ class PaymentGateway:
             "status": "completed",
             "amount": 10.50,
             "timestamp": time.time()
-        }
\ No newline at end of file
+        }
+
+
+class AsyncPaymentGateway:
+    """
+    asyncio client for the payment gateway's HTTP API.
+
+    Unlike PaymentGateway, calls are awaitable, so many payments can be in
+    flight at once without holding a Flask worker per payment. Requests share
+    one pooled HTTP session (keep-alive connections are reused) and run on a
+    bounded thread pool, which also caps how many calls are in flight.
+
+    For testing, point base_url at a local stub server.
+    """
+
+    def __init__(self, api_key: str = "test_key_12345", base_url: str = DEFAULT_GATEWAY_URL,
+                 max_concurrency: int = 10, timeout: Union[float, Tuple[float, float]] = (3.05, 10.0)):
+        """
+        Initialize the client.
+
+        Args:
+            api_key: API key for authentication (default is test key)
+            base_url: Root URL of the gateway API
+            max_concurrency: Maximum number of requests in flight (and pooled connections)
+            timeout: Request timeout in seconds, or a (connect, read) tuple
+        """
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="payment-gateway")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release pooled connections and worker threads."""
+        self.session.close()
+        self._executor.shutdown(wait=False)
+
+    async def _request(self, method: str, path: str, **kwargs) -> Tuple[Optional[Dict], str]:
+        """
+        Send one request on the worker pool.
+
+        Returns:
+            tuple: (response body or None on failure, message)
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.session.request, method, f"{self.base_url}{path}",
+                                 timeout=self.timeout, **kwargs)
+        try:
+            response = await loop.run_in_executor(self._executor, call)
+        except requests.Timeout:
+            return None, "Payment gateway timed out"
+        except requests.RequestException as e:
+            return None, f"Payment gateway unreachable: {e}"
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code >= 400:
+            return None, body.get("message") or f"Payment gateway error (HTTP {response.status_code})"
+        return body, body.get("message", "")
+
+    @timed_gateway_call
+    async def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
+        """
+        Process a payment through the external gateway.
+
+        Args:
+            patron_id: 6-digit patron/customer ID
+            amount: Payment amount in dollars
+            description: Payment description
+
+        Returns:
+            tuple: (success: bool, transaction_id: str, message: str)
+        """
+        if amount <= 0:
+            return False, "", "Invalid amount: must be greater than 0"
+
+        if len(patron_id) != 6:
+            return False, "", "Invalid patron ID format"
+
+        body, message = await self._request("POST", "/charges", json={
+            "customer_id": patron_id,
+            "amount": amount,
+            "currency": "usd",
+            "description": description
+        })
+        if body is None:
+            return False, "", message
+
+        transaction_id = body.get("id", "")
+        if body.get("status") not in ("succeeded", "completed") or not transaction_id:
+            return False, "", message or "Payment declined"
+        return True, transaction_id, message or f"Payment of ${amount:.2f} processed successfully"
+
+    @timed_gateway_call
+    async def refund_payment(self, transaction_id: str, amount: float) -> Tuple[bool, str]:
+        """
+        Refund a previous payment.
+
+        Args:
+            transaction_id: Original transaction ID to refund
+            amount: Amount to refund
+
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        if not transaction_id or not transaction_id.startswith("txn_"):
+            return False, "Invalid transaction ID"
+
+        if amount <= 0:
+            return False, "Invalid refund amount"
+
+        body, message = await self._request("POST", "/refunds", json={
+            "transaction_id": transaction_id,
+            "amount": amount
+        })
+        if body is None:
+            return False, message
+        return True, message or f"Refund of ${amount:.2f} processed successfully. Refund ID: {body.get('id', '')}"
+
+    @timed_gateway_call
+    async def verify_payment_status(self, transaction_id: str) -> Dict:
+        """
+        Check the status of a payment transaction.
+
+        Args:
+            transaction_id: Transaction ID to check
+
+        Returns:
+            dict: Payment status information
+        """
+        if not transaction_id or not transaction_id.startswith("txn_"):
+            return {"status": "not_found", "message": "Transaction not found"}
+
+        body, message = await self._request("GET", f"/charges/{transaction_id}")
+        if body is None:
+            return {"status": "error", "message": message}
+        return body
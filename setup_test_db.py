@@ -2,8 +2,11 @@ import sqlite3
 from datetime import datetime, timedelta
 import os
 
-def setup_db():
-    db_path = os.environ.get("DATABASE", "library_test.db")
+from database.isbn import isbn_key
+from database.migrations import apply_migrations
+
+def setup_db(db_path=None):
+    db_path = db_path or os.environ.get("DATABASE", "library_test.db")
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
@@ -29,6 +32,9 @@ def setup_db():
         )
     ''')
 
+    conn.commit()
+    apply_migrations(conn)
+
     cursor.execute('DELETE FROM borrow_records')
     cursor.execute('DELETE FROM books')
 
@@ -42,9 +48,9 @@ def setup_db():
     ]
     for title, author, isbn, total, available in books:
         cursor.execute('''
-            INSERT INTO books (title, author, isbn, total_copies, available_copies)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, author, isbn, total, available))
+            INSERT INTO books (title, author, isbn, isbn13, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (title, author, isbn, isbn_key(isbn), total, available))
 
     today = datetime.now()
     borrow_records = [
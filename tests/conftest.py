@@ -0,0 +1,14 @@
+import pytest
+
+import database.database as db
+from database.connection import close_all_pools
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point the database module at a fresh, initialised database file."""
+    path = str(tmp_path / "library.db")
+    monkeypatch.setattr(db, "DATABASE", path)
+    db.init_database()
+    yield path
+    close_all_pools()
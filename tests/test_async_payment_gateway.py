@@ -0,0 +1,138 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from services.library_service import pay_late_fees_async, refund_late_fee_payment_async
+from services.payment_service import AsyncPaymentGateway
+
+STUB_DELAY = 0.2
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the payment gateway API."""
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        time.sleep(STUB_DELAY)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.headers.get("Authorization") != "Bearer test_key_12345":
+            self._reply(401, {"message": "Unauthorized"})
+        elif self.path == "/charges" and body["amount"] > 1000:
+            self._reply(402, {"message": "Payment declined: amount exceeds limit"})
+        elif self.path == "/charges":
+            self._reply(200, {"id": f"txn_{body['customer_id']}_1", "status": "succeeded",
+                              "message": f"Payment of ${body['amount']:.2f} processed successfully"})
+        elif self.path == "/refunds":
+            self._reply(200, {"id": "refund_1", "status": "succeeded", "message": "Refund processed"})
+        else:
+            self._reply(404, {"message": "Not found"})
+
+    def do_GET(self):
+        self._reply(200, {"transaction_id": self.path.rsplit("/", 1)[-1], "status": "completed"})
+
+
+class TestAsyncPaymentGateway(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGatewayHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    def test_process_payment_success(self):
+        async def scenario():
+            async with AsyncPaymentGateway(base_url=self.base_url) as gateway:
+                return await gateway.process_payment("123456", 10.0, "Late fees")
+        success, txn_id, msg = self.run_async(scenario())
+        self.assertTrue(success)
+        self.assertEqual(txn_id, "txn_123456_1")
+        self.assertIn("processed successfully", msg)
+
+    def test_process_payment_declined_by_gateway(self):
+        async def scenario():
+            async with AsyncPaymentGateway(base_url=self.base_url) as gateway:
+                return await gateway.process_payment("123456", 5000.0)
+        success, txn_id, msg = self.run_async(scenario())
+        self.assertFalse(success)
+        self.assertEqual(txn_id, "")
+        self.assertIn("declined", msg.lower())
+
+    def test_payments_run_concurrently(self):
+        """Ten payments finish in roughly the time of one, not ten."""
+        async def scenario():
+            async with AsyncPaymentGateway(base_url=self.base_url, max_concurrency=10) as gateway:
+                return await asyncio.gather(*(gateway.process_payment(f"1234{i:02d}", 1.0) for i in range(10)))
+        started = time.perf_counter()
+        results = self.run_async(scenario())
+        elapsed = time.perf_counter() - started
+        self.assertTrue(all(success for success, _, _ in results))
+        self.assertLess(elapsed, STUB_DELAY * 5)
+
+    def test_timeout_is_reported(self):
+        async def scenario():
+            async with AsyncPaymentGateway(base_url=self.base_url, timeout=0.05) as gateway:
+                return await gateway.process_payment("123456", 10.0)
+        success, _, msg = self.run_async(scenario())
+        self.assertFalse(success)
+        self.assertIn("timed out", msg.lower())
+
+    def test_unreachable_gateway(self):
+        async def scenario():
+            async with AsyncPaymentGateway(base_url="http://127.0.0.1:9", timeout=1) as gateway:
+                return await gateway.refund_payment("txn_123", 5.0)
+        success, msg = self.run_async(scenario())
+        self.assertFalse(success)
+        self.assertIn("unreachable", msg.lower())
+
+    def test_verify_payment_status(self):
+        async def scenario():
+            async with AsyncPaymentGateway(base_url=self.base_url) as gateway:
+                return await gateway.verify_payment_status("txn_123")
+        self.assertEqual(self.run_async(scenario())["status"], "completed")
+
+    @patch("services.library_service.get_book_by_id", return_value={"title": "Test Book"})
+    @patch("services.library_service.calculate_late_fee_for_book", return_value={"fee_amount": 5.00})
+    def test_pay_late_fees_async(self, mock_calc_fee, mock_get_book):
+        async def scenario():
+            async with AsyncPaymentGateway(base_url=self.base_url) as gateway:
+                return await pay_late_fees_async("123456", 1, gateway)
+        success, msg, txn = self.run_async(scenario())
+        self.assertTrue(success)
+        self.assertIn("Payment successful", msg)
+        self.assertEqual(txn, "txn_123456_1")
+
+    def test_refund_late_fee_payment_async_validates_first(self):
+        async def scenario():
+            async with AsyncPaymentGateway(base_url=self.base_url) as gateway:
+                return (await refund_late_fee_payment_async("txn_123", 20.0, gateway),
+                        await refund_late_fee_payment_async("txn_123", 5.0, gateway))
+        rejected, accepted = self.run_async(scenario())
+        self.assertFalse(rejected[0])
+        self.assertIn("exceeds maximum", rejected[1])
+        self.assertEqual(accepted, (True, "Refund processed"))
+
+
+if __name__ == "__main__":
+    unittest.main()
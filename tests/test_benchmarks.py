@@ -0,0 +1,79 @@
+"""
+Tests for the benchmark helpers (data generation, operations, statistics and baseline comparison)
+"""
+import database.database as db
+from benchmarks.data import generate_dataset, patron_ids
+from benchmarks.run import build_operations, compare_to_baseline, measure, percentile
+from routes.http_cache import response_cache
+
+
+def test_percentile_nearest_rank():
+    """Percentiles use the nearest-rank method on sorted samples."""
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 95) == 0.0
+
+
+def test_measure_reports_latency_and_throughput():
+    """measure calls the operation once per iteration after the warm-up."""
+    calls = []
+    result = measure(lambda: calls.append(1), iterations=20, warmup=3)
+    assert len(calls) == 23
+    assert result['iterations'] == 20
+    assert result['p50_ms'] <= result['p95_ms'] <= result['max_ms']
+    assert result['ops_per_sec'] > 0
+
+
+def test_compare_to_baseline_flags_slowdowns_beyond_tolerance():
+    """Only operations slower than baseline * (1 + tolerance) are regressions."""
+    baseline = {'results': {
+        'borrow': {'p50_ms': 1.0, 'p95_ms': 2.0},
+        'search': {'p50_ms': 1.0, 'p95_ms': 2.0},
+    }}
+    report = {'results': {
+        'borrow': {'p50_ms': 1.1, 'p95_ms': 2.2},
+        'search': {'p50_ms': 1.0, 'p95_ms': 3.0},
+        'new_op': {'p50_ms': 9.0, 'p95_ms': 9.0},
+    }}
+    regressions = compare_to_baseline(report, baseline, tolerance=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('search: p95_ms')
+
+
+def test_generate_dataset(temp_db, tmp_path):
+    """The generated database holds the fixture data plus the requested books and loans."""
+    dataset = generate_dataset(str(tmp_path / "bench.db"), books=50, patrons=5, loans=200, seed=1)
+    assert dataset == {"books": 50, "patrons": 5, "loans": 200, "active_ratio": 0.05, "seed": 1}
+
+    conn = db.get_db_connection()
+    try:
+        synthetic = conn.execute("SELECT COUNT(*) FROM books WHERE isbn LIKE '979%'").fetchone()[0]
+        patrons = {row[0] for row in conn.execute("SELECT DISTINCT patron_id FROM borrow_records "
+                                                  "WHERE patron_id != '123456'")}
+        oversold = conn.execute("SELECT COUNT(*) FROM books WHERE available_copies < 0").fetchone()[0]
+    finally:
+        conn.close()
+    assert synthetic == 50
+    assert patrons <= set(patron_ids(5))
+    assert oversold == 0
+
+
+def test_build_operations_run_and_cache_only_the_cached_routes(temp_db, tmp_path):
+    """Every operation runs, and only the *_cached routes are served from the response cache."""
+    dataset = generate_dataset(str(tmp_path / "bench.db"), books=30, patrons=5, loans=60, seed=2)
+    operations = build_operations(dataset, seed=2)
+    assert {"route_catalog", "route_catalog_cached", "route_api_search", "route_api_search_cached"} <= set(operations)
+
+    for operation in operations.values():
+        operation()
+
+    hits = response_cache.hits
+    operations["route_catalog"]()
+    operations["route_catalog"]()
+    assert response_cache.hits == hits
+
+    operations["route_catalog_cached"]()
+    operations["route_catalog_cached"]()
+    assert response_cache.hits == hits + 1
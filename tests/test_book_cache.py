@@ -0,0 +1,87 @@
+import time
+
+from database.cache import LRUCache, book_cache
+from database.database import (
+    get_book_by_id, get_book_by_isbn, get_db_connection, insert_book, update_book_availability
+)
+from services.library_service import borrow_book_by_patron
+
+
+def _add_book(isbn="9780000001001", copies=2):
+    insert_book("Cached Book", "Author", isbn, copies, copies)
+    return get_book_by_isbn(isbn)["id"]
+
+
+def test_repeated_lookups_hit_cache(temp_db):
+    """Once a book is loaded, lookups by id or ISBN are served from the cache."""
+    book_id = _add_book()  # the ISBN lookup in _add_book loads the row
+    before = book_cache.stats()
+    get_book_by_id(book_id)
+    get_book_by_id(book_id)
+    get_book_by_isbn("9780000001001")
+    after = book_cache.stats()
+    assert after["hits"] - before["hits"] == 3
+    assert after["misses"] == before["misses"]
+
+
+def test_cached_rows_cannot_be_mutated(temp_db):
+    """Callers get copies, so changing a returned dict does not poison the cache."""
+    book_id = _add_book()
+    get_book_by_id(book_id)["title"] = "Changed"
+    assert get_book_by_id(book_id)["title"] == "Cached Book"
+
+
+def test_availability_update_invalidates(temp_db):
+    """Both the id and ISBN entries are dropped when availability changes."""
+    book_id = _add_book()
+    get_book_by_id(book_id)
+    get_book_by_isbn("9780000001001")
+    assert update_book_availability(book_id, -1)
+    assert get_book_by_id(book_id)["available_copies"] == 1
+    assert get_book_by_isbn("9780000001001")["available_copies"] == 1
+
+
+def test_borrow_transaction_invalidates(temp_db):
+    """A borrow made through the transactional path is visible right away."""
+    book_id = _add_book()
+    get_book_by_id(book_id)
+    success, _ = borrow_book_by_patron("123456", book_id)
+    assert success
+    assert get_book_by_id(book_id)["available_copies"] == 1
+
+
+def test_missing_book_is_not_cached(temp_db):
+    """Inserting a book that was looked up before is seen immediately."""
+    assert get_book_by_isbn("9780000001002") is None
+    _add_book("9780000001002")
+    assert get_book_by_isbn("9780000001002") is not None
+
+
+def test_entries_expire_and_are_bounded():
+    """Entries expire after the ttl and the least recently used are evicted."""
+    cache = LRUCache(max_entries=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+def test_external_writes_visible_after_ttl(temp_db):
+    """Writes that bypass the helpers are picked up once the entry expires."""
+    book_id = _add_book()
+    book_cache.configure(ttl=0.05)
+    try:
+        get_book_by_id(book_id)
+        conn = get_db_connection()
+        conn.execute("UPDATE books SET title = 'Outside' WHERE id = ?", (book_id,))
+        conn.commit()
+        conn.close()
+        time.sleep(0.06)
+        assert get_book_by_id(book_id)["title"] == "Outside"
+    finally:
+        book_cache.configure(ttl=5.0)
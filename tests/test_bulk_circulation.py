@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from app import create_app
+from database.database import (
+    get_book_by_id, get_book_by_isbn, get_patron_borrow_count, get_patron_summary, insert_book,
+    insert_borrow_record, verify_patron_summaries
+)
+from services.library_service import MAX_BORROW_LIMIT, borrow_books_by_patron, return_books_by_patron
+
+
+def _books(*copies):
+    ids = []
+    for i, count in enumerate(copies):
+        isbn = f"97800000007{i:02d}"
+        insert_book(f"Kiosk Book {i}", "Author", isbn, count, count)
+        ids.append(get_book_by_isbn(isbn)["id"])
+    return ids
+
+
+def test_bulk_borrow_per_item_results(temp_db):
+    """Available books are borrowed; missing and unavailable ones fail individually."""
+    a, b, c = _books(2, 1, 0)
+    report = borrow_books_by_patron("900001", [a, b, b, c, 99999])
+
+    assert report["status"] == "Success"
+    assert [r["success"] for r in report["results"]] == [True, True, False, False, False]
+    assert "not available" in report["results"][2]["message"]
+    assert report["results"][4]["message"] == "Book not found."
+    assert (report["succeeded"], report["failed"]) == (2, 3)
+
+    assert get_book_by_id(a)["available_copies"] == 1
+    assert get_book_by_id(b)["available_copies"] == 0
+    assert get_patron_borrow_count("900001") == 2
+
+
+def test_bulk_borrow_enforces_limit(temp_db):
+    (a,) = _books(10)
+    report = borrow_books_by_patron("900002", [a] * (MAX_BORROW_LIMIT + 2))
+    assert report["succeeded"] == MAX_BORROW_LIMIT
+    assert "maximum borrowing limit" in report["results"][-1]["message"]
+    assert get_book_by_id(a)["available_copies"] == 10 - MAX_BORROW_LIMIT
+
+
+def test_bulk_return_assesses_fees(temp_db):
+    """Each item closes the oldest open loan of that book and reports its fee."""
+    a, b = _books(2, 1)
+    late = datetime.now() - timedelta(days=20)  # 6 days overdue -> $3.00
+    insert_borrow_record("900003", a, late, late + timedelta(days=14))
+    borrow_books_by_patron("900003", [a, b])
+
+    report = return_books_by_patron("900003", [a, b, b])
+    assert [r["success"] for r in report["results"]] == [True, True, False]
+    assert report["results"][0]["late_fee"] == 3.0
+    assert "Late fee owed: $3.00" in report["results"][0]["message"]
+    assert report["results"][2]["message"] == "Book not borrowed by this patron."
+
+    summary = get_patron_summary("900003")
+    assert summary == {"patron_id": "900003", "active_loans": 1, "outstanding_fees": 3.0}
+    assert verify_patron_summaries() == []
+
+
+def test_invalid_requests(temp_db):
+    assert borrow_books_by_patron("12", [1])["status"] == "Error"
+    assert return_books_by_patron("900004", [])["status"] == "Error"
+    assert borrow_books_by_patron("900004", ["1"])["status"] == "Error"
+
+
+def test_bulk_endpoints(temp_db):
+    client = create_app().test_client()
+    (a,) = _books(3)
+
+    borrowed = client.post("/api/borrow", json={"patron_id": "900005", "book_ids": [a, a]})
+    assert borrowed.status_code == 200
+    assert borrowed.get_json()["succeeded"] == 2
+
+    returned = client.post("/api/return", json={"patron_id": "900005", "book_ids": [a]})
+    assert returned.get_json()["results"][0]["success"] is True
+    assert client.post("/api/return", json={"patron_id": "900005"}).status_code == 400
@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from database.database import get_book_by_isbn, get_patron_summary, insert_book, insert_borrow_record
+from services.library_service import (
+    calculate_outstanding_late_fees, pay_late_fees, return_book_by_patron, return_books_by_patron, settle_late_fees
+)
+from services.payment_service import PaymentGateway
+
+
+def _borrow(patron_id, isbn, days_ago):
+    insert_book(f"Book {isbn}", "Author", isbn, 1, 1)
+    book_id = get_book_by_isbn(isbn)["id"]
+    borrowed = datetime.now() - timedelta(days=days_ago)
+    insert_borrow_record(patron_id, book_id, borrowed, borrowed + timedelta(days=14))
+    return book_id
+
+
+def _gateway(success=True):
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.side_effect = lambda patron_id, amount, description: (
+        (True, f"txn_{patron_id}", "Success") if success else (False, "", "Payment declined"))
+    return gateway
+
+
+def test_one_charge_per_patron(temp_db):
+    """All of a patron's overdue loans are settled by a single gateway call."""
+    _borrow("111111", "9780000000801", 20)  # 3.00
+    _borrow("111111", "9780000000802", 24)  # 6.50
+    _borrow("111111", "9780000000803", 2)   # not overdue
+    gateway = _gateway()
+
+    result = settle_late_fees(["111111"], gateway)
+
+    gateway.process_payment.assert_called_once()
+    assert gateway.process_payment.call_args.kwargs["amount"] == 9.5
+    patron = result["patrons"][0]
+    assert patron["success"] and patron["transaction_id"] == "txn_111111"
+    assert [loan["status"] for loan in patron["loans"]] == ["paid", "paid"]
+    assert result["total_charged"] == 9.5
+    assert calculate_outstanding_late_fees(["111111"])["total_due"] == 0.0
+
+
+def test_several_patrons_and_failures_recorded(temp_db):
+    """Each patron gets their own charge; declined charges stay outstanding."""
+    _borrow("111111", "9780000000811", 20)
+    _borrow("222222", "9780000000812", 20)
+
+    result = settle_late_fees(["111111", "222222"], _gateway(success=False))
+
+    assert {p["patron_id"] for p in result["patrons"]} == {"111111", "222222"}
+    assert all(not p["success"] for p in result["patrons"])
+    assert result["total_charged"] == 0.0
+    assert calculate_outstanding_late_fees(["111111", "222222"])["total_due"] == 6.0
+
+
+def test_nothing_owed_makes_no_gateway_call(temp_db):
+    """Patrons without overdue loans are not charged."""
+    _borrow("111111", "9780000000821", 1)
+    gateway = _gateway()
+    result = settle_late_fees(["111111"], gateway)
+    assert result["patrons"] == []
+    gateway.process_payment.assert_not_called()
+
+
+def test_single_payment_is_not_charged_twice(temp_db):
+    """A fee paid with pay_late_fees is not charged again by either path."""
+    book_id = _borrow("111111", "9780000000831", 20)
+    gateway = _gateway()
+    success, _, _ = pay_late_fees("111111", book_id, gateway)
+    assert success
+
+    success, message, _ = pay_late_fees("111111", book_id, gateway)
+    assert not success and "no late fees" in message.lower()
+    assert settle_late_fees(["111111"], gateway)["patrons"] == []
+    assert gateway.process_payment.call_count == 1
+
+
+def test_fee_assessed_at_return_is_payable(temp_db):
+    """A returned book's unpaid fee is charged once and clears the patron's outstanding total."""
+    book_id = _borrow("111111", "9780000000871", 33)  # 19 days overdue -> $15.00 cap
+    assert return_book_by_patron("111111", book_id)[0]
+    assert get_patron_summary("111111")["outstanding_fees"] == 15.0
+    gateway = _gateway()
+
+    success, _, _ = pay_late_fees("111111", book_id, gateway)
+
+    assert success
+    assert gateway.process_payment.call_args.kwargs["amount"] == 15.0
+    assert get_patron_summary("111111")["outstanding_fees"] == 0.0
+    assert not pay_late_fees("111111", book_id, gateway)[0]
+    assert settle_late_fees(["111111"], gateway)["patrons"] == []
+    assert gateway.process_payment.call_count == 1
+
+
+def test_settlement_includes_returned_loans(temp_db):
+    """Settling charges open overdue loans and unpaid fees on returned ones together."""
+    returned = _borrow("111111", "9780000000881", 24)  # 6.50
+    _borrow("111111", "9780000000882", 20)             # 3.00
+    assert return_book_by_patron("111111", returned)[0]
+    gateway = _gateway()
+
+    result = settle_late_fees(["111111"], gateway)
+
+    gateway.process_payment.assert_called_once()
+    assert result["total_charged"] == 9.5
+    assert {loan["book_id"] for loan in result["patrons"][0]["loans"]} == {returned, returned + 1}
+    assert get_patron_summary("111111")["outstanding_fees"] == 0.0
+    assert calculate_outstanding_late_fees(["111111"])["total_due"] == 0.0
+
+
+def test_return_reports_only_the_unpaid_fee(temp_db):
+    """A fee paid before the return is not reported as owed again."""
+    paid = _borrow("111111", "9780000000891", 20)
+    assert pay_late_fees("111111", paid, _gateway())[0]
+    _borrow("111111", "9780000000892", 20)
+
+    success, message = return_book_by_patron("111111", paid)
+    assert success and message.endswith("No late fee owed.")
+    report = return_books_by_patron("111111", [paid + 1])
+    assert report["results"][0]["late_fee"] == 3.0
+
+    insert_borrow_record("111111", paid, datetime.now() - timedelta(days=20), datetime.now() - timedelta(days=6))
+    assert pay_late_fees("111111", paid, _gateway())[0]
+    assert return_books_by_patron("111111", [paid])["results"][0]["late_fee"] == 0.0
+    assert get_patron_summary("111111")["outstanding_fees"] == 3.0  # only the book returned unpaid
+
+
+def test_invalid_patron_rejected(temp_db):
+    assert settle_late_fees(["abc"], _gateway())["status"] == "Error"
+
+
+def test_unrecorded_settlement_is_refunded(temp_db):
+    """If the ledger write fails, successful charges are refunded instead of charged again later."""
+    _borrow("111111", "9780000000841", 20)
+    gateway = _gateway()
+    gateway.refund_payment.return_value = (True, "Refund processed")
+
+    with patch("services.library_service.record_late_fee_payments", return_value=False):
+        result = settle_late_fees(["111111"], gateway)
+
+    assert result["status"] == "Error"
+    gateway.refund_payment.assert_called_once_with("txn_111111", 3.0)
+    patron = result["patrons"][0]
+    assert not patron["success"] and "refunded" in patron["message"]
+    assert [loan["status"] for loan in patron["loans"]] == ["refunded"]
+    assert result["total_charged"] == 0.0
+
+
+def test_unrecorded_payment_with_failed_refund_is_reported(temp_db):
+    book_id = _borrow("111111", "9780000000851", 20)
+    gateway = _gateway()
+    gateway.refund_payment.return_value = (False, "Gateway down")
+
+    with patch("services.library_service.record_late_fee_payments", return_value=False):
+        success, message, transaction_id = pay_late_fees("111111", book_id, gateway)
+
+    assert not success
+    assert "could not be recorded" in message and "Gateway down" in message
+    assert transaction_id == "txn_111111"
+
+
+def test_sync_api_inside_running_event_loop(temp_db):
+    """settle_late_fees and pay_late_fees also work when called from a coroutine."""
+    book_id = _borrow("111111", "9780000000861", 20)
+    _borrow("222222", "9780000000862", 20)
+    gateway = _gateway()
+
+    async def caller():
+        return pay_late_fees("111111", book_id, gateway), settle_late_fees(["222222"], gateway)
+
+    (success, _, _), result = asyncio.run(caller())
+    assert success
+    assert result["status"] == "Success" and result["total_charged"] == 3.0
@@ -0,0 +1,63 @@
+from app import create_app
+from database.database import insert_book
+from services.library_service import get_catalog_page
+
+
+def _seed(count):
+    # duplicate titles make sure the id tie-breaker is honoured
+    for i in range(count):
+        insert_book(f"Book {i // 2:03d}", "Author", f"97800000{i:05d}", 1, 1)
+
+
+def test_pages_cover_catalog_once_in_order(temp_db):
+    """Walking every page returns each book exactly once, in (title, id) order."""
+    _seed(25)
+    seen = []
+    cursor = None
+    while True:
+        page = get_catalog_page(cursor, 7)
+        assert page["status"] == "Success"
+        assert len(page["books"]) <= 7
+        seen.extend((b["title"], b["id"]) for b in page["books"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 25
+    assert seen == sorted(seen)
+
+
+def test_last_full_page_has_no_next_cursor(temp_db):
+    """A catalog that fills the page exactly does not report another page."""
+    _seed(5)
+    page = get_catalog_page(None, 5)
+    assert len(page["books"]) == 5
+    assert page["next_cursor"] is None
+
+
+def test_invalid_cursor_is_rejected(temp_db):
+    """A tampered cursor is reported as an error."""
+    page = get_catalog_page("not-a-cursor", 10)
+    assert page["status"] == "Error"
+
+
+def test_page_size_is_clamped(temp_db):
+    """Oversized and zero page sizes are clamped."""
+    assert get_catalog_page(None, 10000)["page_size"] == 200
+    assert get_catalog_page(None, 0)["page_size"] == 1
+
+
+def test_books_api_and_catalog_page(temp_db):
+    """/api/books pages with cursors and /catalog renders a next link."""
+    app = create_app()
+    _seed(6)
+    client = app.test_client()
+
+    first = client.get("/api/books?per_page=5").get_json()
+    assert first["count"] == 5
+    second = client.get(f"/api/books?per_page=5&cursor={first['next_cursor']}").get_json()
+    assert second["next_cursor"] is None
+    assert first["count"] + second["count"] == 9  # 6 seeded + 3 sample books
+
+    assert client.get("/api/books?cursor=bogus").status_code == 400
+    html = client.get("/catalog?per_page=4").get_data(as_text=True)
+    assert "Next Page" in html
@@ -0,0 +1,112 @@
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from database.database import (
+    get_book_by_id, get_book_by_isbn, get_db_connection, get_patron_borrow_count, insert_book,
+    insert_borrow_record
+)
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+def _add_book(isbn, copies):
+    insert_book("Txn Book", "Txn Author", isbn, copies, copies)
+    return get_book_by_isbn(isbn)["id"]
+
+
+def test_borrow_and_return_update_availability(temp_db):
+    """A borrow and its return leave availability where it started."""
+    book_id = _add_book("9780000000101", 2)
+    success, _ = borrow_book_by_patron("111111", book_id)
+    assert success
+    assert get_book_by_id(book_id)["available_copies"] == 1
+    success, message = return_book_by_patron("111111", book_id)
+    assert success
+    assert "returned successfully" in message.lower()
+    assert get_book_by_id(book_id)["available_copies"] == 2
+
+
+def test_failed_insert_rolls_back_availability(temp_db):
+    """If the borrow record cannot be written the claimed copy is given back."""
+    book_id = _add_book("9780000000102", 1)
+    with patch("services.library_service.insert_borrow_record", return_value=False):
+        success, message = borrow_book_by_patron("111111", book_id)
+    assert not success
+    assert "database error" in message.lower()
+    assert get_book_by_id(book_id)["available_copies"] == 1
+
+
+def test_concurrent_borrowers_cannot_overdraw(temp_db):
+    """Only one of many simultaneous borrowers gets the last copy."""
+    book_id = _add_book("9780000000103", 1)
+    results = []
+    start = threading.Event()
+
+    def borrower(patron_id):
+        start.wait()
+        results.append(borrow_book_by_patron(patron_id, book_id)[0])
+
+    threads = [threading.Thread(target=borrower, args=(f"20000{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert get_book_by_id(book_id)["available_copies"] == 0
+    conn = get_db_connection()
+    loans = conn.execute("SELECT COUNT(*) FROM borrow_records WHERE book_id = ?", (book_id,)).fetchone()[0]
+    conn.close()
+    assert loans == 1
+
+
+def test_return_never_exceeds_total_copies(temp_db):
+    """Returning a book that is already fully available does not inflate the count."""
+    book_id = _add_book("9780000000104", 1)
+    borrow_book_by_patron("111111", book_id)
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET available_copies = 1 WHERE id = ?", (book_id,))
+    conn.commit()
+    conn.close()
+    success, _ = return_book_by_patron("111111", book_id)
+    assert success
+    assert get_book_by_id(book_id)["available_copies"] == 1
+    assert get_patron_borrow_count("111111") == 0
+
+
+def test_concurrent_borrows_respect_patron_limit(temp_db):
+    """Simultaneous borrows by one patron stop at the borrowing limit."""
+    book_id = _add_book("9780000000105", 10)
+    results = []
+    start = threading.Event()
+
+    def borrower():
+        start.wait()
+        results.append(borrow_book_by_patron("111111", book_id)[0])
+
+    threads = [threading.Thread(target=borrower) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 5
+    assert get_patron_borrow_count("111111") == 5
+    assert get_book_by_id(book_id)["available_copies"] == 5
+
+
+def test_return_closes_the_oldest_loan_with_its_fee(temp_db):
+    """The loan and its fee are read inside the return's transaction."""
+    book_id = _add_book("9780000000106", 2)
+    late = datetime.now() - timedelta(days=20)  # 6 days overdue -> $3.00
+    insert_borrow_record("111111", book_id, late, late + timedelta(days=14))
+    borrow_book_by_patron("111111", book_id)
+
+    success, message = return_book_by_patron("111111", book_id)
+    assert success and "$3.00" in message
+    assert get_patron_borrow_count("111111") == 1
+    success, message = return_book_by_patron("111111", book_id)
+    assert success and "No late fee" in message
+    assert return_book_by_patron("111111", book_id) == (False, "Error: Book not borrowed by this patron.")
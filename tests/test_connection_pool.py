@@ -0,0 +1,164 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database.database as db
+from database.connection import (
+    DEFAULT_STORAGE_PROFILE, ConnectionPool, PoolTimeoutError, configure_pools, profile_pragmas
+)
+from database.database import get_db_connection, get_book_by_id, insert_book
+
+
+def test_same_thread_reuses_connection(temp_db):
+    """Nested get_db_connection() calls on one thread share a connection."""
+    outer = get_db_connection()
+    inner = get_db_connection()
+    assert inner is outer
+    inner.close()
+    outer.close()
+
+
+def test_connection_is_reused_after_close(temp_db):
+    """A closed connection goes back to the pool instead of being reopened."""
+    conn = get_db_connection()
+    raw = conn._raw
+    conn.close()
+    conn = get_db_connection()
+    assert conn._raw is raw
+    conn.close()
+
+
+def test_helpers_work_through_pool(temp_db):
+    """Writes and reads through the helpers still see each other."""
+    assert insert_book("Pool Book", "Pool Author", "9780000000001", 2, 2)
+    conn = get_db_connection()
+    book_id = conn.execute("SELECT id FROM books WHERE isbn = '9780000000001'").fetchone()["id"]
+    conn.close()
+    assert get_book_by_id(book_id)["title"] == "Pool Book"
+
+
+def test_pragmas_applied_on_connect(tmp_path):
+    """Configured PRAGMAs are applied when the connection is opened."""
+    pool = ConnectionPool(str(tmp_path / "p.db"), pragmas={"foreign_keys": "ON", "cache_size": -4096})
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    assert conn.execute("PRAGMA cache_size").fetchone()[0] == -4096
+    conn.close()
+    pool.close()
+
+
+def test_uncommitted_work_rolled_back_on_release(tmp_path):
+    """Releasing a connection discards an unfinished transaction."""
+    pool = ConnectionPool(str(tmp_path / "p.db"))
+    conn = pool.acquire()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+    conn = pool.acquire()
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    conn.close()
+    pool.close()
+
+
+def test_pool_is_bounded(tmp_path):
+    """A full pool makes other threads wait and eventually time out."""
+    pool = ConnectionPool(str(tmp_path / "p.db"), max_size=1, timeout=0.1)
+    held = pool.acquire()
+    errors = []
+
+    def worker():
+        try:
+            pool.acquire()
+        except PoolTimeoutError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+    held.close()
+    pool.close()
+
+
+def test_connection_released_after_close_is_closed(tmp_path):
+    """A connection still checked out when the pool closes is closed on release, not pooled."""
+    pool = ConnectionPool(str(tmp_path / "p.db"))
+    conn = pool.acquire()
+    raw = conn._raw
+    pool.close()
+    conn.close()
+    assert pool._idle == [] and pool._open == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        raw.execute("SELECT 1")
+
+
+def test_request_shares_one_connection(temp_db):
+    """Inside a Flask request every helper uses the same connection."""
+    from flask import Flask
+    from database import connection
+
+    app = Flask(__name__)
+    connection.init_app(app)
+    with app.test_request_context():
+        first = get_db_connection()
+        first.close()
+        second = get_db_connection()
+        second.close()
+        assert second is first
+    assert connection.get_pool(temp_db)._local.conn is None
+
+
+def test_default_storage_profile_uses_wal(temp_db):
+    """init_database switches the file to WAL and connections get the profile PRAGMAs."""
+    conn = get_db_connection()
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_legacy_storage_profile(tmp_path, monkeypatch):
+    """The legacy profile keeps the rollback journal with full fsync."""
+    monkeypatch.setattr(db, "DATABASE", str(tmp_path / "legacy.db"))
+    configure_pools(storage_profile="legacy")
+    try:
+        db.init_database()
+        conn = get_db_connection()
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+        finally:
+            conn.close()
+    finally:
+        configure_pools(storage_profile=DEFAULT_STORAGE_PROFILE, pragmas={})
+
+
+def test_wal_writer_commits_while_reader_is_open(temp_db):
+    """Under WAL a commit does not wait for an open read transaction."""
+    reader = sqlite3.connect(temp_db, isolation_level=None)
+    writer = sqlite3.connect(temp_db, timeout=0)
+    try:
+        reader.execute("BEGIN")
+        before = reader.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+
+        # with a rollback journal this commit fails with "database is locked"
+        writer.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                       "VALUES ('T', 'A', '9780000000001', 1, 1)")
+        writer.commit()
+
+        assert reader.execute("SELECT COUNT(*) FROM books").fetchone()[0] == before
+        reader.execute("COMMIT")
+        assert reader.execute("SELECT COUNT(*) FROM books").fetchone()[0] == before + 1
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_unknown_storage_profile_rejected():
+    with pytest.raises(ValueError):
+        profile_pragmas("turbo")
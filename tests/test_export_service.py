@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from database.connection import DEFAULT_POOL_SIZE, get_pool
+import database.database as db
+from database.database import get_book_by_isbn, insert_book, insert_borrow_record
+from services import export_service
+from services.export_service import export_books, export_loans
+
+
+def _seed(count=7):
+    for i in range(count):
+        insert_book(f"Export {i}", "Author", f"97800000005{i:02d}", 2, 2)
+    book_id = get_book_by_isbn("9780000000500")["id"]
+    now = datetime.now()
+    insert_borrow_record("800001", book_id, now, now + timedelta(days=14))
+    insert_borrow_record("800002", book_id, now, now + timedelta(days=14))
+
+
+def test_books_ndjson_streams_in_batches(temp_db):
+    """Each chunk holds one fetchmany batch; together they cover the catalog."""
+    _seed()
+    chunks = list(export_books('ndjson', batch_size=3))
+    rows = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert len(chunks) == 3  # 7 seeded books in batches of 3
+    assert [row["title"] for row in rows] == [f"Export {i}" for i in range(7)]
+    assert set(rows[0]) == set(export_service.BOOK_FIELDS)
+
+
+def test_loans_csv_with_filters(temp_db):
+    _seed()
+    text = "".join(export_loans('csv', patron_id="800002", active_only=True))
+    rows = list(csv.DictReader(io.StringIO(text)))
+    assert [row["patron_id"] for row in rows] == ["800002"]
+    assert rows[0]["return_date"] == ""
+
+
+def test_export_endpoints_stream(temp_db):
+    app = create_app()
+    _seed(2)
+    client = app.test_client()
+
+    response = client.get("/api/export/books?format=csv")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert response.is_streamed
+    assert "attachment; filename=books.csv" == response.headers["Content-Disposition"]
+    assert response.get_data(as_text=True).splitlines()[0] == ",".join(export_service.BOOK_FIELDS)
+
+    loans = client.get("/api/export/loans?patron_id=800001")
+    assert loans.mimetype == "application/x-ndjson"
+    assert [json.loads(line)["patron_id"] for line in loans.get_data(as_text=True).splitlines()] == ["800001"]
+
+    assert client.get("/api/export/books?format=xml").status_code == 400
+
+
+def test_open_exports_do_not_hold_pool_connections(temp_db):
+    """More exports than pool slots can be mid-stream without checking out a pooled connection."""
+    _seed(2)
+    pool = get_pool(temp_db)
+    streams = [export_books('ndjson', batch_size=1) for _ in range(DEFAULT_POOL_SIZE + 1)]
+    try:
+        for stream in streams:
+            assert next(stream)
+        assert len(pool._idle) == pool._open
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+def test_export_connection_is_read_only(temp_db):
+    conn = db.get_export_connection()
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM books")
+    finally:
+        conn.close()
+
+
+def test_cli_writes_file(temp_db, tmp_path):
+    _seed(3)
+    out = tmp_path / "books.ndjson"
+    assert export_service.main(["books", "--output", str(out), "--batch-size", "2"]) == 0
+    assert len(out.read_text().splitlines()) == 3
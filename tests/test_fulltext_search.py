@@ -0,0 +1,82 @@
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from database.database import get_db_connection, insert_book, search_books_fulltext
+from services.library_service import search_books_in_catalog
+
+
+def _seed():
+    insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    insert_book("Great Expectations", "Charles Dickens", "9780141439563", 1, 1)
+    insert_book("Gatsby Revisited", "Someone Else", "9780000000300", 1, 1)
+
+
+def test_keyword_search_matches_title_and_author(temp_db):
+    """Keyword search looks at both title and author."""
+    _seed()
+    assert [b["title"] for b in search_books_in_catalog("dickens", "keyword")] == ["Great Expectations"]
+    titles = {b["title"] for b in search_books_in_catalog("great", "keyword")}
+    assert titles == {"The Great Gatsby", "Great Expectations"}
+
+
+def test_keyword_search_prefix_and_all_words(temp_db):
+    """Each word is a prefix match and all words must match."""
+    _seed()
+    results = search_books_in_catalog("fitz gats", "keyword")
+    assert [b["title"] for b in results] == ["The Great Gatsby"]
+
+
+def test_keyword_search_ranks_title_matches_first(temp_db):
+    """A book matching the term in its title ranks above an author-only match."""
+    insert_book("Orwell: A Life", "Bernard Crick", "9780000000301", 1, 1)
+    insert_book("Animal Farm", "George Orwell", "9780000000302", 1, 1)
+    results = search_books_in_catalog("orwell", "keyword")
+    assert results[0]["title"] == "Orwell: A Life"
+    assert len(results) == 2
+
+
+def test_keyword_index_follows_updates(temp_db):
+    """Triggers keep the index in sync when titles change."""
+    _seed()
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET title = 'Renamed Book' WHERE isbn = '9780141439563'")
+    conn.commit()
+    conn.close()
+    assert search_books_in_catalog("expectations", "keyword") == []
+    assert [b["isbn"] for b in search_books_in_catalog("renamed", "keyword")] == ["9780141439563"]
+
+
+def test_keyword_search_ignores_fts_syntax(temp_db):
+    """Query operators typed by users are treated as plain words."""
+    _seed()
+    assert search_books_in_catalog('"gatsby" OR NEAR(', "keyword") == []
+    assert search_books_in_catalog("***", "keyword") == []
+
+
+def test_keyword_search_falls_back_without_index(temp_db):
+    """A database without books_fts is searched with LIKE instead."""
+    _seed()
+    conn = get_db_connection()
+    for suffix in ("ai", "ad", "au"):
+        conn.execute(f"DROP TRIGGER books_fts_{suffix}")
+    conn.execute("DROP TABLE books_fts")
+    conn.commit()
+    conn.close()
+    assert [b["title"] for b in search_books_fulltext("dickens")] == ["Great Expectations"]
+
+
+class _LockedConnection:
+    def execute(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    def close(self):
+        pass
+
+
+def test_keyword_search_does_not_hide_other_errors(temp_db):
+    """Locks and other operational errors are raised, not turned into a table scan."""
+    with patch("database.database.get_read_connection", return_value=_LockedConnection()):
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            search_books_fulltext("gatsby")
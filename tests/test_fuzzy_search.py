@@ -0,0 +1,86 @@
+import sqlite3
+from unittest.mock import patch
+
+import pytest
+
+from database.database import get_db_connection, insert_book, search_books_fuzzy, trigram_similarity
+from services.library_service import search_books_in_catalog
+
+
+def _seed():
+    insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    insert_book("Nineteen Eighty-Four", "George Orwell", "9780451524935", 1, 1)
+    insert_book("Animal Farm", "George Orwell", "9780451526342", 1, 1)
+    insert_book("Great Expectations", "Charles Dickens", "9780141439563", 1, 1)
+
+
+def test_similarity_tolerates_typos():
+    assert trigram_similarity("orwell", "George Orwell") == 1.0
+    assert trigram_similarity("orwel", "George Orwell") > 0.5
+    assert trigram_similarity("fitzgerld", "F. Scott Fitzgerald") > 0.5
+    assert trigram_similarity("great gatsbi", "The Great Gatsby") > 0.5
+    assert trigram_similarity("dickens", "George Orwell") == 0.0
+    assert trigram_similarity("", "George Orwell") == 0.0
+
+
+def test_fuzzy_search_finds_misspelt_authors(temp_db):
+    _seed()
+    assert [b["title"] for b in search_books_in_catalog("Orwel", "fuzzy")] == [
+        "Animal Farm", "Nineteen Eighty-Four"]
+    assert [b["title"] for b in search_books_in_catalog("Fitzgerld", "fuzzy")] == ["The Great Gatsby"]
+    assert search_books_in_catalog("xyzzy", "fuzzy") == []
+    assert search_books_in_catalog("ab", "fuzzy") == []
+
+
+def test_fuzzy_search_ranks_by_similarity(temp_db):
+    _seed()
+    results = search_books_fuzzy("great expectatons")
+    assert results[0]["title"] == "Great Expectations"
+    assert results == sorted(results, key=lambda b: -b["similarity"])
+    assert all(b["similarity"] >= 0.3 for b in results)
+
+
+def test_trigram_index_follows_updates(temp_db):
+    _seed()
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET author = 'Jane Austen' WHERE isbn = '9780141439563'")
+    conn.commit()
+    conn.close()
+
+    assert [b["isbn"] for b in search_books_fuzzy("austin")] == ["9780141439563"]
+    assert search_books_fuzzy("dickens") == []
+
+
+def test_fuzzy_search_ignores_fts_syntax(temp_db):
+    _seed()
+    assert [b["author"] for b in search_books_fuzzy('"orwel"')] == ["George Orwell", "George Orwell"]
+    assert search_books_fuzzy('NEAR(orwel') == []
+    assert search_books_fuzzy('***') == []
+
+
+def test_fuzzy_search_without_trigram_index(temp_db):
+    """Databases without the trigram table still get fuzzy results by scanning."""
+    _seed()
+    conn = get_db_connection()
+    conn.execute("DROP TABLE books_trigram")
+    for suffix in ("ai", "ad", "au"):
+        conn.execute(f"DROP TRIGGER books_trigram_{suffix}")
+    conn.commit()
+    conn.close()
+
+    assert [b["title"] for b in search_books_fuzzy("fitzgerld")] == ["The Great Gatsby"]
+
+
+class _LockedConnection:
+    def execute(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    def close(self):
+        pass
+
+
+def test_fuzzy_search_does_not_hide_other_errors(temp_db):
+    """Only a missing trigram index falls back to a scan; a lock is raised."""
+    with patch("database.database.get_read_connection", return_value=_LockedConnection()):
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            search_books_fuzzy("gatsby")
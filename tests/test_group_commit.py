@@ -0,0 +1,155 @@
+import threading
+
+import pytest
+
+from app import create_app
+from database import group_commit
+from database.database import (
+    get_book_by_id, get_book_by_isbn, get_db_connection, get_patron_borrow_count, insert_book,
+    run_in_transaction, verify_patron_summaries
+)
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+@pytest.fixture
+def writer(temp_db):
+    # a wide window so concurrent callers reliably share a transaction
+    yield group_commit.enable(max_delay=0.05)
+    group_commit.disable()
+
+
+def _book(copies):
+    insert_book("Rush Hour", "Author", "9780000000800", copies, copies)
+    return get_book_by_isbn("9780000000800")["id"]
+
+
+def _tag_count(tag):
+    conn = get_db_connection()
+    count = conn.execute("SELECT COUNT(*) FROM books WHERE title = ?", (tag,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def _insert(tag, result=True):
+    def operation(conn):
+        conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                     "VALUES (?, 'Author', ?, 1, 1)", (tag, str(abs(hash(tag)) % 10 ** 13).zfill(13)))
+        if result is None:
+            raise RuntimeError("boom")
+        return result, tag
+    return operation
+
+
+def test_concurrent_borrows_share_commits(writer):
+    """Eight patrons borrowing at once: one per copy succeeds, in fewer transactions."""
+    book_id = _book(5)
+    results = [None] * 8
+
+    def borrow(i):
+        results[i] = borrow_book_by_patron(f"90010{i}", book_id)
+
+    threads = [threading.Thread(target=borrow, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(1 for success, _ in results if success) == 5
+    assert all("not available" in msg for success, msg in results if not success)
+    assert get_book_by_id(book_id)["available_copies"] == 0
+    assert writer.operations == 8
+    assert writer.batches < writer.operations
+    assert verify_patron_summaries() == []
+
+
+def test_grouped_borrows_respect_patron_limit(writer):
+    """Borrows by one patron sharing a transaction still stop at the limit."""
+    book_id = _book(10)
+    results = [None] * 8
+
+    def borrow(i):
+        results[i] = borrow_book_by_patron("900300", book_id)
+
+    threads = [threading.Thread(target=borrow, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(1 for success, _ in results if success) == 5
+    assert get_patron_borrow_count("900300") == 5
+    assert writer.batches < writer.operations
+
+
+def test_borrow_and_return_through_writer(writer):
+    book_id = _book(1)
+    assert borrow_book_by_patron("900201", book_id)[0] is True
+    assert get_patron_borrow_count("900201") == 1
+
+    success, message = return_book_by_patron("900201", book_id)
+    assert success is True
+    assert "returned successfully" in message
+    assert get_book_by_id(book_id)["available_copies"] == 1
+
+
+def test_failed_operation_rolls_back_alone(writer):
+    """A failing or raising operation is undone without touching the rest of its batch."""
+    outcomes = {}
+
+    def submit(tag, result):
+        try:
+            outcomes[tag] = run_in_transaction(_insert(tag, result))
+        except RuntimeError as e:
+            outcomes[tag] = e
+
+    threads = [threading.Thread(target=submit, args=args)
+               for args in (("kept-1", True), ("failed", False), ("raised", None), ("kept-2", True))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert outcomes["kept-1"] == (True, "kept-1")
+    assert outcomes["failed"] == (False, "failed")
+    assert isinstance(outcomes["raised"], RuntimeError)
+    assert [_tag_count(tag) for tag in ("kept-1", "failed", "raised", "kept-2")] == [1, 0, 0, 1]
+
+
+def test_create_app_enables_group_commit(temp_db):
+    try:
+        create_app({'DB_GROUP_COMMIT': True, 'DB_GROUP_COMMIT_MAX_BATCH': 8})
+        assert group_commit.active_writer().max_batch == 8
+    finally:
+        group_commit.disable()
+    assert group_commit.active_writer() is None
+
+    create_app()
+    assert group_commit.active_writer() is None
+
+
+@pytest.mark.parametrize("pool_size, borrowers", [(1, 1), (2, 4)])
+def test_borrows_through_flask_requests(temp_db, pool_size, borrowers):
+    """Requests pin a pooled connection; waiting on the writer must not starve it of one."""
+    app = create_app({'DB_GROUP_COMMIT': True, 'DB_GROUP_COMMIT_DELAY': 0.05,
+                      'DB_POOL_SIZE': pool_size, 'DB_POOL_TIMEOUT': 2})
+    try:
+        book_id = _book(borrowers)
+        statuses = [None] * borrowers
+
+        def borrow(i):
+            response = app.test_client().post(
+                "/borrow", data={"patron_id": f"90030{i}", "book_id": str(book_id)})
+            statuses[i] = response.status_code
+
+        threads = [threading.Thread(target=borrow, args=(i,)) for i in range(borrowers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert statuses == [302] * borrowers
+        assert get_book_by_id(book_id)["available_copies"] == 0
+        assert group_commit.active_writer().operations == borrowers
+    finally:
+        group_commit.disable()
+        create_app()
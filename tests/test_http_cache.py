@@ -0,0 +1,65 @@
+from app import create_app
+from database.database import get_catalog_version, insert_book, update_book_availability, get_book_by_isbn
+from routes.http_cache import response_cache
+
+
+def test_catalog_version_bumps_on_book_writes(temp_db):
+    """Every insert or availability change moves the catalog version forward."""
+    version = get_catalog_version()
+    insert_book("Versioned", "Author", "9780000000601", 2, 2)
+    after_insert = get_catalog_version()
+    assert after_insert > version
+
+    update_book_availability(get_book_by_isbn("9780000000601")["id"], -1)
+    assert get_catalog_version() > after_insert
+
+
+def test_etag_and_not_modified(temp_db):
+    """A matching If-None-Match gets a 304 until the catalog changes."""
+    client = create_app().test_client()
+    first = client.get("/api/search?q=gatsby&type=title")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/api/search?q=gatsby&type=title", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+
+    # a different query is a different representation
+    other = client.get("/api/search?q=1984&type=title", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+    insert_book("The Great Gatsby Companion", "Author", "9780000000602", 1, 1)
+    changed = client.get("/api/search?q=gatsby&type=title", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["count"] == 2
+
+
+def test_rendered_pages_are_reused(temp_db, monkeypatch):
+    """A second identical request is served from the response cache."""
+    client = create_app().test_client()
+    calls = []
+    import routes.search_routes as search_routes
+    original = search_routes.search_books_in_catalog
+    monkeypatch.setattr(search_routes, "search_books_in_catalog",
+                        lambda *args: calls.append(args) or original(*args))
+
+    first = client.get("/search?q=orwell&type=author")
+    second = client.get("/search?q=orwell&type=author")
+    assert first.get_data() == second.get_data()
+    assert len(calls) == 1
+    assert response_cache.stats()["size"] >= 1
+
+
+def test_pending_flash_bypasses_cache(temp_db):
+    """A page with a flash waiting in the session is rendered, not served from cache."""
+    client = create_app().test_client()
+    cached = client.get("/catalog")
+    with client.session_transaction() as session:
+        session["_flashes"] = [("success", "Pending message")]
+
+    page = client.get("/catalog", headers={"If-None-Match": cached.headers["ETag"]})
+    assert page.status_code == 200
+    assert "Pending message" in page.get_data(as_text=True)
@@ -0,0 +1,100 @@
+import json
+
+from database.database import get_all_books, get_book_by_isbn, insert_book
+from services.import_service import import_books_from_file, main
+
+
+def test_import_csv_with_rejections(temp_db, tmp_path):
+    """Valid rows are inserted; invalid and duplicate rows are reported by line."""
+    insert_book("Existing", "Author", "9780000000901", 1, 1)
+    path = tmp_path / "books.csv"
+    path.write_text(
+        "title,author,isbn,total_copies\n"
+        "Book A,Author A,9780000000902,2\n"
+        ",No Title,9780000000903,1\n"
+        "Book B,Author B,9780000000902,1\n"
+        "Book C,Author C,9780000000901,1\n"
+        "Book D,Author D,123,1\n"
+        "Book E,Author E,9780000000904,many\n"
+        "Book F,Author F,9780000000905,3\n"
+    )
+
+    report = import_books_from_file(str(path), chunk_size=2)
+
+    assert report["read"] == 7
+    assert report["inserted"] == 2
+    reasons = {r["line"]: r["reason"] for r in report["rejected"]}
+    assert reasons == {
+        3: "Title is required.",
+        4: "Duplicate ISBN in import file.",
+        5: "A book with this ISBN already exists.",
+        6: "ISBN must be exactly 13 digits.",
+        7: "Total copies must be a positive integer.",
+    }
+    assert get_book_by_isbn("9780000000905")["available_copies"] == 3
+
+
+def test_import_jsonl(temp_db, tmp_path):
+    """JSON Lines input is supported, including malformed lines."""
+    path = tmp_path / "books.jsonl"
+    path.write_text(
+        json.dumps({"title": "Json Book", "author": "Json Author", "isbn": "9780000000911", "total_copies": 1})
+        + "\n{not json\n"
+    )
+    report = import_books_from_file(str(path))
+    assert report["inserted"] == 1
+    assert report["rejected"][0]["line"] == 2
+
+
+def test_import_cli(temp_db, tmp_path, capsys):
+    """The command line entry point imports a file and writes rejects."""
+    source = tmp_path / "books.csv"
+    rejects = tmp_path / "rejects.jsonl"
+    source.write_text("title,author,isbn,total_copies\nCli Book,Cli Author,9780000000921,1\nBad,,1,1\n")
+
+    assert main([str(source), "--rejects", str(rejects)]) == 0
+    assert "inserted 1" in capsys.readouterr().out
+    assert len(rejects.read_text().splitlines()) == 1
+    assert [b["title"] for b in get_all_books()] == ["Cli Book"]
+
+
+def test_import_rejects_fractional_copies(temp_db, tmp_path):
+    """Copy counts must be whole numbers; 2.7 and true are not truncated to 2 and 1."""
+    path = tmp_path / "books.jsonl"
+    rows = [
+        {"title": "Frac", "author": "A", "isbn": "9780000000931", "total_copies": 2.7},
+        {"title": "Frac", "author": "A", "isbn": "9780000000932", "total_copies": "2.7"},
+        {"title": "Bool", "author": "A", "isbn": "9780000000933", "total_copies": True},
+        {"title": "Text", "author": "A", "isbn": "9780000000934", "total_copies": " 3 "},
+    ]
+    path.write_text("\n".join(json.dumps(row) for row in rows) + "\n")
+
+    report = import_books_from_file(str(path))
+
+    assert report["inserted"] == 1
+    assert [r["line"] for r in report["rejected"]] == [1, 2, 3]
+    assert get_book_by_isbn("9780000000931") is None
+    assert get_book_by_isbn("9780000000934")["total_copies"] == 3
+
+
+def test_import_dedupes_on_the_isbn_key(temp_db, tmp_path):
+    """ISBN-10 and hyphenated forms of one ISBN are duplicates, and the key form is stored."""
+    insert_book("Existing", "Author", "9780743273565", 1, 1)
+    path = tmp_path / "books.csv"
+    path.write_text(
+        "title,author,isbn,total_copies\n"
+        "Ten,Author,0-306-40615-2,1\n"
+        "Thirteen,Author,9780306406157,1\n"
+        "Hyphenated,Author,978-0-7432-7356-5,1\n"
+        "Typo,Author,0-306-40615-3,1\n"
+    )
+
+    report = import_books_from_file(str(path))
+
+    assert report["inserted"] == 1
+    assert {r["line"]: r["reason"] for r in report["rejected"]} == {
+        3: "Duplicate ISBN in import file.",
+        4: "A book with this ISBN already exists.",
+        5: "Invalid ISBN: check digit does not match.",
+    }
+    assert get_book_by_isbn("9780306406157")["isbn"] == "9780306406157"
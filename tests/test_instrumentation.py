@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import instrumentation
+from app import create_app
+from services.payment_service import PaymentGateway
+
+
+@pytest.fixture
+def instrumented_app(temp_db):
+    instrumentation.metrics.reset()
+    app = create_app({'INSTRUMENTATION': True})
+    yield app
+    instrumentation.enable(False)
+    instrumentation.metrics.reset()
+
+
+def test_disabled_by_default(temp_db):
+    """Without the flag there is no Server-Timing header and no /metrics route."""
+    client = create_app().test_client()
+    response = client.get('/api/search?q=gatsby&type=title')
+    assert 'Server-Timing' not in response.headers
+    assert client.get('/metrics').status_code == 404
+
+
+def test_server_timing_header_counts_sql(instrumented_app):
+    """Each response reports the SQL statements it ran."""
+    response = instrumented_app.test_client().get('/api/search?q=gatsby&type=title')
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('sql;dur=')
+    assert 'statements"' in timing and 'total;dur=' in timing
+    assert '"0 statements"' not in timing
+
+
+def test_metrics_endpoint_prometheus_format(instrumented_app):
+    """/metrics exposes request, SQL and cache metrics in text format."""
+    client = instrumented_app.test_client()
+    client.get('/api/search?q=gatsby&type=title')
+    response = client.get('/metrics')
+    body = response.get_data(as_text=True)
+
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE library_http_requests_total counter' in body
+    assert 'library_http_requests_total{endpoint="/api/search",method="GET",status="200"} 1' in body
+    assert 'library_http_request_duration_seconds_bucket{endpoint="/api/search",le="+Inf"} 1' in body
+    assert 'library_sql_statements_total ' in body
+    assert 'library_book_cache_entries ' in body
+
+    statements = client.get('/metrics/statements?limit=3').get_json()['statements']
+    assert 0 < len(statements) <= 3
+    assert {'sql', 'count', 'total_ms', 'max_ms'} <= set(statements[0])
+
+
+def test_gateway_calls_are_timed(instrumented_app, monkeypatch):
+    """Sync and async gateway methods record calls and time per operation."""
+    monkeypatch.setattr('services.payment_service.time.sleep', lambda seconds: None)
+    PaymentGateway().process_payment('123456', 5.0)
+
+    @instrumentation.timed_gateway_call
+    async def refund_payment():
+        return True
+
+    assert asyncio.run(refund_payment()) is True
+    body = instrumentation.metrics.render()
+    assert 'library_payment_gateway_calls_total{operation="process_payment"} 1' in body
+    assert 'library_payment_gateway_calls_total{operation="refund_payment"} 1' in body
+
+
+def test_request_profile_keeps_slowest_statements():
+    """Only the slowest few statements of a request are kept, slowest first."""
+    profile = instrumentation.RequestProfile()
+    for i in range(10):
+        profile.record_sql(f'SELECT {i}', i / 1000)
+    slowest = profile.slowest_statements()
+    assert [s['sql'] for s in slowest] == [f'SELECT {i}' for i in range(9, 4, -1)]
+    assert profile.sql_count == 10
@@ -0,0 +1,106 @@
+import pytest
+
+from database.database import (
+    get_book_by_isbn, get_books_by_isbn_prefix, get_catalog_version, get_db_connection, get_existing_isbns,
+    insert_book, insert_books_bulk
+)
+from database.isbn import isbn_key, isbn_prefix_range, normalize_isbn
+from services.library_service import add_book_to_catalog, search_books_in_catalog
+
+
+@pytest.mark.parametrize("value", [
+    "9780306406157", "978-0-306-40615-7", "978 0 306 40615 7", "0306406152", "0-306-40615-2",
+])
+def test_normalize_isbn_formats(value):
+    assert normalize_isbn(value) == "9780306406157"
+
+
+@pytest.mark.parametrize("value", ["9780306406158", "0306406153", "123456789", "", "978030640615X"])
+def test_normalize_isbn_rejects_invalid(value):
+    assert normalize_isbn(value) is None
+
+
+def test_isbn10_with_x_check_digit():
+    assert normalize_isbn("0-8044-2957-X") == "9780804429573"
+
+
+def test_isbn_key_converts_only_valid_isbn10():
+    """A mistyped ISBN-10 keeps its own key instead of another book's ISBN-13."""
+    assert isbn_key("0-306-40615-2") == "9780306406157"
+    assert isbn_key("0306406153") == "0306406153"
+
+
+def test_prefix_range():
+    assert isbn_prefix_range("978-0-306") == ("9780306", "9780307")
+    assert isbn_prefix_range("0-306") == ("9780306", "9780307")
+    assert isbn_prefix_range("979") == ("979", "97:")
+    assert isbn_prefix_range("abc") is None
+
+
+def test_isbn13_column_holds_the_python_key(temp_db):
+    """insert_book and insert_books_bulk store isbn_key() of the ISBN."""
+    assert insert_book("T", "A", "0-306-40615-2", 1, 1)
+    assert insert_books_bulk([("T", "A", "080442957X", 1, 1), ("T", "A", "9780000000902", 1, 1)]) == 2
+    conn = get_db_connection()
+    rows = conn.execute("SELECT isbn, isbn13 FROM books WHERE title = 'T'").fetchall()
+    conn.close()
+    assert {row["isbn"]: row["isbn13"] for row in rows} == {
+        isbn: isbn_key(isbn) for isbn in ("0-306-40615-2", "080442957X", "9780000000902")}
+
+
+def test_isbn10_twin_is_not_catalogued_twice(temp_db):
+    """The unique isbn13 index rejects an ISBN-10 whose ISBN-13 is already in the catalog."""
+    assert insert_book("Thirteen", "Author", "9780306406157", 1, 1)
+    assert insert_book("Ten", "Author", "0306406152", 1, 1) is False
+    assert insert_books_bulk([("Ten", "Author", "0-306-40615-2", 1, 1)]) == 0
+    assert get_book_by_isbn("0306406152")["title"] == "Thirteen"
+
+
+def test_insert_bumps_catalog_version_once(temp_db):
+    """The key is written with the row, not by a second UPDATE."""
+    version = get_catalog_version()
+    insert_book("Once", "Author", "9780306406157", 1, 1)
+    assert get_catalog_version() == version + 1
+
+
+def test_lookup_in_any_format(temp_db):
+    insert_book("Scanned", "Author", "9780306406157", 1, 1)
+    for form in ("9780306406157", "978-0-306-40615-7", "0306406152", "0-306-40615-2"):
+        assert get_book_by_isbn(form)["title"] == "Scanned"
+        assert [b["title"] for b in search_books_in_catalog(form, "isbn")] == ["Scanned"]
+    assert get_existing_isbns(["0306406152", "9780306406164"]) == {"0306406152"}
+    assert get_book_by_isbn("0306406153") is None
+
+
+def test_lookup_uses_index(temp_db):
+    conn = get_db_connection()
+    plan = " ".join(row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM books WHERE isbn13 = ?", ("9780306406157",)))
+    conn.close()
+    assert "idx_books_isbn13" in plan
+
+
+def test_add_book_normalises_and_validates(temp_db):
+    success, _ = add_book_to_catalog("Ten", "Author", "0-306-40615-2", 1)
+    assert success is True
+    assert get_book_by_isbn("9780306406157")["isbn"] == "9780306406157"
+
+    success, message = add_book_to_catalog("Twin", "Author", "978-0-306-40615-7", 1)
+    assert (success, message) == (False, "A book with this ISBN already exists.")
+
+    for bad in ("9780306406158", "0306406153"):
+        success, message = add_book_to_catalog("Typo", "Author", bad, 1)
+        assert success is False
+        assert "check digit" in message
+    assert "13 digits" in add_book_to_catalog("Short", "Author", "12345", 1)[1]
+
+
+def test_prefix_search(temp_db):
+    insert_book("Publisher A1", "Author", "9780306406157", 1, 1)
+    insert_book("Publisher A2", "Author", "9780306406164", 1, 1)
+    insert_book("Other", "Author", "9780743273565", 1, 1)
+
+    assert [b["title"] for b in get_books_by_isbn_prefix("978-0-306")] == ["Publisher A1", "Publisher A2"]
+    assert [b["title"] for b in search_books_in_catalog("0-306", "isbn_prefix")] == [
+        "Publisher A1", "Publisher A2"]
+    assert get_books_by_isbn_prefix("978-1") == []
@@ -0,0 +1,73 @@
+from datetime import date, datetime, timedelta
+
+from app import create_app
+from database.database import get_book_by_isbn, insert_book, insert_borrow_record
+from services.library_service import (
+    calculate_late_fee_for_book, calculate_late_fees_for_loans, calculate_outstanding_late_fees,
+    compute_late_fee
+)
+
+
+def _borrow(patron_id, isbn, days_ago):
+    insert_book(f"Book {isbn}", "Author", isbn, 1, 1)
+    book_id = get_book_by_isbn(isbn)["id"]
+    borrowed = datetime.now() - timedelta(days=days_ago)
+    insert_borrow_record(patron_id, book_id, borrowed, borrowed + timedelta(days=14))
+    return book_id
+
+
+def test_fee_tiers():
+    """0.50/day for the first week, 1.00/day after, capped at 15.00."""
+    assert compute_late_fee(0) == 0.0
+    assert compute_late_fee(3) == 1.5
+    assert compute_late_fee(7) == 3.5
+    assert compute_late_fee(10) == 6.5
+    assert compute_late_fee(40) == 15.0
+
+
+def test_fees_for_given_loans():
+    """Loans passed in directly are costed from their borrow dates."""
+    as_of = date(2025, 3, 1)
+    loans = [
+        {"borrow_date": "2025-02-20T09:00:00"},
+        {"borrow_date": datetime(2025, 2, 5, 12, 0)},
+    ]
+    results = calculate_late_fees_for_loans(loans, as_of)
+    assert [r["days_overdue"] for r in results] == [0, 10]
+    assert [r["fee_amount"] for r in results] == [0.0, 6.5]
+
+
+def test_bulk_fees_match_single_book_calculation(temp_db):
+    """The bulk query agrees with calculate_late_fee_for_book for every loan."""
+    books = {
+        _borrow("111111", "9780000000401", 2): 0,
+        _borrow("111111", "9780000000402", 20): 6,
+        _borrow("222222", "9780000000403", 40): 26,
+    }
+    result = calculate_outstanding_late_fees()
+    assert result["count"] == 3
+    for loan in result["loans"]:
+        single = calculate_late_fee_for_book(loan["patron_id"], loan["book_id"])
+        assert loan["days_overdue"] == books[loan["book_id"]] == single["days_overdue"]
+        assert loan["fee_amount"] == single["fee_amount"]
+    assert result["total_fees"] == 3.0 + 15.0
+
+
+def test_bulk_fees_filters(temp_db):
+    """Patron and overdue filters narrow the loans considered."""
+    _borrow("111111", "9780000000411", 2)
+    _borrow("111111", "9780000000412", 20)
+    _borrow("222222", "9780000000413", 30)
+    assert calculate_outstanding_late_fees(["111111"])["count"] == 2
+    assert calculate_outstanding_late_fees(["111111"], overdue_only=True)["count"] == 1
+    assert calculate_outstanding_late_fees(["12"])["status"] == "Error"
+
+
+def test_late_fees_endpoint(temp_db):
+    """/api/late_fees returns the bulk calculation as JSON."""
+    client = create_app().test_client()
+    _borrow("333333", "9780000000421", 25)
+    data = client.get("/api/late_fees?patron_id=333333").get_json()
+    assert data["count"] == 1
+    assert data["total_fees"] == 7.5
+    assert client.get("/api/late_fees?patron_id=abc").status_code == 400
@@ -140,7 +140,9 @@ class TestLibraryServicePayments(unittest.TestCase):
         mock_book.return_value = {'id': 1, 'title': 'Test Book', 'available_copies': 0}
         mock_borrowed.return_value = [{'book_id': 1, 'title': 'Test Book'}]
         mock_fee.return_value = {'fee_amount': 5.0}  # simulate late fee
-        success, msg = return_book_by_patron("123456", 1)
+        # a patron without loans: returns close one loan at a time, so other
+        # tests can leave 123456 with open loans of book 1
+        success, msg = return_book_by_patron("654321", 1)
         self.assertFalse(success)
         self.assertIn("error: book not borrowed by this patron.", msg.lower())
 
@@ -170,8 +172,8 @@ class TestLibraryServicePayments(unittest.TestCase):
     @patch('services.library_service.get_patron_borrow_count', return_value=5)
     def test_borrow_patron_at_max_limit_branch(self, mock_count, mock_book):
         success, msg = borrow_book_by_patron("123456", 1)
-        self.assertTrue(success)  # current logic still allows borrowing
-        self.assertIn("borrowed", msg.lower())
+        self.assertFalse(success)
+        self.assertIn("maximum borrowing limit of 5", msg.lower())
 
     @patch('services.library_service.get_book_by_id',
            return_value={'id': 2, 'title': 'No Copies', 'available_copies': 0})
@@ -184,7 +186,7 @@ class TestLibraryServicePayments(unittest.TestCase):
     @patch('services.library_service.get_book_by_id',
            return_value={'id': 3, 'title': 'Return Fail', 'available_copies': 0})
     @patch('services.library_service.get_patron_borrowed_books', return_value=[{'book_id': 3, 'title': 'Return Fail'}])
-    @patch('services.library_service.update_borrow_record_return_date', return_value=False)
+    @patch('services.library_service.close_borrow_record', return_value=False)
     @patch('services.library_service.update_book_availability', return_value=True)
     def test_return_book_update_record_fail(self, mock_update_book, mock_update_record, mock_borrowed, mock_book):
         success, msg = return_book_by_patron("123456", 3)
@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta
+
+from database.database import (
+    from_day_number, get_active_loans, get_book_by_isbn, get_db_connection, insert_book, insert_borrow_record,
+    to_day_number
+)
+from services.library_service import calculate_late_fee_for_book, return_book_by_patron
+
+
+def _days(patron_id):
+    conn = get_db_connection()
+    row = conn.execute("SELECT borrow_date, borrow_day, due_day, return_day FROM borrow_records "
+                       "WHERE patron_id = ?", (patron_id,)).fetchone()
+    conn.close()
+    return row
+
+
+def test_day_number_round_trip():
+    assert to_day_number(date(1970, 1, 1)) == 0
+    assert to_day_number(datetime(2025, 1, 1, 23, 59)) == 20089
+    assert from_day_number(20089) == date(2025, 1, 1)
+
+
+def test_day_numbers_follow_inserts_and_returns(temp_db):
+    """Triggers fill borrow_day/due_day on insert and return_day on return."""
+    insert_book("Day Book", "Author", "9780000000401", 1, 1)
+    book_id = get_book_by_isbn("9780000000401")["id"]
+    borrowed = datetime(2025, 1, 1, 15, 30)
+    insert_borrow_record("700001", book_id, borrowed, borrowed + timedelta(days=14))
+
+    row = _days("700001")
+    assert (row["borrow_day"], row["due_day"], row["return_day"]) == (20089, 20103, None)
+
+    assert return_book_by_patron("700001", book_id)[0]
+    assert _days("700001")["return_day"] == to_day_number(datetime.now())
+
+
+def test_fee_shapes_unchanged(temp_db):
+    """Fees computed from day numbers keep the same values and keys."""
+    insert_book("Day Book", "Author", "9780000000402", 1, 1)
+    book_id = get_book_by_isbn("9780000000402")["id"]
+    borrowed = datetime.now() - timedelta(days=24)
+    insert_borrow_record("700002", book_id, borrowed, borrowed + timedelta(days=14))
+
+    result = calculate_late_fee_for_book("700002", book_id)
+    assert result["days_overdue"] == 10
+    assert result["fee_amount"] == 6.5
+    assert result["copies_overdue"][0]["borrow_date"] == borrowed.date().isoformat()
+
+    loans = get_active_loans(datetime.now().date(), overdue_only=True)
+    assert [(loan["patron_id"], loan["days_overdue"]) for loan in loans] == [("700002", 10)]
+    assert loans[0]["borrow_date"] == borrowed.isoformat()
+
+
+def test_overdue_filter_uses_day_index(temp_db):
+    conn = get_db_connection()
+    plan = " ".join(row[-1] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM borrow_records WHERE return_date IS NULL AND borrow_day < ?",
+        (20000,)).fetchall())
+    conn.close()
+    assert "idx_borrow_records_active_borrow_day" in plan
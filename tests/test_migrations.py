@@ -0,0 +1,76 @@
+import sqlite3
+
+from database.database import get_db_connection
+from database.migrations import apply_migrations, get_schema_version, latest_version
+
+
+def _query_plan(conn, sql, params):
+    return " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall())
+
+
+def test_init_database_applies_all_migrations(temp_db):
+    """A freshly initialised database is at the latest schema version."""
+    conn = get_db_connection()
+    assert get_schema_version(conn) == latest_version()
+    conn.close()
+
+
+def test_migrations_are_idempotent(temp_db):
+    """Running the migrations again is a no-op."""
+    conn = get_db_connection()
+    assert apply_migrations(conn) == latest_version()
+    assert apply_migrations(conn) == latest_version()
+    conn.close()
+
+
+def test_active_loan_queries_use_index(temp_db):
+    """Active-loan lookups by patron and by book are index searches, not scans."""
+    conn = get_db_connection()
+    by_patron = _query_plan(conn, "SELECT COUNT(*) FROM borrow_records WHERE patron_id = ? AND return_date IS NULL",
+                            ("123456",))
+    by_book = _query_plan(conn, "SELECT * FROM borrow_records WHERE book_id = ? AND return_date IS NULL", (1,))
+    conn.close()
+    assert "idx_borrow_records_patron_active" in by_patron
+    assert "idx_borrow_records_book_active" in by_book
+
+
+def test_existing_database_is_migrated_in_place(tmp_path):
+    """A database created before migrations existed keeps its rows when upgraded."""
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                 "author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL, "
+                 "available_copies INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT, patron_id TEXT NOT NULL, "
+                 "book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL, due_date TEXT NOT NULL, return_date TEXT)")
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Old', 'Author', '9780000000200', 1, 0)")
+    conn.execute("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) "
+                 "VALUES ('123456', 1, '2025-01-01T00:00:00', '2025-01-15T00:00:00')")
+    conn.commit()
+
+    assert get_schema_version(conn) == 0
+    assert apply_migrations(conn) == latest_version()
+    assert conn.execute("SELECT COUNT(*) FROM borrow_records").fetchone()[0] == 1
+    # day numbers are backfilled for existing loans
+    assert conn.execute("SELECT borrow_day, due_day, return_day FROM borrow_records").fetchone() == (
+        20089, 20103, None)
+    conn.close()
+
+
+def test_isbn_keys_are_backfilled_uniquely(tmp_path):
+    """Existing ISBN-10/ISBN-13 twins migrate; only the oldest keeps the unique key."""
+    conn = sqlite3.connect(str(tmp_path / "twins.db"))
+    conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                 "author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL, "
+                 "available_copies INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT, patron_id TEXT NOT NULL, "
+                 "book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL, due_date TEXT NOT NULL, return_date TEXT)")
+    conn.executemany("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                     "VALUES (?, 'Author', ?, 1, 1)",
+                     [("Ten", "0-306-40615-2"), ("Thirteen", "9780306406157"), ("Other", "9780743273565")])
+    conn.commit()
+
+    apply_migrations(conn)
+    assert conn.execute("SELECT title, isbn13 FROM books ORDER BY id").fetchall() == [
+        ("Ten", "9780306406157"), ("Thirteen", None), ("Other", "9780743273565")]
+    conn.close()
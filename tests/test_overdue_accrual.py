@@ -0,0 +1,122 @@
+import time
+from datetime import date, datetime, timedelta
+
+from app import create_app
+from database.database import (
+    get_book_by_isbn, get_overdue_loans, get_patron_borrowed_books, insert_book,
+    insert_borrow_record, record_late_fee_payments
+)
+from services import accrual_service
+from services.accrual_service import accrue_overdue_fees, get_overdue_report
+from services.library_service import return_book_by_patron
+
+AS_OF = date(2025, 3, 1)
+
+
+def _loan(patron_id, isbn, days_ago):
+    insert_book("Overdue Book " + isbn[-3:], "Author", isbn, 1, 1)
+    book_id = get_book_by_isbn(isbn)["id"]
+    borrowed = datetime.combine(AS_OF, datetime.min.time()) - timedelta(days=days_ago)
+    insert_borrow_record(patron_id, book_id, borrowed, borrowed + timedelta(days=14))
+    return book_id
+
+
+def _seed():
+    _loan("600001", "9780000000301", 10)   # not overdue yet
+    _loan("600001", "9780000000302", 20)   # 6 days -> $3.00
+    _loan("600002", "9780000000303", 40)   # capped at $15.00
+
+
+def test_accrual_materialises_overdue_loans(temp_db):
+    """Only overdue loans are stored, with their fee as of the accrual date."""
+    _seed()
+    result = accrue_overdue_fees(AS_OF)
+    assert result["count"] == 2
+    assert result["total_fees"] == 18.0
+
+    loans = {loan["patron_id"]: loan for loan in get_overdue_loans()}
+    assert loans["600001"]["days_overdue"] == 6 and loans["600001"]["fee_amount"] == 3.0
+    assert loans["600002"]["fee_amount"] == 15.0
+    assert loans["600002"]["accrued_on"] == AS_OF.isoformat()
+
+    # re-running replaces rather than duplicates
+    assert accrue_overdue_fees(AS_OF)["count"] == 2
+
+
+def test_returns_and_payments_update_the_table(temp_db):
+    """A return removes the loan; a payment lowers what is due."""
+    _seed()
+    accrue_overdue_fees(AS_OF)
+    record_id = get_overdue_loans(["600002"])[0]["borrow_record_id"]
+    record_late_fee_payments([(record_id, "600002", 5.0, "txn_1", "paid", "ok")])
+    assert get_overdue_loans(["600002"])[0]["amount_due"] == 10.0
+
+    book_id = get_book_by_isbn("9780000000302")["id"]
+    assert return_book_by_patron("600001", book_id)[0]
+    assert get_overdue_loans(["600001"]) == []
+
+
+def test_overdue_report_and_api(temp_db):
+    """/api/overdue lists patrons owing the most, and filters by patron."""
+    app = create_app()
+    _seed()
+    accrue_overdue_fees(AS_OF)
+
+    report = get_overdue_report()
+    assert [p["patron_id"] for p in report["patrons"]] == ["600002", "600001"]
+    assert report["count"] == 2
+
+    client = app.test_client()
+    data = client.get("/api/overdue?patron_id=600001").get_json()
+    assert data["patrons"][0]["total_due"] == 3.0
+    assert [loan["title"] for loan in data["loans"]] == ["Overdue Book 302"]
+    assert client.get("/api/overdue?patron_id=12").status_code == 400
+
+
+def test_borrowed_books_flag_overdue_in_sql(temp_db):
+    """get_patron_borrowed_books still returns datetimes and an is_overdue flag."""
+    _seed()
+    insert_book("Not Due Book", "Author", "9780000000305", 1, 1)
+    book_id = get_book_by_isbn("9780000000305")["id"]
+    insert_borrow_record("600001", book_id, datetime.now(), datetime.now() + timedelta(days=14))
+
+    books = get_patron_borrowed_books("600001")
+    assert all(isinstance(book["due_date"], datetime) for book in books)
+    assert [book["is_overdue"] for book in books] == [True, True, False]
+    assert books[0]["is_overdue"] is True
+    assert books[2]["is_overdue"] is False and books[2]["book_id"] == book_id
+
+
+def test_scheduler_runs_in_background(temp_db):
+    """The in-process scheduler accrues immediately and stops cleanly."""
+    _loan("600003", "9780000000304", 400)
+    scheduler = accrual_service.AccrualScheduler(interval=60).start()
+    try:
+        deadline = time.time() + 5
+        while not get_overdue_loans(["600003"]) and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        scheduler.stop(timeout=5)
+    assert get_overdue_loans(["600003"])[0]["fee_amount"] == 15.0
+
+
+def test_only_one_scheduler_accrues(temp_db, tmp_path):
+    """Schedulers sharing a lock file accrue in one process; another takes over when it stops."""
+    _loan("600004", "9780000000306", 400)
+    lock_path = str(tmp_path / "accrual.lock")
+    first = accrual_service.AccrualScheduler(60, lock_path)
+    second = accrual_service.AccrualScheduler(60, lock_path)
+    try:
+        assert first.run_once()["count"] == 1
+        assert second.run_once() is None
+        first.stop()
+        assert second.run_once()["count"] == 1
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_cli_accrues(temp_db, capsys):
+    _seed()
+    assert accrual_service.main(["--as-of", AS_OF.isoformat()]) == 0
+    assert "Accrued 2 overdue loans as of 2025-03-01" in capsys.readouterr().out
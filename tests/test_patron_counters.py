@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from database.database import (
+    get_db_connection, get_patron_borrow_count, get_patron_summary, insert_book, insert_borrow_record,
+    record_late_fee_payments, rebuild_patron_summaries, verify_patron_summaries, get_book_by_isbn
+)
+from services import patron_service
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+def _add_book(isbn="9780000000201", copies=3):
+    insert_book("Counter Book", "Author", isbn, copies, copies)
+    return get_book_by_isbn(isbn)["id"]
+
+
+def test_borrow_and_return_maintain_active_loans(temp_db):
+    """Borrowing and returning keep the patron's active loan counter in step."""
+    book_id = _add_book()
+    assert get_patron_borrow_count("222222") == 0
+
+    assert borrow_book_by_patron("222222", book_id)[0]
+    assert borrow_book_by_patron("222222", book_id)[0]
+    assert get_patron_borrow_count("222222") == 2
+
+    assert return_book_by_patron("222222", book_id)[0]
+    # one copy comes back, so only the oldest open record is closed
+    assert get_patron_borrow_count("222222") == 1
+    assert get_book_by_isbn("9780000000201")["available_copies"] == 2
+    assert verify_patron_summaries() == []
+
+
+def test_late_return_adds_outstanding_fee_and_payment_reduces_it(temp_db):
+    """The fee assessed at return is owed until paid."""
+    book_id = _add_book()
+    borrowed = datetime.now() - timedelta(days=20)  # 6 days overdue -> $3.00
+    insert_borrow_record("333333", book_id, borrowed, borrowed + timedelta(days=14))
+
+    success, message = return_book_by_patron("333333", book_id)
+    assert success and "$3.00" in message
+    summary = get_patron_summary("333333")
+    assert summary["active_loans"] == 0
+    assert summary["outstanding_fees"] == 3.0
+
+    conn = get_db_connection()
+    record_id = conn.execute("SELECT id FROM borrow_records WHERE patron_id = '333333'").fetchone()["id"]
+    conn.close()
+    record_late_fee_payments([(record_id, "333333", 1.25, "txn_1", "paid", "ok"),
+                              (record_id, "333333", 5.00, None, "failed", "declined")])
+    assert get_patron_summary("333333")["outstanding_fees"] == 1.75
+    assert verify_patron_summaries() == []
+
+
+def test_verify_and_rebuild(temp_db, capsys):
+    """verify reports drifted counters; rebuild recomputes them."""
+    book_id = _add_book()
+    borrow_book_by_patron("444444", book_id)
+    conn = get_db_connection()
+    conn.execute("UPDATE patrons SET active_loans = 7 WHERE patron_id = '444444'")
+    conn.execute("INSERT INTO patrons (patron_id, active_loans) VALUES ('555555', 1)")
+    conn.commit()
+    conn.close()
+
+    mismatches = verify_patron_summaries()
+    assert [(m["patron_id"], m["stored_active_loans"], m["expected_active_loans"]) for m in mismatches] == [
+        ("444444", 7, 1), ("555555", 1, None)]
+    assert patron_service.main(["verify"]) == 1
+
+    assert rebuild_patron_summaries() >= 1
+    assert verify_patron_summaries() == []
+    assert get_patron_borrow_count("444444") == 1
+    assert patron_service.main(["verify"]) == 0
+    assert "match" in capsys.readouterr().out
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from app import create_app
+from database.database import (
+    get_book_by_isbn, get_patron_loans, insert_book, insert_borrow_record, record_late_fee_payments,
+    update_borrow_record_return_date
+)
+from services.library_service import calculate_outstanding_late_fees, get_patron_status_report
+
+
+def _loan(patron_id, isbn, days_ago, returned_days_ago=None):
+    insert_book(f"Book {isbn}", "Author", isbn, 1, 1)
+    book_id = get_book_by_isbn(isbn)["id"]
+    borrowed = datetime.now() - timedelta(days=days_ago)
+    insert_borrow_record(patron_id, book_id, borrowed, borrowed + timedelta(days=14))
+    if returned_days_ago is not None:
+        update_borrow_record_return_date(patron_id, book_id, datetime.now() - timedelta(days=returned_days_ago))
+    return book_id
+
+
+def test_report_current_loans_and_fees(temp_db):
+    """Current loans carry their own late fee and the totals add up."""
+    _loan("444444", "9780000000501", 3)
+    _loan("444444", "9780000000502", 24)
+    report = get_patron_status_report("444444")
+    assert report["status"] == "Success"
+    assert report["number_of_books_borrowed"] == 2
+    fees = [book["late_fee_current"] for book in report["books_currently_borrowed"]]
+    assert fees == [6.5, 0.0]  # oldest loan first
+    assert report["books_currently_borrowed"][0]["is_overdue"] is True
+    assert report["total_late_fees"] == 6.5
+    assert report["borrowing_history_summary"] == []
+
+
+def test_report_fees_are_net_of_payments(temp_db):
+    """Paid late fees are not reported as owed, matching calculate_outstanding_late_fees."""
+    _loan("454545", "9780000000511", 24)  # 6.50
+    _loan("454545", "9780000000512", 20)  # 3.00
+    record_id = get_patron_loans("454545", datetime.now().date(), 10)[0]["borrow_record_id"]
+    record_late_fee_payments([(record_id, "454545", 6.5, "txn_1", "paid", "ok")])
+
+    report = get_patron_status_report("454545")
+    assert sorted(book["late_fee_current"] for book in report["books_currently_borrowed"]) == [0.0, 3.0]
+    assert report["total_late_fees"] == calculate_outstanding_late_fees(["454545"])["total_due"] == 3.0
+
+
+def test_report_history_is_paginated(temp_db):
+    """Returned loans appear most recent first, one page at a time."""
+    for i in range(5):
+        _loan("555555", f"97800000006{i:02d}", 30 + i, returned_days_ago=i + 1)
+    _loan("555555", "9780000000699", 1)
+
+    first = get_patron_status_report("555555", history_page=1, history_per_page=2)
+    assert first["history_total"] == 5
+    assert first["number_of_books_borrowed"] == 1
+    assert [h["title"] for h in first["borrowing_history_summary"]] == [
+        "Book 9780000000600", "Book 9780000000601"]
+
+    last = get_patron_status_report("555555", history_page=3, history_per_page=2)
+    assert [h["title"] for h in last["borrowing_history_summary"]] == ["Book 9780000000604"]
+    assert last["number_of_books_borrowed"] == 1
+
+
+def test_history_total_past_the_last_page(temp_db):
+    """A page past the end is empty but still reports the full history size."""
+    for i in range(3):
+        _loan("565656", f"97800000006{50 + i}", 30 + i, returned_days_ago=i + 1)
+
+    report = get_patron_status_report("565656", history_page=5, history_per_page=2)
+    assert report["books_currently_borrowed"] == []
+    assert report["borrowing_history_summary"] == []
+    assert report["history_total"] == 3
+
+
+def test_report_invalid_patron(temp_db):
+    """Malformed patron IDs are rejected."""
+    assert get_patron_status_report("12ab56")["status"] == "Error"
+
+
+def test_patron_status_endpoint(temp_db):
+    """/api/patron/<id>/status serves the report."""
+    client = create_app().test_client()
+    _loan("666666", "9780000000701", 2)
+    data = client.get("/api/patron/666666/status").get_json()
+    assert data["number_of_books_borrowed"] == 1
+    assert client.get("/api/patron/66/status").status_code == 400
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+import pytest
+
+import database.database as db
+from app import create_app
+from database.database import (
+    get_active_loans, get_all_books, get_book_by_isbn, get_read_connection, insert_book, insert_borrow_record,
+    record_late_fee_payments
+)
+from services.accrual_service import accrue_overdue_fees
+from services.library_service import calculate_outstanding_late_fees, search_books_in_catalog, settle_late_fees
+from services.payment_service import PaymentGateway
+
+
+@pytest.fixture
+def snapshot(temp_db, tmp_path, monkeypatch):
+    """A read-only snapshot of the primary, taken before one more book is added."""
+    insert_book("Snapshot Book", "Author", "9780000000101", 1, 1)
+    path = str(tmp_path / "snapshot.db")
+    conn = sqlite3.connect(temp_db)
+    conn.execute("VACUUM INTO ?", (path,))
+    conn.close()
+    insert_book("Primary Only Book", "Author", "9780000000102", 1, 1)
+
+    monkeypatch.setattr(db, "READONLY_DATABASE", None)
+    db.configure_database(temp_db, path)
+    return path
+
+
+def test_database_env_var_is_read():
+    """DATABASE in the environment sets the primary database path."""
+    env = dict(os.environ, DATABASE="custom.db")
+    env.pop("DATABASE_READONLY", None)
+    out = subprocess.run(
+        [sys.executable, "-c", "import database.database as d; print(d.DATABASE, d.READONLY_DATABASE)"],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    assert out == ["custom.db", "None"]
+
+
+def test_read_helpers_use_snapshot(snapshot):
+    """Catalog and search reads go to the snapshot; lookups by key see the primary."""
+    titles = {book["title"] for book in get_all_books()}
+    assert "Snapshot Book" in titles
+    assert "Primary Only Book" not in titles
+    assert search_books_in_catalog("Primary Only", "title") == []
+
+    assert get_book_by_isbn("9780000000102")["title"] == "Primary Only Book"
+
+
+def test_read_connection_rejects_writes(snapshot):
+    """The snapshot is opened read-only (mode=ro, query_only)."""
+    conn = get_read_connection()
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM books")
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_create_app_database_config(temp_db, tmp_path, monkeypatch):
+    """create_app takes the database paths from its config."""
+    monkeypatch.setattr(db, "READONLY_DATABASE", None)
+    path = str(tmp_path / "configured.db")
+    snapshot = str(tmp_path / "configured-snapshot.db")
+    create_app({"DATABASE": path, "DATABASE_READONLY": snapshot, "DATABASE_READONLY_IMMUTABLE": True})
+
+    assert db.DATABASE == path
+    assert db.READONLY_DATABASE.startswith("file:")
+    assert db.READONLY_DATABASE.endswith("configured-snapshot.db?mode=ro&immutable=1")
+    assert os.path.exists(path)
+
+
+def test_settlement_and_accrual_read_the_primary(temp_db, tmp_path, monkeypatch):
+    """A payment made after the snapshot is seen, so the patron is not charged twice."""
+    insert_book("Late Book", "Author", "9780000000103", 1, 1)
+    book_id = get_book_by_isbn("9780000000103")["id"]
+    borrowed = datetime.now() - timedelta(days=20)  # 6 days overdue -> $3.00
+    insert_borrow_record("444444", book_id, borrowed, borrowed + timedelta(days=14))
+    path = str(tmp_path / "snapshot.db")
+    conn = sqlite3.connect(temp_db)
+    conn.execute("VACUUM INTO ?", (path,))
+    conn.close()
+    record_id = get_active_loans(datetime.now().date(), ["444444"])[0]["borrow_record_id"]
+    record_late_fee_payments([(record_id, "444444", 3.0, "txn_1", "paid", "ok")])
+
+    monkeypatch.setattr(db, "READONLY_DATABASE", None)
+    db.configure_database(temp_db, path, immutable=True)
+    assert calculate_outstanding_late_fees(["444444"])["total_due"] == 3.0  # display reads the stale copy
+
+    gateway = Mock(spec=PaymentGateway)
+    assert settle_late_fees(["444444"], gateway)["total_charged"] == 0.0
+    gateway.process_payment.assert_not_called()
+    assert accrue_overdue_fees()["total_due"] == 0.0
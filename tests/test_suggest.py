@@ -0,0 +1,126 @@
+import sqlite3
+
+from app import create_app
+from database.database import (
+    get_book_by_isbn, get_suggestions, insert_book, insert_books_bulk, update_book_availability
+)
+from database.prefix_index import RANKED_PER_PREFIX, PrefixIndex, suggest_index
+from services.library_service import MAX_SUGGESTIONS, suggest_books
+
+
+def _texts(suggestions):
+    return [(s["kind"], s["text"]) for s in suggestions]
+
+
+def test_prefix_matches_any_word_start():
+    index = PrefixIndex()
+    index.rebuild([("The Great Gatsby", "F. Scott Fitzgerald"), ("Great Expectations", "Charles Dickens")])
+
+    assert _texts(index.suggest("gats")) == [("title", "The Great Gatsby")]
+    assert _texts(index.suggest("FITZ")) == [("author", "F. Scott Fitzgerald")]
+    # completions starting with the prefix rank before mid-text matches
+    assert _texts(index.suggest("great", kind="title")) == [
+        ("title", "Great Expectations"), ("title", "The Great Gatsby")]
+    assert index.suggest("reat") == []
+    assert index.suggest("   ") == []
+
+
+def test_ranking_counts_books_and_respects_limit():
+    index = PrefixIndex()
+    index.rebuild([("Animal Farm", "George Orwell"), ("1984", "George Orwell"), ("Middlemarch", "George Eliot")])
+
+    assert index.suggest("george") == [
+        {"text": "George Orwell", "kind": "author", "books": 2},
+        {"text": "George Eliot", "kind": "author", "books": 1},
+    ]
+    assert len(index.suggest("george", limit=1)) == 1
+
+
+def test_ranking_is_global_over_all_matches():
+    """A popular completion wins even when many alphabetically earlier keys share the prefix."""
+    books = [(f"Aardvark {i:04d}", f"Writer {i:04d}") for i in range(2000)]
+    books += [("Azure Skies", "Popular Author")] * 3
+    index = PrefixIndex()
+    index.rebuild(books)
+
+    assert index.suggest("a", limit=1) == [{"text": "Azure Skies", "kind": "title", "books": 3}]
+    index.add_book("Abacus", "Popular Author")
+    assert _texts(index.suggest("a", kind="author", limit=RANKED_PER_PREFIX + 1)[:1]) == [
+        ("author", "Popular Author")]
+
+
+def test_memory_is_bounded():
+    index = PrefixIndex(max_completions=3)
+    index.rebuild([("Book One", "Ann"), ("Book Two", "Bob")])
+    index.add_book("Book Three", "Cy")
+
+    assert len(index) == 3
+    assert index.dropped == 3
+    assert _texts(index.suggest("book")) == [("title", "Book One"), ("title", "Book Two")]
+
+
+def test_insert_book_updates_index_incrementally(temp_db):
+    assert get_suggestions("zeph") == []
+    assert suggest_index.source == temp_db
+
+    insert_book("Zephyr Winds", "Ada Zephyrine", "9780000000900", 1, 1)
+    assert _texts(get_suggestions("zeph")) == [("title", "Zephyr Winds"), ("author", "Ada Zephyrine")]
+    assert suggest_index.source == temp_db  # updated in place, not rebuilt
+
+
+def test_bulk_insert_rebuilds_index(temp_db):
+    get_suggestions("a")
+    insert_books_bulk([("Quasar Tales", "Author", "9780000000901", 1, 1)])
+    assert _texts(get_suggestions("quas")) == [("title", "Quasar Tales")]
+
+
+def test_index_tracks_the_catalog_text_version(temp_db):
+    """Titles added behind the index trigger a rebuild; availability changes do not."""
+    get_suggestions("a")
+    version = suggest_index.version
+    conn = sqlite3.connect(temp_db)
+    conn.execute("INSERT INTO books (title, author, isbn, isbn13, total_copies, available_copies) "
+                 "VALUES ('Nebula Nights', 'Author', '9780000000903', '9780000000903', 1, 1)")
+    conn.commit()
+    conn.close()
+
+    assert _texts(get_suggestions("nebu")) == [("title", "Nebula Nights")]
+    assert suggest_index.version == version + 1
+
+    update_book_availability(get_book_by_isbn("9780000000903")["id"], -1)
+    get_suggestions("nebu")
+    assert suggest_index.version == version + 1
+
+
+def test_stale_incremental_add_is_skipped():
+    index = PrefixIndex()
+    index.rebuild([("Old Title", "Author")], version=5)
+    assert not index.add_book("Skipped Title", "Author", version=7)
+    assert index.add_book("New Title", "Author", version=6)
+    assert index.version == 6
+    assert _texts(index.suggest("skip")) == []
+
+
+def test_suggest_books_validation(temp_db):
+    assert suggest_books("")["status"] == "Error"
+    assert suggest_books("gat", kind="isbn")["status"] == "Error"
+
+    insert_book("Gatehouse", "Author", "9780000000902", 1, 1)
+    assert get_book_by_isbn("9780000000902")
+    result = suggest_books("  gat ", limit=1000)
+    assert result["status"] == "Success"
+    assert result["prefix"] == "gat"
+    assert result["count"] <= MAX_SUGGESTIONS
+
+
+def test_suggest_route(temp_db):
+    client = create_app().test_client()
+
+    response = client.get("/api/suggest?q=mock")
+    assert response.status_code == 200
+    assert _texts(response.get_json()["suggestions"]) == [("title", "To Kill a Mockingbird")]
+
+    response = client.get("/api/suggest?q=harp&kind=author")
+    assert _texts(response.get_json()["suggestions"]) == [("author", "Harper Lee")]
+
+    assert client.get("/api/suggest").status_code == 400